@@ -0,0 +1,289 @@
+"""
+Local stand-ins for the Solscan, DexScreener and Solana JSON-RPC APIs, used to benchmark the pipeline repeatably.
+Every response is generated deterministically from the requested address, so no fixtures need to be kept.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+
+from solders.keypair import Keypair
+from solders.signature import Signature
+
+BLOCK_TIME = 1_700_000_000
+TOKEN_PROGRAM = 'TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA'
+
+
+@dataclass
+class MockApiConfig:
+    # latency added to every response
+    latency_sec: float = 0.02
+    # requests per second allowed per API before answering 429, 0 for no limit
+    rate_limit_per_sec: float = 0
+    # number of holders every token has
+    holders_per_token: int = 100
+    # share of holders with only a few recent transfers, classified FRESH
+    fresh_ratio: float = 0.3
+    # transfers of an OLD holder, more than SOLSCAN_SKIP_THRESHOLD makes classification stop early
+    old_holder_transfers: int = 120
+    # signatures a mint has, the oldest first_block_signatures of them share the first block
+    signatures_per_mint: int = 300
+    first_block_signatures: int = 20
+    pairs_per_token: int = 2
+
+
+@dataclass
+class _TokenBucket:
+    rate_per_sec: float
+    available: float = 0.0
+    last_refill: float = field(default_factory=time.monotonic)
+
+    def try_acquire(self) -> bool:
+        now = time.monotonic()
+        self.available = min(self.rate_per_sec, self.available + (now - self.last_refill) * self.rate_per_sec)
+        self.last_refill = now
+        if self.available < 1:
+            return False
+        self.available -= 1
+        return True
+
+
+def mock_pubkey(seed: str) -> str:
+    """
+    :return: a deterministic 44 character base58 wallet address, the length the holder address pattern accepts. It is
+    a keypair's public key, so it is on curve and never mistaken for a program derived address
+    """
+    counter = 0
+    while True:
+        address = str(Keypair.from_seed(hashlib.sha256(f"{seed}:{counter}".encode()).digest()).pubkey())
+        if len(address) == 44:
+            return address
+        counter += 1
+
+
+def mock_signature(seed: str) -> str:
+    return str(Signature(hashlib.sha512(seed.encode()).digest()))
+
+
+class MockApiServer:
+    """
+    One HTTP server answering all mocked APIs:
+    Solscan under /solscan, DexScreener under /dexscreener and Solana JSON-RPC (including batches) at /rpc
+    """
+
+    def __init__(self, config: MockApiConfig | None = None, host: str = '127.0.0.1', port: int = 0):
+        self.config = config or MockApiConfig()
+        self.request_counts: Counter = Counter()
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, _TokenBucket] = {}
+        self._token_account_by_pubkey: Dict[str, dict] = {}
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self) -> Dict[str, str]:
+        """
+        :return: environment variables pointing the app at this server
+        """
+        return {'SOLSCAN_API_URL': f"{self.base_url}/solscan",
+                'DEXSCREENER_TOKENS_URL': f"{self.base_url}/dexscreener/tokens/",
+                'SOLANA_API_KEY': f"{self.base_url}/rpc"}
+
+    def start(self) -> MockApiServer:
+        self._thread = threading.Thread(target=self._server.serve_forever, name='mock-api', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_counts(self):
+        with self._lock:
+            self.request_counts.clear()
+
+    def _count(self, name: str, rate_limited: bool = False):
+        with self._lock:
+            self.request_counts[name] += 1
+            if rate_limited:
+                self.request_counts[f"{name} 429"] += 1
+
+    def _is_rate_limited(self, api: str) -> bool:
+        if not self.config.rate_limit_per_sec:
+            return False
+        with self._lock:
+            bucket = self._buckets.setdefault(api, _TokenBucket(self.config.rate_limit_per_sec,
+                                                                self.config.rate_limit_per_sec))
+            return not bucket.try_acquire()
+
+    # Solscan
+
+    def token_holders(self, token_address: str, offset: int, limit: int) -> dict:
+        holders_count = self.config.holders_per_token
+        return {'data': [{'owner': mock_pubkey(f"{token_address}:holder:{i}"), 'amount': holders_count - i}
+                         for i in range(offset, min(offset + limit, holders_count))],
+                'total': holders_count}
+
+    def sol_transfers(self, account: str, offset: int, limit: int) -> dict:
+        is_fresh = int(hashlib.sha256(account.encode()).hexdigest(), 16) % 1000 < self.config.fresh_ratio * 1000
+        now = int(time.time())
+        if is_fresh:
+            transfers = [now - 3600 * (i + 1) for i in range(3)]
+        else:
+            transfers = [now - 3600 * 24 * 30 - 3600 * i for i in range(self.config.old_holder_transfers)]
+        return {'data': [{'blockTime': block_time, 'txHash': mock_signature(f"{account}:{offset + i}")}
+                         for i, block_time in enumerate(transfers[offset:offset + limit])]}
+
+    # DexScreener
+
+    def token_pairs(self, addresses: List[str]) -> dict:
+        return {'pairs': [{'baseToken': {'address': address, 'name': f"Mock {address[:4]}"},
+                           'fdv': 50_000 + 1000 * i, 'liquidity': {'usd': 10_000}, 'priceUsd': '0.00005'}
+                          for address in addresses for i in range(self.config.pairs_per_token)]}
+
+    # Solana JSON-RPC
+
+    def _mint_signature_statuses(self, mint_address: str) -> List[dict]:
+        # newest first, the oldest first_block_signatures share the mint's first block
+        count = self.config.signatures_per_mint
+        return [{'signature': mock_signature(f"{mint_address}:{i}"), 'slot': 1000 + i, 'err': None, 'memo': None,
+                 'blockTime': BLOCK_TIME + max(0, i - self.config.first_block_signatures + 1),
+                 'confirmationStatus': 'finalized'}
+                for i in reversed(range(count))]
+
+    def _token_accounts(self, mint_address: str) -> List[dict]:
+        # the same holders and amounts as token_holders, each owning one token account of the mint
+        holders_count = self.config.holders_per_token
+        token_accounts = []
+        for i in range(holders_count):
+            info = {'mint': mint_address, 'owner': mock_pubkey(f"{mint_address}:holder:{i}"),
+                    'tokenAmount': {'amount': str(holders_count - i), 'decimals': 0}}
+            token_accounts.append({'pubkey': mock_pubkey(f"{mint_address}:token_account:{i}"),
+                                   'account': {'data': {'parsed': {'info': info, 'type': 'account'},
+                                                        'program': 'spl-token', 'space': 165},
+                                               'executable': False, 'lamports': 2_039_280, 'owner': TOKEN_PROGRAM,
+                                               'space': 165}})
+        with self._lock:
+            self._token_account_by_pubkey.update((account['pubkey'], account['account']) for account in token_accounts)
+        return token_accounts
+
+    def rpc_result(self, method: str, params: list):
+        if method == 'getProgramAccounts':
+            mint_address = next(account_filter['memcmp']['bytes'] for account_filter in params[1]['filters']
+                                if 'memcmp' in account_filter)
+            return self._token_accounts(mint_address)
+        if method == 'getTokenLargestAccounts':
+            return {'context': {'slot': 1000},
+                    'value': [{'address': account['pubkey'],
+                               'amount': account['account']['data']['parsed']['info']['tokenAmount']['amount']}
+                              for account in self._token_accounts(params[0])[:20]]}
+        if method == 'getMultipleAccounts':
+            # only token accounts already listed by getTokenLargestAccounts or getProgramAccounts are known
+            with self._lock:
+                return {'context': {'slot': 1000}, 'value': [self._token_account_by_pubkey.get(address)
+                                                             for address in params[0]]}
+        if method == 'getSignaturesForAddress':
+            statuses = self._mint_signature_statuses(params[0])
+            before = (params[1] if len(params) > 1 else {}).get('before')
+            if before is not None:
+                index = next((i for i, status in enumerate(statuses) if status['signature'] == before), None)
+                statuses = statuses[index + 1:] if index is not None else []
+            limit = (params[1] if len(params) > 1 else {}).get('limit') or 1000
+            return statuses[:limit]
+        if method == 'getTransaction':
+            return self._transaction(params[0])
+        raise ValueError(f"Unsupported RPC method {method}")
+
+    @staticmethod
+    def _transaction(signature: str) -> dict:
+        owner = mock_pubkey(f"{signature}:owner")
+        token_balance = {'accountIndex': 1, 'mint': owner, 'owner': owner, 'programId': TOKEN_PROGRAM}
+        return {'slot': 1000, 'blockTime': BLOCK_TIME,
+                'meta': {'err': None, 'fee': 5000, 'innerInstructions': [], 'postBalances': [1, 1],
+                         'preBalances': [1, 1], 'logMessages': [], 'rewards': [], 'status': {'Ok': None},
+                         'loadedAddresses': {'readonly': [], 'writable': []},
+                         'preTokenBalances': [{**token_balance, 'uiTokenAmount': {
+                             'amount': '1000000000', 'decimals': 0, 'uiAmount': 1_000_000_000.0,
+                             'uiAmountString': '1000000000'}}],
+                         'postTokenBalances': [{**token_balance, 'uiTokenAmount': {
+                             'amount': '990000000', 'decimals': 0, 'uiAmount': 990_000_000.0,
+                             'uiAmountString': '990000000'}}]},
+                'transaction': {'message': {'accountKeys': [owner, 'Vote111111111111111111111111111111111111111'],
+                                            'header': {'numReadonlySignedAccounts': 0,
+                                                       'numReadonlyUnsignedAccounts': 1,
+                                                       'numRequiredSignatures': 1},
+                                            'instructions': [{'accounts': [0], 'data': '37u9WtQpcm6ULa3W',
+                                                              'programIdIndex': 1}],
+                                            'recentBlockhash': 'mfcyqEXB3DnHXki6KjjmZck6YjmZLvpAByy2fj4nh6B'},
+                                'signatures': [signature]}}
+
+    def _handler(self):
+        server = self
+
+        class MockApiHandler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _respond(self, status: int, body):
+                time.sleep(server.config.latency_sec)
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _rate_limited(self, api: str, name: str) -> bool:
+                if server._is_rate_limited(api):
+                    server._count(name, rate_limited=True)
+                    self._respond(429, {'success': False, 'error': 'Too Many Requests'})
+                    return True
+                server._count(name)
+                return False
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                if url.path == '/solscan/token/holders':
+                    if not self._rate_limited('solscan', 'solscan token/holders'):
+                        self._respond(200, server.token_holders(query['tokenAddress'], int(query.get('offset', 0)),
+                                                                int(query.get('limit', 50))))
+                elif url.path == '/solscan/account/solTransfers':
+                    if not self._rate_limited('solscan', 'solscan account/solTransfers'):
+                        self._respond(200, server.sol_transfers(query['account'], int(query.get('offset', 0)),
+                                                                int(query.get('limit', 50))))
+                elif url.path.startswith('/dexscreener/tokens/'):
+                    if not self._rate_limited('dexscreener', 'dexscreener tokens'):
+                        addresses = url.path[len('/dexscreener/tokens/'):].split(',')
+                        self._respond(200, server.token_pairs(addresses))
+                else:
+                    self._respond(404, {'error': 'not found'})
+
+            def do_POST(self):
+                if urlparse(self.path).path != '/rpc':
+                    self._respond(404, {'error': 'not found'})
+                    return
+                payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                requests = payload if isinstance(payload, list) else [payload]
+                if self._rate_limited('rpc', 'rpc ' + ','.join(sorted({request['method'] for request in requests}))):
+                    return
+                responses = [{'jsonrpc': '2.0', 'id': request['id'],
+                              'result': server.rpc_result(request['method'], request.get('params', []))}
+                             for request in requests]
+                self._respond(200, responses if isinstance(payload, list) else responses[0])
+
+            def log_message(self, format, *args):
+                pass
+
+        return MockApiHandler
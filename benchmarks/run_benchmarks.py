@@ -0,0 +1,216 @@
+"""
+End-to-end benchmarks of holder discovery, holder classification, first buy analysis and market info lookups
+against the local mock APIs in benchmarks/mock_servers.py.
+
+    python -m benchmarks.run_benchmarks --output results.json
+    python -m benchmarks.run_benchmarks --baseline results.json
+
+With --baseline, a scenario whose throughput dropped by more than --tolerance is reported as a regression and the
+exit code is 1.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List
+
+from benchmarks.mock_servers import MockApiConfig, MockApiServer, mock_pubkey
+from shitcoins.settings import reload_settings
+from shitcoins.sol.rpc_session import reset_rpc_session
+
+# settings the app reads from the environment, chosen so runs are quick and never touch a real service
+BENCHMARK_ENV = {
+    'SOLSCAN_API_KEY': 'benchmark',
+    'RESERVED_CPUS': '0',
+    'RUN_WITH_DB': 'false',
+    'MIN_HOLDER_COUNT': '1',
+    'FRESH_WALLET_HOURS': '24',
+    'SOLSCAN_MAX_TRNS_PER_REQ': '50',
+    'SOLSCAN_SKIP_THRESHOLD': '200',
+    'TOO_MANY_REQUESTS_BACKOFF_SEC': '1',
+    'SOLANA_SKIP_THRESHOLD': '1000',
+    'SOLANA_CACHE_PATH': '',
+    'SOLANA_CU_PER_SEC': '100000',
+}
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    size: int
+    coins: int
+    total_sec: float
+    # holders, signatures or addresses processed per second, depending on the scenario
+    items_per_sec: float
+    p50_sec: float
+    p99_sec: float
+    requests_per_coin: float
+    rate_limited_per_coin: float
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))]
+
+
+def _run_scenario(name: str, server: MockApiServer, size: int, coins: int, run_coin: Callable[[str], int]) \
+        -> ScenarioResult:
+    """
+    :param run_coin: processes one coin and returns how many items it processed
+    """
+    server.config.holders_per_token = size
+    server.config.first_block_signatures = size
+    server.config.signatures_per_mint = max(300, size + 1)
+    server.reset_counts()
+
+    latencies = []
+    items = 0
+    start_time = time.monotonic()
+    for i in range(coins):
+        coin_start = time.monotonic()
+        items += run_coin(mock_pubkey(f"{name}:{size}:coin:{i}"))
+        latencies.append(time.monotonic() - coin_start)
+    total_sec = time.monotonic() - start_time
+
+    requests = sum(count for key, count in server.request_counts.items() if not key.endswith(' 429'))
+    rate_limited = sum(count for key, count in server.request_counts.items() if key.endswith(' 429'))
+    return ScenarioResult(name=name, size=size, coins=coins, total_sec=round(total_sec, 3),
+                          items_per_sec=round(items / total_sec, 2),
+                          p50_sec=round(statistics.median(latencies), 3),
+                          p99_sec=round(_percentile(latencies, 99), 3),
+                          requests_per_coin=round(requests / coins, 1),
+                          rate_limited_per_coin=round(rate_limited / coins, 1))
+
+
+def get_holders_scenario(coin_address: str) -> int:
+    from shitcoins.get_holders import get_holders
+    return len(get_holders(coin_address))
+
+
+def classification_scenario(coin_address: str) -> int:
+    from shitcoins.check_holder_transfers import multiprocess_coin_holders
+    from shitcoins.get_holders import get_holders
+    coin_data = {'coin_address': coin_address, 'market_info': None, 'first_buy_statistics': None,
+                 'holders': get_holders(coin_address)}
+    return len(multiprocess_coin_holders(coin_data)['holders'])
+
+
+def first_buys_scenario(coin_address: str) -> int:
+    from shitcoins.sol.rpc_session import get_rpc_session
+    from shitcoins.sol.solana_client import analyse_first_buys
+
+    async def analyse():
+        try:
+            return await analyse_first_buys(coin_address, time_budget_sec=60)
+        finally:
+            await get_rpc_session().close()
+
+    statistics_ = asyncio.run(analyse())
+    if statistics_['status'] != 'COMPLETE':
+        raise RuntimeError(f"First buy analysis of {coin_address} ended {statistics_['status']}")
+    return statistics_['duplicate_wallet_count']
+
+
+def dexscreener_scenario(size: int) -> Callable[[str], int]:
+    def fetch(coin_address: str) -> int:
+        from shitcoins.dex.dexscreener_client import DexScreenerClient
+        client = DexScreenerClient()
+        try:
+            return len(client.fetch_market_info([mock_pubkey(f"{coin_address}:{i}") for i in range(size)]))
+        finally:
+            client.close()
+    return fetch
+
+
+SCENARIOS: Dict[str, Callable[[int], Callable[[str], int]]] = {
+    'get_holders': lambda size: get_holders_scenario,
+    'classification': lambda size: classification_scenario,
+    'first_buys': lambda size: first_buys_scenario,
+    'dexscreener': dexscreener_scenario,
+}
+DEFAULT_SIZES = {'get_holders': [50, 500], 'classification': [25, 100], 'first_buys': [20, 100],
+                 'dexscreener': [30, 300]}
+
+
+def run_benchmarks(scenarios: List[str], sizes: Dict[str, List[int]], coins: int, config: MockApiConfig) \
+        -> List[ScenarioResult]:
+    server = MockApiServer(config).start()
+    previous_env = {key: os.environ.get(key) for key in list(BENCHMARK_ENV) + list(server.env())}
+    os.environ.update(BENCHMARK_ENV)
+    os.environ.update(server.env())
+    reload_settings()
+    # the RPC session reads its endpoint once, make it pick up the mock server's
+    reset_rpc_session()
+    try:
+        results = []
+        for name in scenarios:
+            for size in sizes[name]:
+                result = _run_scenario(name, server, size, coins, SCENARIOS[name](size))
+                print(f"{result.name:<15} size={result.size:<5} {result.items_per_sec:>9.2f} items/s  "
+                      f"p50={result.p50_sec:.3f}s  p99={result.p99_sec:.3f}s  "
+                      f"requests/coin={result.requests_per_coin}  429s/coin={result.rate_limited_per_coin}")
+                results.append(result)
+        return results
+    finally:
+        server.stop()
+        reset_rpc_session()
+        for key, value in previous_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        reload_settings()
+
+
+def find_regressions(results: List[ScenarioResult], baseline: List[dict], tolerance: float) -> List[str]:
+    baseline_by_key = {(result['name'], result['size']): result for result in baseline}
+    regressions = []
+    for result in results:
+        previous = baseline_by_key.get((result.name, result.size))
+        if previous is not None and result.items_per_sec < previous['items_per_sec'] * (1 - tolerance):
+            regressions.append(f"{result.name} size={result.size}: {result.items_per_sec} items/s, "
+                               f"baseline {previous['items_per_sec']} items/s")
+    return regressions
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenario', action='append', choices=list(SCENARIOS),
+                        help='scenario to run, may be repeated, defaults to all')
+    parser.add_argument('--size', action='append', type=int,
+                        help='holder/signature/address count to run every scenario at, may be repeated')
+    parser.add_argument('--coins', type=int, default=3, help='coins per scenario and size')
+    parser.add_argument('--latency-ms', type=float, default=20, help='latency the mock APIs add to each response')
+    parser.add_argument('--rate-limit', type=float, default=0,
+                        help='requests per second per mock API before it answers 429, 0 for unlimited')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare throughput against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='throughput drop reported as a regression')
+    args = parser.parse_args(argv)
+
+    scenarios = args.scenario or list(SCENARIOS)
+    sizes = {name: args.size or DEFAULT_SIZES[name] for name in scenarios}
+    config = MockApiConfig(latency_sec=args.latency_ms / 1000, rate_limit_per_sec=args.rate_limit)
+    results = run_benchmarks(scenarios, sizes, args.coins, config)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump([asdict(result) for result in results], file, indent=4)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = find_regressions(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
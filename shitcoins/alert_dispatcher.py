@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Dict, List, Tuple
+
+import requests
+
+from shitcoins.metrics.registry import get_metrics
+from shitcoins.metrics.tracing import span
+from shitcoins.replay.transports import mount_http_adapter
+
+LOGGER = logging.getLogger(__name__)
+
+# Telegram rejects longer message texts
+MAX_MESSAGE_LENGTH = 4096
+COMBINED_MESSAGE_SEPARATOR = '\n' + '-' * 20 + '\n'
+
+
+class AlertDispatcher:
+    """
+    Queues Telegram alerts and sends them from a background task, so a slow or rate limited Bot API never holds up
+    the scan loop. Sends are spaced per chat and globally to stay under Telegram's flood limits, a 429 is retried
+    after its retry_after, and alerts that pile up for the same chat during a burst are combined into one message.
+    """
+
+    def __init__(self, bot_token: str, per_chat_interval_sec: float = 3.0, global_messages_per_sec: float = 30,
+                 max_combined: int = 5, max_attempts: int = 5):
+        self._url = f'https://api.telegram.org/bot{bot_token}/sendMessage'
+        self._per_chat_interval_sec = per_chat_interval_sec
+        self._global_interval_sec = 1 / global_messages_per_sec
+        self._max_combined = max_combined
+        self._max_attempts = max_attempts
+        self._session = requests.Session()
+        mount_http_adapter(self._session, pool_connections=1, pool_maxsize=1)
+        self._queue: asyncio.Queue[Tuple[str, str]] | None = None
+        self._task: asyncio.Task | None = None
+        self._chat_next_send_at: Dict[str, float] = {}
+        self._next_send_at = 0.0
+        self.sent_count = 0
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    def enqueue(self, message: str, chat_id: str):
+        """
+        Queues a message without waiting for it to be sent
+        """
+        self._queue.put_nowait((chat_id, message))
+
+    async def join(self):
+        """
+        Waits until every queued message was sent or given up on
+        """
+        await self._queue.join()
+
+    async def close(self, drain_timeout_sec: float = 10):
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self.join(), drain_timeout_sec)
+        except asyncio.TimeoutError:
+            LOGGER.warning(f"Dropping {self._queue.qsize()} unsent alerts")
+        self._task.cancel()
+        self._task = None
+        self._session.close()
+
+    async def _run(self):
+        while True:
+            burst = [await self._queue.get()]
+            while not self._queue.empty():
+                burst.append(self._queue.get_nowait())
+            try:
+                for chat_id, message in self._combine(burst):
+                    await self._send(chat_id, message)
+            except Exception as e:
+                LOGGER.error(f"Failed to send alerts: {e}")
+            finally:
+                for _ in burst:
+                    self._queue.task_done()
+
+    def _combine(self, burst: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        chat_to_messages: Dict[str, List[str]] = {}
+        for chat_id, message in burst:
+            chat_to_messages.setdefault(chat_id, []).append(message)
+
+        chat_to_combined: Dict[str, List[str]] = {}
+        for chat_id, messages in chat_to_messages.items():
+            combined = chat_to_combined[chat_id] = []
+            parts: List[str] = []
+            for message in messages:
+                if parts and (len(parts) >= self._max_combined or
+                              len(COMBINED_MESSAGE_SEPARATOR.join(parts + [message])) > MAX_MESSAGE_LENGTH):
+                    combined.append(COMBINED_MESSAGE_SEPARATOR.join(parts))
+                    parts = []
+                parts.append(message)
+            combined.append(COMBINED_MESSAGE_SEPARATOR.join(parts))
+
+        # round robin over chats, so one chat's spacing does not hold up the others
+        return [(chat_id, combined[i])
+                for i in range(max(len(combined) for combined in chat_to_combined.values()))
+                for chat_id, combined in chat_to_combined.items() if i < len(combined)]
+
+    async def _wait_for_send_slot(self, chat_id: str):
+        now = time.monotonic()
+        send_at = max(now, self._next_send_at, self._chat_next_send_at.get(chat_id, 0.0))
+        self._next_send_at = send_at + self._global_interval_sec
+        self._chat_next_send_at[chat_id] = send_at + self._per_chat_interval_sec
+        if send_at > now:
+            await asyncio.sleep(send_at - now)
+
+    async def _send(self, chat_id: str, message: str):
+        payload = {
+            'chat_id': chat_id,
+            'text': message,
+            'parse_mode': 'HTML',
+            'disable_web_page_preview': True
+        }
+        for attempt in range(1, self._max_attempts + 1):
+            await self._wait_for_send_slot(chat_id)
+            start_time = time.monotonic()
+            try:
+                with span('telegram_bot sendMessage', 'api', chat_id=chat_id, attempt=attempt):
+                    response = await asyncio.to_thread(self._session.post, self._url, data=payload)
+            except requests.RequestException as e:
+                get_metrics().record_request('telegram_bot', 'error', time.monotonic() - start_time)
+                LOGGER.warning(f"Attempt {attempt} to send alert to {chat_id} failed: {e}")
+                continue
+            get_metrics().record_request('telegram_bot', response.status_code, time.monotonic() - start_time)
+
+            if response.status_code == 200:
+                self.sent_count += 1
+                return
+            if response.status_code == 429:
+                retry_after = response.json().get('parameters', {}).get('retry_after', self._per_chat_interval_sec)
+                LOGGER.warning(f"Telegram flood limit hit for {chat_id}, retrying in {retry_after} seconds")
+                # nothing can be sent to the chat before retry_after
+                self._chat_next_send_at[chat_id] = time.monotonic() + retry_after
+                get_metrics().inc('shitcoins_provider_retries_total', {'provider': 'telegram_bot'})
+                continue
+            LOGGER.error(f"Telegram rejected alert to {chat_id}: {response.status_code} - {response.text}")
+            return
+        LOGGER.error(f"Giving up on alert to {chat_id} after {self._max_attempts} attempts")
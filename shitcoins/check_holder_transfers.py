@@ -1,33 +1,33 @@
 from __future__ import annotations
 
 import logging
-import multiprocessing
+import math
 import os
-import json
+import multiprocessing
 import re
+import threading
 import time
-from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
 from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
 
-from dotenv import load_dotenv
-import requests
 import psycopg2
 import psycopg2.extras
 from shitcoins.model.coin_data import CoinData, Holder
 from shitcoins.database.table.wallet_repository import WalletRepository
+from shitcoins.metrics.registry import get_metrics
+from shitcoins.metrics.tracing import span, trace
 from shitcoins.mp.lock_counter import LockCounter
 from shitcoins.mp.multi_process_rate_limiter import MultiProcessRateLimiter
+from shitcoins.providers.base import ProviderError, RateLimitedError
+from shitcoins.providers.registry import check_holder_providers, get_holder_provider, get_latency_windows
+from shitcoins.settings import Settings, get_settings
+from shitcoins.sol.compute_unit_rate_limiter import get_compute_unit_budget
+from shitcoins.sol.known_address_registry import EXCLUDED_STATUS
 
 LOGGER = logging.getLogger(__name__)
 
-load_dotenv()
-
-API_KEY = os.getenv('SOLSCAN_API_KEY')
-RESERVED_CPUS = int(os.getenv('RESERVED_CPUS'))
-
-if not API_KEY:
-    raise ValueError("API key not found. Please set it in the .env file.")
-
 solana_address_pattern = re.compile(r"^[A-HJ-NP-Za-km-z1-9]{32,44}$")
 
 
@@ -36,15 +36,19 @@ def is_valid_solana_address(address):
     return bool(solana_address_pattern.match(address))
 
 
-def get_first_transfer_time_or_status(holder_addr: str, current_time: datetime) -> (
+def get_first_transfer_time_or_status(holder_addr: str, current_time: datetime, settings: Settings | None = None) -> (
         None | str | tuple[datetime, int]):
     if not is_valid_solana_address(holder_addr):
         LOGGER.info(f"Invalid Solana address: {holder_addr}")
         return "UNKNOWN"
 
-    max_trns_per_req = int(os.getenv('SOLSCAN_MAX_TRNS_PER_REQ'))
-    skip_threshold = int(os.getenv('SOLSCAN_SKIP_THRESHOLD'))
+    settings = settings or get_settings()
+    max_trns_per_req = settings.solscan_max_trns_per_req
+    skip_threshold = settings.solscan_skip_threshold
+    fresh_wallet_age = timedelta(hours=settings.fresh_wallet_hours)
+    provider = get_holder_provider(settings)
     total_transactions = 0
+    cursor = None
 
     while True:
         if total_transactions >= skip_threshold:
@@ -53,64 +57,73 @@ def get_first_transfer_time_or_status(holder_addr: str, current_time: datetime)
             # we know its old, so set a really old time
             return (current_time - timedelta(days=10)), total_transactions
 
-        url = (f"https://pro-api.solscan.io/v1.0/account/solTransfers?account={holder_addr}"
-               f"&limit={max_trns_per_req}&offset={total_transactions}")
-        headers = {
-            'accept': 'application/json',
-            'token': API_KEY
-        }
-
-        response = requests.get(url, headers=headers)
-
-        if response.status_code == 200:
-            try:
-                data = response.json()['data']
-                if not data:
-                    break
-
-                total_transactions += len(data)
-                latest_transfer_time = (datetime.fromtimestamp(data[0]['blockTime'], tz=timezone.utc)
-                                        .replace(microsecond=0))
-                earliest_transfer_time = (datetime.fromtimestamp(data[len(data) - 1]['blockTime'], tz=timezone.utc)
-                                          .replace(microsecond=0))
-                last_tx_hash = data[-1]['txHash']
-
-                # check for fresh/old
-                if (len(data) < max_trns_per_req or current_time - latest_transfer_time
-                        > timedelta(hours=int(os.getenv('FRESH_WALLET_HOURS')))):
-                    # return potential fresh/old with total transactions
-                    return earliest_transfer_time, total_transactions
-            except json.JSONDecodeError as e:
-                LOGGER.error(f"JSON decode error: {e}")
-                break
-        elif response.status_code == 504:
-            LOGGER.error(f"504 error - unknown address: {holder_addr}")
-            return "UNKNOWN"
-        elif response.status_code == 429:
-            LOGGER.error(f"Error: {response.status_code} - {response.text}")
-            time.sleep(int(os.getenv('TOO_MANY_REQUESTS_BACKOFF_SEC', 60)))
-        else:
-            LOGGER.error(f"Error: {response.status_code} - {response.text}")
+        try:
+            page = provider.activity_page(holder_addr, max_trns_per_req, cursor)
+        except RateLimitedError as e:
+            LOGGER.error(str(e))
+            get_metrics().inc('shitcoins_provider_retries_total', {'provider': provider.name})
+            time.sleep(settings.too_many_requests_backoff_sec)
+            continue
+        except ProviderError as e:
+            LOGGER.error(f"{e} - unknown address: {holder_addr}")
             return "UNKNOWN"
 
+        block_times = page.block_times
+        if not block_times:
+            break
+
+        total_transactions += len(block_times)
+        latest_transfer_time = datetime.fromtimestamp(block_times[0], tz=timezone.utc).replace(microsecond=0)
+        earliest_transfer_time = datetime.fromtimestamp(block_times[-1], tz=timezone.utc).replace(microsecond=0)
+
+        # check for fresh/old
+        if page.cursor is None or current_time - latest_transfer_time > fresh_wallet_age:
+            # return potential fresh/old with total transactions
+            return earliest_transfer_time, total_transactions
+        cursor = page.cursor
+
     return "UNKNOWN"
 
 
-def check_holder(holder: Holder, lock_counter: LockCounter) -> Holder:
-    lock_counter.wait()
+@contextmanager
+def _open_wallet_repository(settings: Settings) -> Iterator[WalletRepository]:
+    """
+    Connects to the wallet database for the duration of the with block, so connections never pile up on the server
+    """
+    conn = psycopg2.connect(
+        database='shitcoins', user=settings.db_user, host='0.0.0.0', port=settings.db_port
+    )
+    try:
+        conn.autocommit = True
+        yield WalletRepository(conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor))
+    finally:
+        conn.close()
+
+
+def check_holder(holder: Holder, lock_counter: LockCounter, wallet_repo: WalletRepository | None = None,
+                 settings: Settings | None = None) -> Holder:
+    """
+    :holder: holder to classify as FRESH or OLD, updated in place
+    :lock_counter: shared rate limiter lock counter
+    :wallet_repo: if running with a database, an existing repository to reuse, otherwise a new connection is made
+    :settings: settings passed on from the parent process, defaults to this process's
+    """
+    settings = settings or get_settings()
+    if settings.run_with_db and wallet_repo is None:
+        with _open_wallet_repository(settings) as wallet_repo:
+            return check_holder(holder, lock_counter, wallet_repo, settings)
+    with span('solscan limiter wait', 'limiter'), \
+            get_metrics().timed('shitcoins_rate_limiter_wait_seconds', {'limiter': 'solscan'}):
+        lock_counter.wait()
     LOGGER.info(f"Processing holder: {holder}")
 
-    wallet_repo = None
     wallet_entry = None
-    if os.getenv('RUN_WITH_DB').lower() == 'true':
-        # todo - creating a new connection everytime may be inefficient, consider alternative
-        conn = psycopg2.connect(
-            database='shitcoins', user=os.getenv('DB_USER'), host='0.0.0.0', port=os.getenv('DB_PORT')
-        )
-        conn.autocommit = True
-
-        wallet_repo = WalletRepository(conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor))
-        wallet_entry = wallet_repo.get_wallet_entry(holder['address'])
+    if settings.run_with_db:
+        with span('db get_wallet_entry', 'db'), \
+                get_metrics().timed('shitcoins_provider_request_duration_seconds', {'provider': 'db'}):
+            wallet_entry = wallet_repo.get_wallet_entry(holder['address'])
+        get_metrics().inc('shitcoins_cache_requests_total',
+                          {'cache': 'wallet_db', 'result': 'miss' if wallet_entry is None else 'hit'})
         # prematurely return if holder address is not fresh to save api request and time
         if wallet_entry is not None and (wallet_entry['status'] == 'OLD'):
             holder['status'] = wallet_entry['status']
@@ -118,12 +131,12 @@ def check_holder(holder: Holder, lock_counter: LockCounter) -> Holder:
             return holder
 
     current_time = datetime.now(timezone.utc)
-    result = get_first_transfer_time_or_status(holder['address'], current_time)
+    result = get_first_transfer_time_or_status(holder['address'], current_time, settings)
 
     if isinstance(result, tuple):
         blocktime, total_transactions = result
         time_diff = current_time - blocktime
-        is_within_24_hours = time_diff <= timedelta(hours=int(os.getenv('FRESH_WALLET_HOURS')))
+        is_within_24_hours = time_diff <= timedelta(hours=settings.fresh_wallet_hours)
         holder['status'] = "FRESH" if is_within_24_hours else "OLD"
         holder['transactions_count'] = total_transactions
         hours_diff = time_diff.total_seconds() / 3600
@@ -134,35 +147,271 @@ def check_holder(holder: Holder, lock_counter: LockCounter) -> Holder:
         holder['status'] = result
 
     if wallet_repo is not None and holder['status'] != "UNKNOWN":
-        if wallet_entry is None:
-            wallet_repo.insert_new_wallet_entry(holder)
-        else:
-            wallet_repo.update_wallet_entry(holder)
+        with span('db save_wallet_entry', 'db'):
+            if wallet_entry is None:
+                wallet_repo.insert_new_wallet_entry(holder)
+            else:
+                wallet_repo.update_wallet_entry(holder)
     return holder
 
 
-# Function to process files and update the JSON based on transfer times
-def multiprocess_coin_holders(coin_data: CoinData) -> CoinData:
-    total_holders_count = len(coin_data['holders'])
-    print(f"Assessing {total_holders_count} holder wallet addresses..")
-
-    mp_rate_limiter = MultiProcessRateLimiter(max_requests=1000, per_seconds=60)
-    lock_counter: LockCounter = mp_rate_limiter.get_lock_counter()
+def check_holder_batch(holder_addresses: List[str], lock_counter: LockCounter, settings: Settings | None = None) \
+        -> List[Tuple[str, str, int]]:
+    """
+    Classifies a batch of holders inside a worker process. Only addresses are sent to the worker and only
+    (address, status, transactions_count) tuples are sent back, so IPC cost is paid once per batch.
+    """
+    settings = settings or get_settings()
+    results = []
+    # one connection for the whole batch, closed once the batch is done
+    with _open_wallet_repository(settings) if settings.run_with_db else nullcontext() as wallet_repo:
+        for holder_address in holder_addresses:
+            with span('check_holder', holder=holder_address):
+                holder = check_holder(Holder(address=holder_address, status='UNKNOWN', transactions_count=0),
+                                      lock_counter, wallet_repo, settings)
+            results.append((holder['address'], holder['status'], holder['transactions_count']))
+    return results
+
+
+def _check_holder_batch_with_metrics(holder_addresses: List[str], lock_counter: LockCounter,
+                                     trace_id: str | None = None, settings: Settings | None = None) \
+        -> Tuple[List[Tuple[str, str, int]], dict]:
+    """
+    Runs check_holder_batch and sends the metrics the worker recorded for it back along with the results
+    :param trace_id: trace of the coin the holders belong to, the worker's spans are attributed to it
+    """
+    with trace(trace_id):
+        results = check_holder_batch(holder_addresses, lock_counter, settings)
+    return results, get_metrics().snapshot(reset=True)
+
+
+def _chunk_holder_addresses(holder_addresses: List[str], max_workers: int, max_batch_size: int | None = None) \
+        -> List[List[str]]:
+    # large enough batches to amortise IPC, but never so large that workers are left idle
+    max_batch_size = max_batch_size or get_settings().holder_batch_size
+    batch_size = max(1, min(max_batch_size, math.ceil(len(holder_addresses) / max_workers)))
+    return [holder_addresses[x:x + batch_size] for x in range(0, len(holder_addresses), batch_size)]
+
+
+class HolderClassificationPool:
+    """
+    Worker processes and the Solscan rate limiter they share, created once per process and used by every coin, so the
+    rate limit holds across coins and a coin stopped at its deadline leaves no pool behind. The rate limiter is cycled
+    by a background thread while batches are in flight, also those of a coin whose results are no longer wanted.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        # created before the workers are forked, so they inherit the compute unit budget shared with bundle analysis
+        # and the provider latencies hedged requests are timed by
+        get_compute_unit_budget()
+        get_latency_windows()
+        self._executor = ProcessPoolExecutor(max_workers=max_workers)
+        self._rate_limiter = MultiProcessRateLimiter(max_requests=1000, per_seconds=60)
+        self._lock_counter: LockCounter = self._rate_limiter.get_lock_counter()
+        self._lock = threading.Lock()
+        self._in_flight: Set[Future] = set()
+        # threads of this process waiting for a request slot, see wait_for_request_slot
+        self._waiting = 0
+        self._has_work = threading.Event()
+        self._closing = False
+        self._cycler = threading.Thread(target=self._cycle_rate_limiter, name='classification-rate-limiter',
+                                        daemon=True)
+        self._cycler.start()
+
+    def _cycle_rate_limiter(self):
+        while True:
+            self._has_work.wait()
+            with self._lock:
+                if self._closing and not self._in_flight and not self._waiting:
+                    return
+            # calling this method carries out the rate limit calculation
+            self._rate_limiter.cycle()
+
+    def _batch_done(self, future: Future):
+        with self._lock:
+            self._in_flight.discard(future)
+            self._clear_if_idle()
+        if not future.cancelled() and future.exception() is None:
+            # merged here rather than by the caller, so batches finishing after a deadline are still counted
+            get_metrics().merge(future.result()[1])
+
+    def _clear_if_idle(self):
+        # called holding the lock
+        if not self._in_flight and not self._waiting and not self._closing:
+            self._has_work.clear()
+
+    def wait_for_request_slot(self):
+        """
+        Waits until a Solscan request may be made from this process, e.g. by the funding stage, counted against the
+        same rate limit as the workers' requests
+        """
+        with self._lock:
+            self._waiting += 1
+            self._has_work.set()
+        try:
+            self._lock_counter.wait()
+        finally:
+            with self._lock:
+                self._waiting -= 1
+                self._clear_if_idle()
+
+    def submit(self, holder_addresses: List[str], trace_id: str | None, settings: Settings) -> Future:
+        """
+        :return: future of the batch's (address, status, transactions_count) results and worker metrics
+        """
+        with self._lock:
+            future = self._executor.submit(_check_holder_batch_with_metrics, holder_addresses, self._lock_counter,
+                                           trace_id, settings)
+            self._in_flight.add(future)
+            self._has_work.set()
+        future.add_done_callback(self._batch_done)
+        return future
+
+    def close(self, wait: bool = True):
+        """
+        Cancels the batches not started yet, the running ones finish first
+        """
+        with self._lock:
+            self._closing = True
+            self._has_work.set()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+        if wait:
+            self._cycler.join()
+
+
+_classification_pool: HolderClassificationPool | None = None
+_classification_pool_pid: int | None = None
+
+
+def get_classification_pool(max_workers: int | None = None) -> HolderClassificationPool:
+    """
+    :param max_workers: worker processes of the pool when it is created, by default one per CPU but one
+    :return: the classification pool of this process
+    """
+    global _classification_pool, _classification_pool_pid
+    if _classification_pool is None or _classification_pool_pid != os.getpid():
+        _classification_pool = HolderClassificationPool(max_workers or max(1, multiprocessing.cpu_count() - 1))
+        _classification_pool_pid = os.getpid()
+    return _classification_pool
+
+
+def reset_classification_pool():
+    """
+    Closes the process wide classification pool, the next get_classification_pool call creates a new one
+    """
+    global _classification_pool, _classification_pool_pid
+    if _classification_pool is not None and _classification_pool_pid == os.getpid():
+        _classification_pool.close()
+    _classification_pool = None
+    _classification_pool_pid = None
+
+
+def iter_classified_holders(holder_address_batches: Iterable[List[str]], settings: Settings | None = None,
+                            trace_id: str | None = None, max_workers: int | None = None,
+                            deadline: float | None = None) -> Iterator[Tuple[str, str, int]]:
+    """
+    Classifies holders in the worker processes of the classification pool, yielding (address, status,
+    transactions_count) as batches complete. Batches are taken from holder_address_batches lazily and only a few per
+    worker are in flight at any time, so an endless stream of addresses is classified at the full rate limit without
+    ever being held in memory.
+    :param trace_id: trace of the coin the holders belong to, the workers' spans are attributed to it
+    :param max_workers: worker processes of the classification pool, if it is not created yet
+    :param deadline: optional time.monotonic() value at which to stop, batches not started by then are cancelled and
+    the running ones finish in the background without their results being yielded
+    """
+    settings = settings or get_settings()
+    pool = get_classification_pool(max_workers)
+
+    holder_address_batches = iter(holder_address_batches)
+    futures: List[Future] = []
+    exhausted = False
+    try:
+        while deadline is None or time.monotonic() < deadline:
+            # two batches per worker keep every worker busy while results are collected
+            while not exhausted and len(futures) < 2 * pool.max_workers:
+                holder_addresses = next(holder_address_batches, None)
+                if holder_addresses is None:
+                    exhausted = True
+                elif holder_addresses:
+                    futures.append(pool.submit(holder_addresses, trace_id, settings))
+            if not futures:
+                break
 
-    futures = []
-    result = []
-    with ProcessPoolExecutor(max_workers=multiprocessing.cpu_count() - 1) as executor:
-        for holder in coin_data['holders']:
-            futures.append(executor.submit(check_holder, holder, lock_counter))
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in [future for future in futures if future in done]:
+                futures.remove(future)
+                results, _ = future.result()
+                for holder_address, status, transactions_count in results:
+                    get_metrics().inc('shitcoins_holders_classified_total', {'status': status})
+                    yield holder_address, status, transactions_count
+    finally:
+        # stopped early, only this coin's batches not started yet are dropped, the pool goes on with other coins
+        for future in futures:
+            future.cancel()
+
+
+def _classify_from_wallet_db(address_to_holder: Dict[str, Holder], settings: Settings) -> List[str]:
+    """
+    Answers the holders the wallet database already knows to be OLD with one query, since they would cost no api
+    request in a worker either
+    :return: addresses still to classify, in their original (supply rank) order
+    """
+    with span('db get_wallet_entries', 'db', holders=len(address_to_holder)), \
+            get_metrics().timed('shitcoins_provider_request_duration_seconds', {'provider': 'db'}), \
+            _open_wallet_repository(settings) as wallet_repo:
+        wallet_entries = wallet_repo.get_wallet_entries(list(address_to_holder))
+    known_old = set()
+    for wallet_entry in wallet_entries:
+        if wallet_entry['status'] == 'OLD' and wallet_entry['address'] in address_to_holder:
+            address_to_holder[wallet_entry['address']]['status'] = wallet_entry['status']
+            address_to_holder[wallet_entry['address']]['transactions_count'] = wallet_entry['transactions_count']
+            known_old.add(wallet_entry['address'])
+    get_metrics().inc('shitcoins_cache_requests_total', {'cache': 'wallet_db', 'result': 'hit'}, len(known_old))
+    return [address for address in address_to_holder if address not in known_old]
 
-        while len(futures):
-            # calling this method carries out the rate limit calculation
-            mp_rate_limiter.cycle()
 
-            for future in futures:
-                if future.done():
-                    result.append(future.result())
-                    futures.remove(future)
+# Function to process files and update the JSON based on transfer times
+def multiprocess_coin_holders(coin_data: CoinData, settings: Settings | None = None, deadline: float | None = None) \
+        -> CoinData:
+    """
+    :settings: shipped to the workers with every batch, defaults to this process's
+    :deadline: optional time.monotonic() value, holders not classified by then keep their UNKNOWN status and the
+    coin's classification_status is PARTIAL
+    """
+    settings = settings or get_settings()
+    check_holder_providers(settings)
+    total_holders_count = len(coin_data['holders'])
+    print(f"Assessing {total_holders_count} holder wallet addresses..")
 
-    coin_data['holders'] = result
+    # known infrastructure accounts are tagged by get_holders - no need to spend api requests on them
+    address_to_holder: Dict[str, Holder] = {holder['address']: holder for holder in coin_data['holders']
+                                            if holder['status'] != EXCLUDED_STATUS}
+    max_workers = get_classification_pool().max_workers
+
+    start_time = time.monotonic()
+    # only the cache misses are sent to the workers, top holders by supply first so they are classified before the
+    # coin's deadline cuts classification short
+    pending_addresses = _classify_from_wallet_db(address_to_holder, settings) \
+        if settings.run_with_db and address_to_holder else list(address_to_holder)
+    classified_count = len(address_to_holder) - len(pending_addresses)
+    holder_address_batches = _chunk_holder_addresses(pending_addresses, max_workers, settings.holder_batch_size)
+    for holder_address, status, transactions_count in iter_classified_holders(
+            holder_address_batches, settings, coin_data.get('trace_id'), max_workers, deadline):
+        address_to_holder[holder_address]['status'] = status
+        address_to_holder[holder_address]['transactions_count'] = transactions_count
+        classified_count += 1
+    coin_data['classification_status'] = 'COMPLETE' if classified_count == len(address_to_holder) else 'PARTIAL'
+    if classified_count < len(address_to_holder):
+        print(f"Deadline passed with {len(address_to_holder) - classified_count} of {len(address_to_holder)} "
+              f"holders of {coin_data['coin_address']} unclassified.")
+        get_metrics().inc('shitcoins_holders_unclassified_total', value=len(address_to_holder) - classified_count)
+
+    if address_to_holder:
+        # holders left unclassified by the deadline do not count, they would overstate throughput under overload
+        get_metrics().set_gauge('shitcoins_holders_classified_per_second',
+                                classified_count / (time.monotonic() - start_time))
+
+    # holders are updated in place, so they keep their original (supply) ordering
     return coin_data
@@ -0,0 +1,255 @@
+"""
+Batch commands running the pipeline's stages over lists of addresses, outside of the Telegram loop.
+
+    shitcoins classify-wallets wallets.txt --output wallets.ndjson --resume
+    cat mints.txt | shitcoins scan-coin --first-buys > coins.ndjson
+    shitcoins warm-cache mints.txt --output warmed.ndjson --resume
+
+Addresses are streamed one per line from a file or stdin, blank lines and lines starting with # are skipped. Every
+result is written as one JSON object per line as soon as it is ready, progress goes to stderr. With --resume, the
+addresses already in the --output file are skipped and new results are appended, so an interrupted backfill picks up
+where it stopped.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import sys
+import time
+from itertools import islice
+from typing import AsyncIterator, Iterable, Iterator, List, Set, TextIO
+
+from shitcoins.check_holder_transfers import is_valid_solana_address, iter_classified_holders
+from shitcoins.dex.dexscreener_client import MAX_ADDRESSES_PER_REQUEST, DexScreenerClient
+from shitcoins.main import process_coin
+from shitcoins.metrics.tracing import new_trace_id, span, trace
+from shitcoins.model.coin_data import CoinData
+from shitcoins.providers.registry import check_holder_providers
+from shitcoins.settings import Settings, SettingsError, get_settings
+from shitcoins.sol.rpc_session import get_rpc_session
+from shitcoins.sol.solana_client import analyse_first_buys
+
+LOGGER = logging.getLogger(__name__)
+
+
+def read_addresses(lines: Iterable[str], skip: Set[str] | None = None) -> Iterator[str]:
+    """
+    :param lines: lines of a file or stdin, read lazily
+    :param skip: addresses already processed, i.e. by a previous run being resumed
+    :return: each valid address once, in input order
+    """
+    seen = set(skip or ())
+    for line in lines:
+        address = line.strip()
+        if not address or address.startswith('#') or address in seen:
+            continue
+        seen.add(address)
+        if not is_valid_solana_address(address):
+            LOGGER.warning(f"Skipping invalid address {address}")
+            continue
+        yield address
+
+
+def completed_keys(output_path: str, key: str) -> Set[str]:
+    """
+    Reads what a previous run already wrote to output_path. A last line cut short by an interrupted run is removed,
+    so the resumed run appends whole lines only.
+    :param key: field identifying a result, i.e. address or coin_address
+    """
+    if not os.path.exists(output_path):
+        return set()
+    keys = set()
+    with open(output_path, 'r+b') as output_file:
+        complete_size = 0
+        for line in output_file:
+            if not line.endswith(b'\n'):
+                break
+            complete_size += len(line)
+            try:
+                keys.add(json.loads(line)[key])
+            except (ValueError, KeyError, TypeError):
+                LOGGER.warning(f"Ignoring unreadable line in {output_path}: {line[:80]!r}")
+        output_file.truncate(complete_size)
+    return keys
+
+
+def _write(output: TextIO, record: dict):
+    output.write(json.dumps(record, default=str) + '\n')
+    # flushed per line, so an interrupted run loses nothing that was already classified
+    output.flush()
+
+
+def _batched(addresses: Iterable[str], size: int) -> Iterator[List[str]]:
+    addresses = iter(addresses)
+    while batch := list(islice(addresses, size)):
+        yield batch
+
+
+def classify_wallets(addresses: Iterable[str], output: TextIO, settings: Settings) -> int:
+    """
+    Classifies wallets as FRESH or OLD at the full holder provider rate limit, saving them to the wallet database when
+    RUN_WITH_DB is set
+    :return: number of wallets classified
+    """
+    check_holder_providers(settings)
+    count = 0
+    for address, status, transactions_count in iter_classified_holders(
+            _batched(addresses, settings.holder_batch_size), settings):
+        _write(output, {'address': address, 'status': status, 'transactions_count': transactions_count})
+        count += 1
+    return count
+
+
+async def _no_first_buys() -> None:
+    return None
+
+
+async def _scan_coins(mint_addresses: Iterable[str], settings: Settings, first_buys: bool, classify: bool,
+                      market_info: bool = True, time_budget_sec: float | None = None) -> AsyncIterator[CoinData]:
+    """
+    Runs coins through the same stages as the Telegram loop, a DexScreener chunk of coins at a time. The bundle
+    analysis of every coin in a chunk runs concurrently with holder classification, as in the loop.
+    :param first_buys: analyse the first buys, which also fills the Solana transaction cache
+    :param classify: get and classify the holders, which also fills the wallet database when RUN_WITH_DB is set
+    """
+    time_budget_sec = time_budget_sec or settings.bundle_analysis_budget_sec
+    dexscreener_client = DexScreenerClient() if market_info else None
+    try:
+        for chunk in _batched(mint_addresses, MAX_ADDRESSES_PER_REQUEST):
+            address_to_market_info = await asyncio.to_thread(dexscreener_client.fetch_market_info, chunk) \
+                if dexscreener_client is not None else {}
+            coins_data = [CoinData(coin_address=address, market_info=address_to_market_info.get(address),
+                                   first_buy_statistics=None, holders=[], trace_id=new_trace_id())
+                          for address in chunk]
+            first_buy_tasks = {}
+            for coin_data in coins_data:
+                with trace(coin_data['trace_id']):
+                    first_buy_tasks[coin_data['coin_address']] = asyncio.create_task(
+                        analyse_first_buys(coin_data['coin_address'], time_budget_sec) if first_buys
+                        else _no_first_buys())
+            for coin_data in coins_data:
+                with trace(coin_data['trace_id']), span('coin', coin_address=coin_data['coin_address']):
+                    if classify:
+                        await process_coin(coin_data, first_buy_tasks[coin_data['coin_address']], settings)
+                    else:
+                        coin_data['first_buy_statistics'] = await first_buy_tasks[coin_data['coin_address']]
+                yield coin_data
+    finally:
+        if dexscreener_client is not None:
+            dexscreener_client.close()
+        await get_rpc_session().close()
+
+
+async def scan_coins(mint_addresses: Iterable[str], output: TextIO, settings: Settings, first_buys: bool = False,
+                     time_budget_sec: float | None = None) -> int:
+    """
+    Writes every coin with its market info, classified holders and, with first_buys, its first buy statistics
+    :return: number of coins scanned
+    """
+    count = 0
+    async for coin_data in _scan_coins(mint_addresses, settings, first_buys=first_buys, classify=True,
+                                       time_budget_sec=time_budget_sec):
+        _write(output, coin_data)
+        count += 1
+    return count
+
+
+async def warm_cache(mint_addresses: Iterable[str], output: TextIO, settings: Settings,
+                     time_budget_sec: float | None = None) -> int:
+    """
+    Fills the caches the Telegram loop reads from, the wallet database with the coins' holders when RUN_WITH_DB is
+    set and the Solana transaction cache with their first buys when SOLANA_CACHE_PATH is set, writing a summary
+    per coin
+    :return: number of coins warmed
+    """
+    if not settings.run_with_db and not settings.solana_cache_path:
+        raise ValueError("Nothing to warm, set RUN_WITH_DB and/or SOLANA_CACHE_PATH.")
+    count = 0
+    async for coin_data in _scan_coins(mint_addresses, settings, first_buys=settings.solana_cache_path is not None,
+                                       classify=settings.run_with_db, market_info=False,
+                                       time_budget_sec=time_budget_sec):
+        statuses = {}
+        for holder in coin_data['holders']:
+            statuses[holder['status']] = statuses.get(holder['status'], 0) + 1
+        first_buy_statistics = coin_data['first_buy_statistics']
+        _write(output, {'coin_address': coin_data['coin_address'], 'holders': len(coin_data['holders']),
+                        'statuses': statuses,
+                        'first_buys': first_buy_statistics['status'] if first_buy_statistics else None})
+        count += 1
+    return count
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='shitcoins', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_command(name: str, help_text: str) -> argparse.ArgumentParser:
+        command = subparsers.add_parser(name, help=help_text, description=help_text)
+        command.add_argument('input', nargs='?', default='-',
+                             help="file with one address per line, - (default) to read stdin")
+        command.add_argument('--output', '-o', help="file to write NDJSON results to, stdout by default")
+        command.add_argument('--resume', action='store_true',
+                             help="skip addresses already in --output and append to it")
+        return command
+
+    add_command('classify-wallets', "classify wallet addresses as FRESH or OLD")
+    scan_coin = add_command('scan-coin', "get market info and classified holders of mint addresses")
+    scan_coin.add_argument('--first-buys', action='store_true', help="also analyse each coin's first buys")
+    warm = add_command('warm-cache', "fill the wallet database and Solana transaction cache for mint addresses")
+    for command in (scan_coin, warm):
+        command.add_argument('--budget-sec', type=float,
+                             help="first buy analysis time per coin, BUNDLE_ANALYSIS_BUDGET_SEC by default")
+    return parser
+
+
+def main(argv: List[str] | None = None) -> int:
+    logging.basicConfig(level=logging.INFO)
+    parser = _parser()
+    args = parser.parse_args(argv)
+    if args.resume and not args.output:
+        parser.error("--resume needs --output to read previous results from")
+    try:
+        settings = get_settings()
+    except SettingsError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    key = 'address' if args.command == 'classify-wallets' else 'coin_address'
+    skip = completed_keys(args.output, key) if args.resume else set()
+    if skip:
+        print(f"Resuming {args.output}, skipping {len(skip)} addresses already done", file=sys.stderr)
+
+    start_time = time.monotonic()
+    with contextlib.ExitStack() as stack:
+        input_file = sys.stdin if args.input == '-' else stack.enter_context(open(args.input))
+        output = stack.enter_context(open(args.output, 'a' if args.resume else 'w')) if args.output \
+            else sys.stdout
+        # the pipeline prints its progress, which must not end up between the results on stdout
+        stack.enter_context(contextlib.redirect_stdout(sys.stderr))
+        addresses = read_addresses(input_file, skip)
+        try:
+            if args.command == 'classify-wallets':
+                count = classify_wallets(addresses, output, settings)
+            elif args.command == 'scan-coin':
+                count = asyncio.run(scan_coins(addresses, output, settings, args.first_buys, args.budget_sec))
+            else:
+                count = asyncio.run(warm_cache(addresses, output, settings, args.budget_sec))
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 2
+        except KeyboardInterrupt:
+            print("Interrupted, rerun with --resume to continue", file=sys.stderr)
+            return 130
+    elapsed_sec = time.monotonic() - start_time
+    print(f"{args.command}: {count} done in {elapsed_sec:.1f}s ({count / max(elapsed_sec, 1e-9):.1f}/s)",
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,4 +1,5 @@
 import logging
+from typing import List
 
 from shitcoins.model.coin_data import Holder
 from shitcoins.database.table.table import Table
@@ -22,6 +23,16 @@ class WalletRepository(Table):
     def get_wallet_entry(self, holder_address: str):
         return super()._get_entry_by_key(self.name, "address", holder_address)
 
+    def get_wallet_entries(self, holder_addresses: List[str]) -> List:
+        """
+        Selects the entries of many wallets in a single query
+        :param holder_addresses: addresses to look up, the ones without an entry are left out of the result
+        """
+        if not holder_addresses:
+            return []
+        self._cursor.execute(f"SELECT * FROM {self.name} WHERE address = ANY(%s)", (list(holder_addresses),))
+        return self._cursor.fetchall()
+
     def update_wallet_entry(self, holder: Holder):
         """
         Updates entries in wallet table according to provided statement
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import logging
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import requests
+
+from shitcoins.metrics.registry import get_metrics
+from shitcoins.metrics.tracing import span
+from shitcoins.model.dex_metric import DexMetric
+from shitcoins.model.market_info import MarketInfo
+from shitcoins.replay.transports import mount_http_adapter
+from shitcoins.settings import get_settings
+
+LOGGER = logging.getLogger(__name__)
+
+DEXSCREENER_TOKENS_URL = 'https://api.dexscreener.com/latest/dex/tokens/'
+# One or multiple, comma-separated token addresses (up to 30 addresses)
+MAX_ADDRESSES_PER_REQUEST = 30
+
+
+def aggregate_market_info(pairs: List[dict]) -> Dict[str, MarketInfo]:
+    """
+    Calculates market info per token from all of its DexScreener pairs in a single pass
+    """
+    address_to_dex_metric: Dict[str, DexMetric] = {}
+    for pair in pairs:
+        addr = pair['baseToken']['address']
+        if addr in address_to_dex_metric:
+            dex_metric = address_to_dex_metric[addr]
+            if 'fdv' in pair:
+                dex_metric['total_fdv'] += pair['fdv']
+                dex_metric['fdv_count'] += 1
+            # to do store social information like twitter from pair['info']['socials']
+        else:
+            # calculate average market_cap via average fdv,  but just use first pair's
+            # liquidity, price and creation time
+            pair_created_at = pair.get('pairCreatedAt')
+            address_to_dex_metric[addr] = DexMetric(total_fdv=pair['fdv'], fdv_count=1,
+                                                    liquidity=float(pair['liquidity']['usd']),
+                                                    price=float(pair['priceUsd']),
+                                                    token_name=pair['baseToken']['name'],
+                                                    created_at_utc=datetime.utcfromtimestamp(pair_created_at / 1000)
+                                                    if pair_created_at else None)
+
+    address_to_market_info: Dict[str, MarketInfo] = {}
+    for addr, dex_metric in address_to_dex_metric.items():
+        market_cap = float(dex_metric['total_fdv'] / dex_metric['fdv_count'])
+        address_to_market_info[addr] = MarketInfo(market_cap=market_cap,
+                                                  token_name=dex_metric['token_name'],
+                                                  liquidity=dex_metric['liquidity'],
+                                                  price=dex_metric['price'],
+                                                  created_at_utc=dex_metric['created_at_utc'])
+        LOGGER.info(f"Success: Calculated market info for {dex_metric['token_name']} "
+                    f"with DexScreener API")
+    return address_to_market_info
+
+
+class DexScreenerClient:
+    """
+    Fetches market info for any number of token addresses. Addresses are split into chunks of 30, each chunk
+    is requested concurrently over one pooled session and all pairs are aggregated once at the end.
+    """
+
+    def __init__(self, max_concurrent_requests: int = 8, tokens_url: str | None = None):
+        self._tokens_url = tokens_url or get_settings().dexscreener_tokens_url or DEXSCREENER_TOKENS_URL
+        self._session = requests.Session()
+        mount_http_adapter(self._session, pool_connections=1, pool_maxsize=max_concurrent_requests)
+        self._session.headers.update({'accept': 'application/json'})
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent_requests,
+                                            thread_name_prefix='dexscreener')
+
+    def fetch_market_info(self, pump_addresses: List[str]) -> Dict[str, MarketInfo]:
+        chunks_pump_addresses = [pump_addresses[x:x + MAX_ADDRESSES_PER_REQUEST]
+                                 for x in range(0, len(pump_addresses), MAX_ADDRESSES_PER_REQUEST)]
+        pairs = []
+        for chunk_pairs in self._executor.map(self._fetch_pairs, chunks_pump_addresses):
+            pairs.extend(chunk_pairs)
+        return aggregate_market_info(pairs)
+
+    def _fetch_pairs(self, chunk_pump_addresses: List[str]) -> List[dict]:
+        addresses = ','.join(chunk_pump_addresses)
+        start_time = time.monotonic()
+        try:
+            with span('dexscreener tokens', 'api', addresses=len(chunk_pump_addresses)):
+                response = self._session.get(self._tokens_url + addresses)
+        except requests.RequestException as e:
+            get_metrics().record_request('dexscreener', 'error', time.monotonic() - start_time)
+            LOGGER.error(f"dexscreener request failed for {addresses}: {e}")
+            return []
+        get_metrics().record_request('dexscreener', response.status_code, time.monotonic() - start_time)
+
+        if response.status_code != 200:
+            LOGGER.error(f"Error: {response.status_code} - {response.text}")
+            return []
+
+        try:
+            pairs = response.json()['pairs']
+        except (ValueError, KeyError) as e:
+            LOGGER.error(f"Unreadable dexscreener response for {addresses}: {e}")
+            return []
+        if pairs is None:
+            LOGGER.error(f"dexscreener did not return market info for {addresses}")
+            return []
+        return pairs
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self._session.close()
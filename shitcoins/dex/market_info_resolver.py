@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import logging
+import time
+from typing import Dict, List, Tuple
+
+from shitcoins.dex.dexscreener_client import DexScreenerClient
+from shitcoins.metrics.registry import get_metrics
+from shitcoins.model.market_info import MarketInfo
+
+LOGGER = logging.getLogger(__name__)
+
+
+class MarketInfoResolver:
+    """
+    Keeps addresses DexScreener has not indexed yet pending, each with its own retry schedule, so they are carried
+    over to later iterations instead of being dropped. Only unresolved addresses that are due are re-queried.
+    """
+
+    def __init__(self, dexscreener_client: DexScreenerClient, retry_delay_sec: float, max_attempts: int,
+                 max_retry_delay_sec: float | None = None):
+        self._dexscreener_client = dexscreener_client
+        self._retry_delay_sec = retry_delay_sec
+        self._max_retry_delay_sec = max_retry_delay_sec or retry_delay_sec * 8
+        self._max_attempts = max_attempts
+        # address -> (failed attempts, time of next attempt)
+        self._pending: Dict[str, Tuple[int, float]] = {}
+
+    @property
+    def pending_addresses(self) -> List[str]:
+        return list(self._pending)
+
+    def add(self, addresses: List[str]):
+        for address in addresses:
+            if address not in self._pending:
+                self._pending[address] = (0, 0.0)
+
+    def resolve(self, now: float | None = None) -> Dict[str, MarketInfo]:
+        """
+        Queries DexScreener for pending addresses that are due for another attempt
+        :return: market info of the addresses resolved by this call, which are no longer pending
+        """
+        now = time.monotonic() if now is None else now
+
+        resolved: Dict[str, MarketInfo] = {}
+        to_query = [address for address, (_, next_attempt_at) in self._pending.items() if next_attempt_at <= now]
+        if to_query:
+            address_to_market_info = self._dexscreener_client.fetch_market_info(to_query)
+            for address in to_query:
+                if address in address_to_market_info:
+                    resolved[address] = address_to_market_info[address]
+                    continue
+                attempts = self._pending[address][0] + 1
+                if attempts >= self._max_attempts:
+                    LOGGER.warning(f"Giving up on market info for {address} after {attempts} attempts.")
+                    del self._pending[address]
+                else:
+                    get_metrics().inc('shitcoins_provider_retries_total', {'provider': 'dexscreener'})
+                    retry_delay_sec = min(self._retry_delay_sec * 2 ** (attempts - 1), self._max_retry_delay_sec)
+                    self._pending[address] = (attempts, now + retry_delay_sec)
+                    LOGGER.info(f"Attempt {attempts} failed to get market info for {address}. "
+                                f"Retrying in {retry_delay_sec:.0f} seconds.")
+
+        for address in resolved:
+            self._pending.pop(address, None)
+        return resolved
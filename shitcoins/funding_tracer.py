@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+from shitcoins.check_holder_transfers import get_classification_pool
+from shitcoins.metrics.registry import get_metrics
+from shitcoins.metrics.tracing import span
+from shitcoins.model.coin_data import CoinData
+from shitcoins.model.funder_cluster import FunderCluster
+from shitcoins.providers.base import ProviderError, RateLimitedError
+from shitcoins.providers.solscan import SolscanProvider
+from shitcoins.settings import Settings, get_settings
+from shitcoins.sol.known_address_registry import KnownAddressRegistry, get_known_address_registry
+from shitcoins.store.funder_graph import FunderEdge, FunderGraph
+
+LOGGER = logging.getLogger(__name__)
+
+# 429s in a row after which a lookup fails, funding is optional and must not hold on to the Solscan budget
+MAX_RATE_LIMITED_RETRIES = 3
+
+
+class FundingTracer:
+    """
+    Follows each FRESH holder's first inbound SOL transfer back up to max_hops wallets and groups holders that share a
+    funder. Every edge looked up is memoized in the funder graph, so a funder common to many holders and coins costs
+    one Solscan lookup ever. Tracing stops at known addresses such as exchanges, which fund far too many wallets for a
+    shared funder to mean anything.
+    """
+
+    def __init__(self, funder_graph: FunderGraph, registry: KnownAddressRegistry | None = None,
+                 settings: Settings | None = None, max_concurrent_requests: int = 4,
+                 wait_for_request_slot: Callable[[], None] | None = None):
+        """
+        :param wait_for_request_slot: called before every Solscan request, by default the classification pool's, so
+        funding lookups share the Solscan rate limit with holder classification
+        """
+        self.funder_graph = funder_graph
+        self._wait_for_request_slot = wait_for_request_slot or (
+            lambda: get_classification_pool().wait_for_request_slot())
+        self._registry = registry or get_known_address_registry()
+        self._settings = settings
+        # funders are only found in Solscan's SOL transfers, whatever HOLDER_PROVIDERS is
+        self._solscan = SolscanProvider(settings)
+        self._lock = threading.Lock()
+        # wallets being looked up right now, holders sharing a funder wait for the one lookup instead of repeating it
+        self._in_flight: Dict[str, Future] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent_requests, thread_name_prefix='funding')
+
+    @property
+    def settings(self) -> Settings:
+        return self._settings or get_settings()
+
+    def funder_of(self, wallet: str, deadline: float | None = None) -> FunderEdge | None:
+        """
+        :param deadline: optional time.monotonic() value after which a lookup gives up
+        :return: the wallet's funder edge from the graph, or looked up and memoized, None if the lookup failed
+        """
+        edge = self.funder_graph.get(wallet)
+        get_metrics().inc('shitcoins_cache_requests_total',
+                          {'cache': 'funder_graph', 'result': 'miss' if edge is None else 'hit'})
+        if edge is not None:
+            return edge
+
+        with self._lock:
+            edge = self.funder_graph.get(wallet)
+            future = self._in_flight.get(wallet) if edge is None else None
+            owner = edge is None and future is None
+            if owner:
+                future = Future()
+                self._in_flight[wallet] = future
+        if edge is not None:
+            return edge
+        if not owner:
+            return future.result()
+
+        try:
+            edge = self._fetch_funder(wallet, deadline)
+            if edge is not None:
+                self.funder_graph.put(wallet, edge)
+            future.set_result(edge)
+            return edge
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[wallet]
+
+    def _fetch_funder(self, wallet: str, deadline: float | None = None) -> FunderEdge | None:
+        """
+        Pages through the wallet's SOL transfers, newest first, to find the first one it received
+        :param deadline: optional time.monotonic() value after which the lookup gives up
+        :return: the edge, with no funder if the wallet has more transfers than FUNDING_MAX_PAGES cover, None when
+        Solscan failed, could not be reached, kept rate limiting or the deadline passed, so the wallet is looked up
+        again next time
+        """
+        settings = self.settings
+        limit = settings.solscan_max_trns_per_req
+        transfers = []
+        page = 0
+        rate_limited_count = 0
+        while page < settings.funding_max_pages:
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            with span('solscan limiter wait', 'limiter', stage='funding'):
+                self._wait_for_request_slot()
+            try:
+                data = self._solscan.sol_transfers(wallet, limit, page * limit, stage='funding')
+            except RateLimitedError:
+                rate_limited_count += 1
+                if rate_limited_count > MAX_RATE_LIMITED_RETRIES:
+                    LOGGER.error(f"Still rate limited looking up the funder of {wallet}, giving up")
+                    return None
+                get_metrics().inc('shitcoins_provider_retries_total', {'provider': 'solscan'})
+                backoff_sec = settings.too_many_requests_backoff_sec
+                if deadline is not None:
+                    backoff_sec = min(backoff_sec, max(0.0, deadline - time.monotonic()))
+                time.sleep(backoff_sec)
+                continue
+            except ProviderError as e:
+                LOGGER.error(f"Error looking up the funder of {wallet}: {e}")
+                return None
+            transfers.extend(data)
+            if len(data) < limit:
+                break
+            page += 1
+        else:
+            # more transfers than searched, an old or busy wallet and not worth following further
+            return FunderEdge(funder=None)
+
+        for transfer in reversed(transfers):
+            if transfer.get('dst') == wallet and transfer.get('src') not in (None, wallet):
+                return FunderEdge(funder=transfer['src'], funded_at=transfer.get('blockTime'))
+        return FunderEdge(funder=None)
+
+    def funding_chain(self, wallet: str, max_hops: int | None = None, deadline: float | None = None) -> List[str]:
+        """
+        :param deadline: optional time.monotonic() value after which no further funder is looked up
+        :return: the wallet's funder, that wallet's funder and so on, up to max_hops wallets and ending early at a
+        known address, a wallet without a funder, a cycle or the deadline
+        """
+        max_hops = self.settings.funding_max_hops if max_hops is None else max_hops
+        chain: List[str] = []
+        current = wallet
+        while len(chain) < max_hops and (deadline is None or time.monotonic() < deadline):
+            edge = self.funder_of(current, deadline)
+            if edge is None or edge.funder is None or edge.funder == wallet or edge.funder in chain:
+                break
+            chain.append(edge.funder)
+            if self._registry.label_for(edge.funder) is not None:
+                break
+            current = edge.funder
+        return chain
+
+    def cluster_holders(self, coin_data: CoinData, deadline: float | None = None) -> List[FunderCluster]:
+        """
+        :param deadline: optional time.monotonic() value after which no further funder is looked up, the clusters are
+        made of the chains followed until then
+        :return: clusters of at least two FRESH holders sharing a funder, largest first. A funder further up the chain
+        funding exactly the same holders as a closer one is left out.
+        """
+        fresh_addresses = [holder['address'] for holder in coin_data.get('holders', []) if holder['status'] == 'FRESH']
+        funder_to_holders: Dict[str, List[str]] = {}
+        funder_to_hops: Dict[str, int] = {}
+        chains = self._executor.map(lambda address: self.funding_chain(address, deadline=deadline), fresh_addresses)
+        for holder_address, chain in zip(fresh_addresses, chains):
+            for hops, funder in enumerate(chain, start=1):
+                if self._registry.label_for(funder) is not None:
+                    continue
+                funder_to_holders.setdefault(funder, []).append(holder_address)
+                funder_to_hops[funder] = min(hops, funder_to_hops.get(funder, hops))
+
+        clusters = []
+        seen_holder_sets = set()
+        for funder in sorted(funder_to_holders, key=lambda f: (-len(funder_to_holders[f]), funder_to_hops[f])):
+            holder_set = frozenset(funder_to_holders[funder])
+            if len(holder_set) < 2 or holder_set in seen_holder_sets:
+                continue
+            seen_holder_sets.add(holder_set)
+            clusters.append(FunderCluster(funder=funder, holders=funder_to_holders[funder],
+                                          hops=funder_to_hops[funder]))
+        return clusters
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.funder_graph.close()
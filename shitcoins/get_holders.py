@@ -1,15 +1,14 @@
-from typing import List
+from __future__ import annotations
+
+from typing import Dict, List
 
-import requests
-from dotenv import load_dotenv
-import os
 import re
 
 from shitcoins.model.holder import Holder
-from itertools import groupby
-
-# Load environment variables from .env file
-load_dotenv()
+from shitcoins.providers.base import ProviderError
+from shitcoins.providers.registry import get_holder_provider
+from shitcoins.settings import Settings, get_settings
+from shitcoins.sol.known_address_registry import get_known_address_registry
 
 # Define a pattern for Solana addresses
 solana_address_pattern = re.compile(r"^[A-HJ-NP-Za-km-z1-9]{44}$")
@@ -21,46 +20,39 @@ def is_valid_solana_address(address):
 
 
 def _filter_duplicate_keys_from_list_of_dict(holder_addresses: List[Holder]):
-    l2 = sorted(holder_addresses, key=lambda d: (d['address'], -sum(1 for v in d.values() if v)))
-    return [next(d) for _, d in groupby(l2, key=lambda _d: _d['address'])]
-
-
-def get_holders(token_address) -> List[Holder]:
-    api_key = os.getenv('SOLSCAN_API_KEY')
-    if not api_key:
-        raise ValueError("API key not found. Please set it in the .env file.")
-
-    holder_addresses: List[Holder] = []
-    page = 0
-    limit = 50  # Adjust the limit as per the API's pagination limit
-    min_holders_required = int(os.getenv('MIN_HOLDER_COUNT'))
-
-    while True:
-        url = (f"https://pro-api.solscan.io/v1.0/token/holders?tokenAddress={token_address}&limit={limit}"
-               f"&offset={page * limit}")
-        headers = {
-            'accept': 'application/json',
-            'token': api_key
-        }
-
-        response = requests.get(url, headers=headers)
-
-        if response.status_code == 200:
-            data = response.json()
-            holders = data.get('data', [])
-            if not holders:
-                break  # No more data to fetch
-
-            holder_addresses.extend([Holder(address=holder['owner'], status="UNKNOWN", transactions_count=0)
-                                     for holder in holders if is_valid_solana_address(holder['owner'])])
-            page += 1
-        else:
-            print(f"Error: {response.status_code} - {response.text}")
-            break
-
-    if len(holder_addresses) < min_holders_required:
+    # keeps the first, i.e. highest supply rank, entry of each address so holders stay in supply order
+    address_to_holder: Dict[str, Holder] = {}
+    for holder in holder_addresses:
+        address_to_holder.setdefault(holder['address'], holder)
+    return list(address_to_holder.values())
+
+
+def get_holders(token_address, settings: Settings | None = None) -> List[Holder]:
+    """
+    :return: the token's holders, largest first, from the HOLDER_PROVIDERS, an empty list if it has less than
+    MIN_HOLDER_COUNT of them
+    """
+    settings = settings or get_settings()
+    min_holders_required = settings.min_holder_count
+
+    try:
+        owners = get_holder_provider(settings).token_holders(token_address)
+    except ProviderError as e:
+        print(f"Error: {e}")
+        owners = []
+    holder_addresses: List[Holder] = [Holder(address=owner, status="UNKNOWN", transactions_count=0)
+                                      for owner in owners if is_valid_solana_address(owner)]
+
+    # filter out duplicates
+    holder_addresses = _filter_duplicate_keys_from_list_of_dict(holder_addresses)
+
+    # tag bonding curves, pools, burn and exchange accounts so they are never sent for classification
+    excluded_count = get_known_address_registry().tag_holders(holder_addresses)
+    if excluded_count:
+        print(f"Excluded {excluded_count} known infrastructure holders of {token_address}.")
+
+    if len(holder_addresses) - excluded_count < min_holders_required:
         print(f"Token {token_address} has less than {min_holders_required} holders.")
         return []
 
-    # filter out duplicates and return
-    return _filter_duplicate_keys_from_list_of_dict(holder_addresses)
\ No newline at end of file
+    return holder_addresses
\ No newline at end of file
@@ -1,76 +1,241 @@
-import json
-import os
 import asyncio
 import logging
 import time
-from time import sleep
-
-from mint_address_fetcher import MintAddressFetcher
-from get_holders import get_holders
-from check_holder_transfers import multiprocess_coin_holders
-from sol.solana_client import get_first_transaction_sigs, get_transaction_stats
-from telegram_alert import alert
-from dotenv import load_dotenv
-
-load_dotenv()
-BOT_TOKEN = os.getenv('BOT_TOKEN')
-CHAT_ID = os.getenv('CHAT_ID')
-LOOP_DELAY = int(os.getenv('LOOP_DELAY'))
+from dataclasses import dataclass
+
+from shitcoins.alert_dispatcher import AlertDispatcher
+from shitcoins.metrics.http_server import start_metrics_server
+from shitcoins.metrics.registry import get_metrics
+from shitcoins.metrics.tracing import new_trace_id, span, trace
+from shitcoins.mint_address_fetcher import MintAddressFetcher
+from shitcoins.model.coin_data import CoinData
+from shitcoins.model.first_buy_statistics import FirstBuyStatistics
+from shitcoins.get_holders import get_holders
+from shitcoins.check_holder_transfers import multiprocess_coin_holders
+from shitcoins.funding_tracer import FundingTracer
+from shitcoins.priority import coin_priority
+from shitcoins.providers.registry import check_holder_providers
+from shitcoins.scheduler import fixed_cadence
+from shitcoins.sol.rpc_session import get_rpc_session
+from shitcoins.sol.solana_client import analyse_first_buys
+from shitcoins.store.coin_snapshot_archive import CoinSnapshotArchive
+from shitcoins.store.funder_graph import FunderGraph
+from shitcoins.store.wallet_overlap_index import WalletOverlapIndex
+from shitcoins.sol.known_address_registry import EXCLUDED_STATUS
+from shitcoins.settings import Settings, get_settings, install_reload_handler
+from shitcoins.telegram_alert import alert_coins, archive_coins
+from shitcoins.util.aging_priority_queue import AgingPriorityQueue
 
 logging.basicConfig(level=logging.INFO)
 
-
-async def main():
-    if not os.path.exists('coins'):
-        os.makedirs('coins')
-
-    fetcher = MintAddressFetcher()
-
-    while True:
-        coins_data = await fetcher.fetch_pump_addresses_from_telegram()
+# weight of the latest coin in the moving average of the time a coin takes to process
+COIN_SEC_SMOOTHING = 0.2
+
+
+def _deadline_passed(deadline: float | None, coin_data: CoinData, stage: str) -> bool:
+    if deadline is None or time.monotonic() < deadline:
+        return False
+    print(f"Deadline of {coin_data['coin_address']} passed before {stage}, alerting with partial results.")
+    get_metrics().inc('shitcoins_coin_deadline_overruns_total', {'stage': stage})
+    return True
+
+
+async def process_coin(coin_data: CoinData, first_buy_task: asyncio.Task, settings: Settings,
+                       deadline: float | None = None):
+    """
+    :deadline: optional time.monotonic() value by which the coin must be ready to alert, stages still running then
+    are cut short and leave partial results
+    """
+    stage_start = time.monotonic()
+    # a coin that waited out its deadline in the queue costs no holder requests at all
+    if not _deadline_passed(deadline, coin_data, 'holders'):
+        # coin holders are ordered by percentage of the coin they hold (supply)
+        print(f"Getting holder addresses for {coin_data['coin_address']}")
+        # blocking stages run in a thread so the bundle analysis tasks keep progressing
+        with span('get_holders'):
+            holders = await asyncio.to_thread(get_holders, coin_data['coin_address'], settings)
+
+        if len(holders) >= settings.min_holder_count:
+            coin_data['holders'] = holders
+            print(f"Saved {coin_data['coin_address']} with {len(holders)} addresses.")
+        else:
+            print(f"Skipped {coin_data['coin_address']} with only {len(holders)} addresses.")
+    coin_data['timings'] = {'holders_sec': time.monotonic() - stage_start}
+
+    stage_start = time.monotonic()
+    if _deadline_passed(deadline, coin_data, 'classification'):
+        coin_data['classification_status'] = 'PARTIAL'
+    else:
+        with span('classification', holders=len(coin_data['holders'])):
+            await asyncio.to_thread(multiprocess_coin_holders, coin_data, settings, deadline)
+        if coin_data['classification_status'] == 'PARTIAL':
+            get_metrics().inc('shitcoins_coin_deadline_overruns_total', {'stage': 'classification'})
+    coin_data['timings']['classification_sec'] = time.monotonic() - stage_start
+    stage_start = time.monotonic()
+    with span('first_buys wait'):
+        try:
+            coin_data['first_buy_statistics'] = await asyncio.wait_for(
+                first_buy_task, None if deadline is None else max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            _deadline_passed(deadline, coin_data, 'first_buys')
+            coin_data['first_buy_statistics'] = FirstBuyStatistics(
+                duplicate_wallet_count=0, duplicate_count=0, duplicate_pct=0, status='UNKNOWN')
+    coin_data['timings']['first_buys_wait_sec'] = time.monotonic() - stage_start
+    for timing, seconds in coin_data['timings'].items():
+        get_metrics().observe('shitcoins_stage_duration_seconds', seconds,
+                              {'stage': timing.removesuffix('_sec')})
+    print(f"Updated coin data: {coin_data}")
+
+
+def index_holder_overlap(coin_data: CoinData, overlap_index: WalletOverlapIndex, settings: Settings):
+    """
+    Adds the coin's holders to the overlap index and sets the share of them also holding other recent coins
+    """
+    holder_addresses = [holder['address'] for holder in coin_data['holders'] if holder['status'] != EXCLUDED_STATUS]
+    with span('holder overlap', holders=len(holder_addresses)):
+        overlap_index.add_coin(coin_data['coin_address'], holder_addresses)
+        coin_data['holder_overlap'] = overlap_index.overlap(coin_data['coin_address'],
+                                                            settings.wallet_overlap_window_hours * 3600)
+
+
+@dataclass
+class ScheduledCoin:
+    coin_data: CoinData
+    first_buy_task: asyncio.Task
+    # time.monotonic() values of when the coin was discovered and by when it must be alerted
+    discovered_at: float
+    deadline: float
+
+
+async def discover_coins(fetcher: MintAddressFetcher, queue: asyncio.Queue):
+    """
+    Fetches new coins from Telegram every LOOP_DELAY seconds, however long the coins take to process, and queues them
+    with a deadline of COIN_DEADLINE_SEC from now
+    """
+    async for _ in fixed_cadence(lambda: get_settings().loop_delay, 'discovery'):
+        # taken once per discovery, so a reload on SIGHUP applies from the next discovery on
+        settings = get_settings()
+        try:
+            coins_data = await fetcher.fetch_pump_addresses_from_telegram()
+        except Exception as e:
+            print(f"Error fetching coins from Telegram, Error: {e}")
+            continue
+        discovered_at = time.monotonic()
         for coin_data in coins_data:
-            # coin holders are ordered by percentage of the coin they hold (supply)
-            if len(coins_data) <= 3:
-                # obtaining first transactions of coins is slow, only do if 3 or less new addresses
+            # bundle analysis runs as its own stage for every coin, concurrently with holder classification and
+            # sharing the process wide RPC budget; a coin over its time budget gets PARTIAL or UNKNOWN stats
+            coin_data['trace_id'] = new_trace_id()
+            # the task inherits the coin's trace
+            with trace(coin_data['trace_id']):
+                first_buy_task = asyncio.create_task(
+                    analyse_first_buys(coin_data['coin_address'], settings.bundle_analysis_budget_sec))
+            queue.put_nowait(ScheduledCoin(coin_data, first_buy_task, discovered_at,
+                                           discovered_at + settings.coin_deadline_sec))
+
+
+def _take_discovered(queue: asyncio.Queue, pending_coins: AgingPriorityQueue, first: ScheduledCoin | None = None):
+    scheduled_coins = [first] if first is not None else []
+    while not queue.empty():
+        scheduled_coins.append(queue.get_nowait())
+    for scheduled in scheduled_coins:
+        pending_coins.push(scheduled, coin_priority(scheduled.coin_data), now=scheduled.discovered_at,
+                           deadline=scheduled.deadline)
+
+
+async def main(alert_dispatcher: AlertDispatcher):
+    fetcher = MintAddressFetcher()
+    settings = get_settings()
+    # a missing API key fails at startup rather than on every coin
+    check_holder_providers(settings)
+    # optional day partitioned Parquet snapshot archive used for backtesting, needs pyarrow
+    snapshot_archive = CoinSnapshotArchive(settings.snapshot_archive_dir) if settings.snapshot_archive_dir else None
+    # wallet to coins index kept across iterations, pairs older than the overlap window are aged out
+    overlap_index = WalletOverlapIndex(settings.wallet_overlap_path,
+                                       max_age_sec=settings.wallet_overlap_window_hours * 3600) \
+        if settings.wallet_overlap_path else None
+    # optional funding stage, its funder graph is shared by all coins so common funders are looked up once
+    funding_tracer = FundingTracer(FunderGraph(settings.funder_graph_path)) if settings.funding_trace else None
+
+    # discovery runs on its own cadence and queues coins, an iteration processes queued coins until none are left
+    queue: asyncio.Queue[ScheduledCoin] = asyncio.Queue()
+    discovery_task = asyncio.create_task(discover_coins(fetcher, queue))
+    # coins most likely to be alerted go first, ones waiting long enough go first whatever their priority
+    pending_coins: AgingPriorityQueue[ScheduledCoin] = AgingPriorityQueue(settings.coin_priority_aging_per_sec)
+    # moving average of the time a coin takes to process, a coin whose deadline is closer than that goes first
+    coin_sec = 0.0
+    try:
+        while True:
+            _take_discovered(queue, pending_coins, await queue.get())
+            settings = get_settings()
+            iteration_start = time.monotonic()
+
+            scheduled_coins = []
+            while len(pending_coins):
+                scheduled = pending_coins.pop(urgent_within_sec=coin_sec)
+                scheduled_coins.append(scheduled)
+                coin_start = time.monotonic()
+                coin_data = scheduled.coin_data
+                with trace(coin_data['trace_id']), span('coin', coin_address=coin_data['coin_address']):
+                    await process_coin(coin_data, scheduled.first_buy_task, settings, scheduled.deadline)
+                    if overlap_index is not None:
+                        index_holder_overlap(coin_data, overlap_index, settings)
+                    if funding_tracer is not None and not _deadline_passed(scheduled.deadline, coin_data, 'funding'):
+                        with span('funding'):
+                            try:
+                                coin_data['funder_clusters'] = await asyncio.wait_for(
+                                    asyncio.to_thread(funding_tracer.cluster_holders, coin_data,
+                                                      scheduled.deadline),
+                                    scheduled.deadline - time.monotonic())
+                            except asyncio.TimeoutError:
+                                _deadline_passed(scheduled.deadline, coin_data, 'funding')
+                # each coin is alerted as soon as it is ready, a slow coin never holds back the ones after it
+                alert_coins([coin_data], bot_token=settings.bot_token, chat_id=settings.chat_id,
+                            dispatcher=alert_dispatcher)
+                coin_sec += COIN_SEC_SMOOTHING * (time.monotonic() - coin_start - coin_sec)
+                get_metrics().observe('shitcoins_coin_time_to_alert_seconds',
+                                      time.monotonic() - scheduled.discovered_at)
+                # coins discovered meanwhile are ranked against the ones still waiting
+                _take_discovered(queue, pending_coins)
+
+            coins_data = [scheduled.coin_data for scheduled in scheduled_coins]
+            # optional directory each iteration's coins are written to as JSON, for keeping a record only
+            if settings.coins_archive_dir:
                 try:
-                    signatures, earliest_block_time = await get_first_transaction_sigs(coin_data['coin_address'])
-                    time.sleep(0.2)
-                    coin_data['first_buy_statistics'] =await get_transaction_stats(signatures)
+                    await asyncio.to_thread(archive_coins, coins_data, settings.coins_archive_dir)
                 except Exception as e:
-                    print("ERROR trying to determine if coin is bundled with sol API")
-                    print(e)
-
-            print(f"Getting holder addresses for {coin_data['coin_address']}")
-            holders = get_holders(coin_data['coin_address'])
-
-            if len(holders) >= int(os.getenv('MIN_HOLDER_COUNT')):
-                coin_data['holders'] = holders
-                with open(f"coins/{coin_data['coin_address']}.json", 'w') as json_file:
-                    json.dump(coin_data, json_file, indent=4)
-                print(f"Saved {coin_data['coin_address']} with {len(holders)} addresses.")
-            else:
-                print(f"Skipped {coin_data['coin_address']} with only {len(holders)} addresses.")
-
-            coin_data_with_updated_holders = multiprocess_coin_holders(coin_data)
-
-            # Write the updated data back to the JSON file
-            with open(f"coins/{coin_data['coin_address']}.json", 'w') as json_file:
+                    print(f"Error archiving coins to {settings.coins_archive_dir}, Error: {e}")
+            if snapshot_archive is not None:
                 try:
-                    json.dump(coin_data_with_updated_holders, json_file, indent=4)
-                    print(f"Updated JSON data: {coin_data_with_updated_holders}")
+                    await asyncio.to_thread(snapshot_archive.append, coins_data)
                 except Exception as e:
-                    print(f"Error writing file: {json_file}, Error: {e}")
-
-        alert(bot_token=BOT_TOKEN, chat_id=CHAT_ID)
-
-        for file in os.listdir('coins'):
-            if file.endswith('.json'):
-                os.remove(os.path.join('coins', file))
-
-        print("Iteration complete. Waiting for next run.")
-
-        sleep(LOOP_DELAY)
+                    print(f"Error appending coin snapshots to {snapshot_archive.archive_dir}, Error: {e}")
+
+            get_metrics().observe('shitcoins_stage_duration_seconds', time.monotonic() - iteration_start,
+                                  {'stage': 'iteration'})
+            get_metrics().inc('shitcoins_coins_processed_total', value=len(coins_data))
+            print("Iteration complete. Waiting for next coins.")
+    finally:
+        discovery_task.cancel()
+
+
+async def run():
+    # parse and validate all settings up front, a misconfiguration fails here instead of deep inside a worker
+    settings = get_settings()
+    install_reload_handler()
+    alert_dispatcher = AlertDispatcher(settings.bot_token,
+                                       per_chat_interval_sec=settings.alert_per_chat_interval_sec,
+                                       global_messages_per_sec=settings.alert_global_per_sec,
+                                       max_combined=settings.alert_max_combined)
+    alert_dispatcher.start()
+    # local port Prometheus metrics are served on at /metrics
+    if settings.metrics_port is not None:
+        start_metrics_server(settings.metrics_port)
+    try:
+        await main(alert_dispatcher)
+    finally:
+        await alert_dispatcher.close()
+        await get_rpc_session().close()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    asyncio.run(run())
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from shitcoins.metrics.registry import MetricsRegistry, get_metrics
+
+LOGGER = logging.getLogger(__name__)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _handler_for(metrics: MetricsRegistry):
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = metrics.render_prometheus().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', PROMETHEUS_CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # scrapes every few seconds would flood the output
+            pass
+
+    return MetricsHandler
+
+
+def start_metrics_server(port: int, host: str = '127.0.0.1', metrics: MetricsRegistry | None = None) \
+        -> ThreadingHTTPServer:
+    """
+    Serves the metrics on http://<host>:<port>/metrics from a daemon thread
+    :param port: 0 picks a free port, see server.server_address
+    """
+    server = ThreadingHTTPServer((host, port), _handler_for(metrics or get_metrics()))
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    LOGGER.info(f"Serving metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
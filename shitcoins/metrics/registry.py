@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+# seconds, from a cache lookup up to a whole coin's holder classification
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+_MetricKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def _key(name: str, labels: Dict[str, str] | None) -> _MetricKey:
+    return name, tuple(sorted((label, str(value)) for label, value in (labels or {}).items()))
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: str = '') -> str:
+    formatted = [f'{label}="{value}"' for label, value in labels]
+    if extra:
+        formatted.append(extra)
+    return '{' + ','.join(formatted) + '}' if formatted else ''
+
+
+class MetricsRegistry:
+    """
+    Thread safe counters, gauges and latency histograms keyed by name and labels. A worker process records into its
+    own registry and hands back a snapshot, which the parent merges, so the exported metrics cover all processes.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self._buckets = buckets
+        self._lock = threading.Lock()
+        self._counters: Dict[_MetricKey, float] = {}
+        self._gauges: Dict[_MetricKey, float] = {}
+        # key -> bucket counts (not cumulative, the last one is +Inf), sum, count
+        self._histograms: Dict[_MetricKey, Tuple[List[int], float, int]] = {}
+
+    def inc(self, name: str, labels: Dict[str, str] | None = None, value: float = 1):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, labels: Dict[str, str] | None = None):
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def observe(self, name: str, value: float, labels: Dict[str, str] | None = None):
+        key = _key(name, labels)
+        with self._lock:
+            bucket_counts, total, count = self._histograms.get(key) or ([0] * (len(self._buckets) + 1), 0.0, 0)
+            bucket_counts[bisect.bisect_left(self._buckets, value)] += 1
+            self._histograms[key] = (bucket_counts, total + value, count + 1)
+
+    def record_request(self, provider: str, status, duration_sec: float | None = None, count: int = 1):
+        """
+        Counts count requests to an external provider by response status and observes the call duration
+        :param status: HTTP status code, or a short reason such as error
+        """
+        self.inc('shitcoins_provider_requests_total', {'provider': provider, 'status': status}, count)
+        if status == 429:
+            self.inc('shitcoins_provider_rate_limited_total', {'provider': provider}, count)
+        if duration_sec is not None:
+            self.observe('shitcoins_provider_request_duration_seconds', duration_sec, {'provider': provider})
+
+    @contextmanager
+    def timed(self, name: str, labels: Dict[str, str] | None = None):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - start, labels)
+
+    def snapshot(self, reset: bool = False) -> dict:
+        """
+        :param reset: clear counters and histograms after taking the snapshot, so merging it never double counts
+        :return: picklable copy of all metrics, see merge
+        """
+        with self._lock:
+            snapshot = {'counters': dict(self._counters), 'gauges': dict(self._gauges),
+                        'histograms': {key: (list(bucket_counts), total, count)
+                                       for key, (bucket_counts, total, count) in self._histograms.items()}}
+            if reset:
+                self._counters.clear()
+                self._histograms.clear()
+        return snapshot
+
+    def merge(self, snapshot: dict):
+        with self._lock:
+            for key, value in snapshot['counters'].items():
+                self._counters[key] = self._counters.get(key, 0) + value
+            self._gauges.update(snapshot['gauges'])
+            for key, (bucket_counts, total, count) in snapshot['histograms'].items():
+                own_counts, own_total, own_count = self._histograms.get(key) or ([0] * len(bucket_counts), 0.0, 0)
+                self._histograms[key] = ([own + other for own, other in zip(own_counts, bucket_counts)],
+                                         own_total + total, own_count + count)
+
+    def render_prometheus(self) -> str:
+        """
+        :return: all metrics in the Prometheus text exposition format
+        """
+        snapshot = self.snapshot()
+        lines = []
+        for metric_type, metrics in [('counter', snapshot['counters']), ('gauge', snapshot['gauges'])]:
+            for name in sorted({name for name, _ in metrics}):
+                lines.append(f"# TYPE {name} {metric_type}")
+                for (metric_name, labels), value in sorted(metrics.items()):
+                    if metric_name == name:
+                        lines.append(f"{name}{_format_labels(labels)} {value:g}")
+
+        histograms = snapshot['histograms']
+        for name in sorted({name for name, _ in histograms}):
+            lines.append(f"# TYPE {name} histogram")
+            for (metric_name, labels), (bucket_counts, total, count) in sorted(histograms.items()):
+                if metric_name != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(list(self._buckets) + ['+Inf'], bucket_counts):
+                    cumulative += bucket_count
+                    bucket_labels = _format_labels(labels, 'le="' + str(bound) + '"')
+                    lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {total:g}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+
+_metrics: MetricsRegistry | None = None
+_metrics_pid: int | None = None
+
+
+def get_metrics() -> MetricsRegistry:
+    """
+    :return: the registry of this process. A forked worker process starts with an empty one rather than a copy of the
+    parent's, so the snapshots it hands back hold only what it recorded itself.
+    """
+    global _metrics, _metrics_pid
+    if _metrics is None or _metrics_pid != os.getpid():
+        _metrics = MetricsRegistry()
+        _metrics_pid = os.getpid()
+    return _metrics
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from shitcoins.settings import get_settings
+
+LOGGER = logging.getLogger(__name__)
+
+# trace id of the coin being processed, asyncio tasks and to_thread calls inherit it
+_current_trace_id: ContextVar[str | None] = ContextVar('trace_id', default=None)
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def current_trace_id() -> str | None:
+    return _current_trace_id.get()
+
+
+@contextmanager
+def trace(trace_id: str | None):
+    """
+    Attributes every span recorded inside the block, including in tasks and threads started from it, to trace_id
+    """
+    token = _current_trace_id.set(trace_id)
+    try:
+        yield
+    finally:
+        _current_trace_id.reset(token)
+
+
+def _lane() -> int:
+    # concurrent asyncio tasks share a thread, each gets its own lane so their spans do not overlap in the viewer
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    return id(task) if task is not None else threading.get_ident()
+
+
+class Tracer:
+    """
+    Appends spans to a file in the Chrome trace event format, which chrome://tracing, Perfetto and speedscope render
+    as a flame graph. Every process appends to the same file, so the file is a JSON array without its closing
+    bracket, which these viewers accept.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'a')
+        if self._file.tell() == 0:
+            self._file.write('[\n')
+            self._file.flush()
+
+    def add_span(self, name: str, start_time: float, duration_sec: float, category: str = 'app',
+                 trace_id: str | None = None, **args):
+        """
+        :param start_time: time.time() the span started at
+        """
+        event = {'name': name, 'cat': category, 'ph': 'X', 'ts': round(start_time * 1_000_000),
+                 'dur': round(duration_sec * 1_000_000), 'pid': os.getpid(), 'tid': _lane(),
+                 'args': {'trace_id': trace_id or current_trace_id(), **args}}
+        line = json.dumps(event, default=str) + ',\n'
+        with self._lock:
+            # a single write per event, so lines of different processes never interleave
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+_tracer: Tracer | None = None
+_tracer_pid: int | None = None
+
+
+def get_tracer() -> Tracer | None:
+    """
+    :return: the tracer of this process writing to TRACE_FILE, None if tracing is disabled
+    """
+    global _tracer, _tracer_pid
+    if _tracer_pid != os.getpid():
+        trace_file = get_settings().trace_file
+        _tracer = Tracer(trace_file) if trace_file else None
+        _tracer_pid = os.getpid()
+        if _tracer is not None:
+            LOGGER.info(f"Writing trace spans to {trace_file}")
+    return _tracer
+
+
+def reset_tracer():
+    """
+    Closes the process wide tracer, so the next get_tracer call reads TRACE_FILE again
+    """
+    global _tracer, _tracer_pid
+    if _tracer is not None and _tracer_pid == os.getpid():
+        _tracer.close()
+    _tracer = None
+    _tracer_pid = None
+
+
+def record_span(name: str, start_time: float, duration_sec: float, category: str = 'app', **args):
+    """
+    Records a span already timed by the caller, a no-op when tracing is disabled
+    """
+    tracer = get_tracer()
+    if tracer is not None:
+        tracer.add_span(name, start_time, duration_sec, category, **args)
+
+
+@contextmanager
+def span(name: str, category: str = 'app', **args):
+    """
+    Records the block as a span of the current trace, a no-op when tracing is disabled
+    """
+    tracer = get_tracer()
+    if tracer is None:
+        yield
+        return
+    start_time = time.time()
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        tracer.add_span(name, start_time, time.monotonic() - start, category, **args)
@@ -1,179 +1,158 @@
 from __future__ import annotations
 
 from datetime import datetime, timezone
-from typing import List, Dict
+from typing import List, Dict, Tuple
 
 from telethon import TelegramClient
 import asyncio
-import os
-import json
 import logging
-import requests
-from dotenv import load_dotenv
 
+from shitcoins.dex.dexscreener_client import DexScreenerClient
+from shitcoins.dex.market_info_resolver import MarketInfoResolver
+from shitcoins.metrics.registry import get_metrics
+from shitcoins.metrics.tracing import span
 from shitcoins.model.coin_data import CoinData
-from shitcoins.model.dex_metric import DexMetric
 from shitcoins.model.market_info import MarketInfo
-
-# Load environment variables from .env file
-load_dotenv()
-
-api_id = int(os.getenv('API_ID'))
-api_hash = os.getenv('API_HASH')
-phone = os.getenv('PHONE')
-channel_username = os.getenv('CHANNEL_USERNAME')
-FETCH_LIMIT = int(os.getenv('FETCH_LIMIT'))
-API_KEY = os.getenv('SOLSCAN_API_KEY')
-DEX_DELAY_SEC = int(os.getenv('DEX_DELAY_SEC'))
-DEX_RETRY_ATTEMPTS = int(os.getenv('DEX_RETRY_ATTEMPTS'))
+from shitcoins.replay.cassette import get_cassette
+from shitcoins.replay.telegram import CassetteTelegramClient
+from shitcoins.settings import Settings, get_settings
+from shitcoins.store.channel_cursor_store import ChannelCursorStore
+from shitcoins.store.seen_address_store import SeenAddressStore
 
 LOGGER = logging.getLogger(__name__)
 
 
 class MintAddressFetcher:
-    def __init__(self, seen_file='seen_addresses.json'):
+    def __init__(self, seen_file='seen_addresses.json', settings: Settings | None = None):
+        """
+        :param settings: settings to use throughout, by default the process's current settings, so a reload applies
+        """
+        self._settings = settings
         self.seen_file = seen_file
         self.seen_addresses = self._load_seen_addresses()
-        self.telegram_client = TelegramClient('session_name', api_id, api_hash)
-
-    def _load_seen_addresses(self):
-        if os.path.exists(self.seen_file):
-            with open(self.seen_file, 'r') as file:
-                return json.load(file)
-        return []
-
-    def _save_seen_addresses(self):
-        with open(self.seen_file, 'w') as file:
-            json.dump(self.seen_addresses, file)
+        self.channel_cursors = ChannelCursorStore(self.settings.telegram_cursors_path)
+        if self.settings.api_id is None:
+            raise ValueError("API_ID not found. Please set it in the .env file.")
+        self.telegram_client = TelegramClient('session_name', self.settings.api_id, self.settings.api_hash)
+        if get_cassette() is not None:
+            self.telegram_client = CassetteTelegramClient(self.telegram_client, get_cassette())
+        self.dexscreener_client = DexScreenerClient(tokens_url=self.settings.dexscreener_tokens_url)
+        self.market_info_resolver = MarketInfoResolver(self.dexscreener_client,
+                                                       retry_delay_sec=self.settings.dex_delay_sec,
+                                                       max_attempts=self.settings.dex_retry_attempts)
+
+    @property
+    def settings(self) -> Settings:
+        return self._settings or get_settings()
+
+    def _load_seen_addresses(self) -> SeenAddressStore:
+        max_age_hours = self.settings.seen_address_max_age_hours
+        seen_addresses = SeenAddressStore(self.settings.seen_addresses_path,
+                                          max_age_sec=max_age_hours * 3600 if max_age_hours else None,
+                                          bloom_capacity=self.settings.seen_address_bloom_capacity)
+        # carry over addresses seen before the store existed
+        seen_addresses.import_json(self.seen_file)
+        return seen_addresses
 
     def fetch_pump_address_info_dexscreener(self, pump_addresses: List[str]) -> Dict[str, MarketInfo]:
-        address_to_market_info: Dict[str, MarketInfo] = {}
-        address_to_dex_metric: Dict[str, DexMetric] = {}
-        url = 'https://api.dexscreener.com/latest/dex/tokens/'
-
-        # One or multiple, comma-separated token addresses (up to 30 addresses)
-        chunks_pump_addresses = [pump_addresses[x:x + 30] for x in range(0, len(pump_addresses), 30)]
-        for chunk_pump_addresses in chunks_pump_addresses:
-            addresses = ''
-            for pump_address in chunk_pump_addresses:
-                addresses += f"{pump_address},"
-
-            url += addresses
-            headers = {
-                'accept': 'application/json'
-            }
-
-            response = requests.get(url, headers=headers)
-
-            if response.status_code == 200:
-                data = response.json()
-                if data['pairs'] is None:
-                    LOGGER.error(f"dexscreener did not return market info for {addresses}")
-                    continue
-
-                for pair in data['pairs']:
-                    addr = pair['baseToken']['address']
-                    if addr in address_to_dex_metric:
-                        dex_metric = address_to_dex_metric[addr]
-                        if 'fdv' in pair:
-                            dex_metric['total_fdv'] += pair['fdv']
-                            dex_metric['fdv_count'] += 1
-
-                        if 'info' in pair and 'socials' in pair['info']:
-                            if 'type' in pair['info']['socials']:
-                                socials = pair['info']['socials']
-                                # to do store social information like twitter
-
-                        # if 'pairCreatedAt' in pair:
-                        #     token_created_at = pair["pairCreatedAt"] / 1000
-                        #     creation_time_utc = datetime.utcfromtimestamp(token_created_at)
-                        #
-                        #     if (dex_metric['created_at_utc'] is None
-                        #             or creation_time_utc < dex_metric['created_at_utc']):
-                        #         # use earlier found creation time
-                        #         dex_metric['created_at_utc'] = creation_time_utc
-
-                    else:
-                        # calculate average market_cap via average fdv,  but just use first pair's
-                        # liquidity and price value
-                        address_to_dex_metric[addr] = DexMetric(total_fdv=pair['fdv'], fdv_count=1,
-                                                                liquidity=float(pair['liquidity']['usd']),
-                                                                price=float(pair['priceUsd']),
-                                                                token_name=pair['baseToken']['name'],
-                                                                created_at_utc=None)
-
-                        # if 'pairCreatedAt' in pair:
-                        #     token_created_at = pair["pairCreatedAt"] / 1000
-                        #     creation_time_utc = datetime.utcfromtimestamp(token_created_at)
-                        #     address_to_dex_metric[addr]['created_at_utc'] = creation_time_utc
-
-                for addr, dex_metric in address_to_dex_metric.items():
-                    market_cap = float(dex_metric['total_fdv'] / dex_metric['fdv_count'])
-                    address_to_market_info[addr] = MarketInfo(market_cap=market_cap,
-                                                              token_name=dex_metric['token_name'],
-                                                              liquidity=dex_metric['liquidity'],
-                                                              price=dex_metric['price'],
-                                                              created_at_utc=dex_metric['created_at_utc'])
-                    LOGGER.info(f"Success: Calculated market info for {dex_metric['token_name']} "
-                                f"with DexScreener API")
-        return address_to_market_info
+        return self.dexscreener_client.fetch_market_info(pump_addresses)
+
+    def _channel_usernames(self) -> List[str]:
+        return list(self.settings.channels)
+
+    @staticmethod
+    def _extract_pump_addresses(text: str | None) -> List[str]:
+        pump_addresses = []
+        if text:
+            for line in text.split('\n'):
+                if 'pump' in line:
+                    potential_address = line.strip().strip('`')
+                    if potential_address.endswith('pump'):
+                        pump_addresses.append(potential_address)
+        return pump_addresses
+
+    async def _fetch_channel_messages(self, channel_username: str) -> Tuple[List[str], int | None]:
+        """
+        Fetches the messages posted to a channel since its cursor. On the very first read only the latest
+        FETCH_LIMIT messages are taken, afterwards a gap, e.g. after downtime, is backfilled oldest first in pages of
+        FETCH_LIMIT messages, at most TELEGRAM_BACKFILL_MAX_PAGES per call, the rest is picked up on later calls
+        :return: pump addresses found and the id of the latest message read, None if there were no new messages
+        """
+        fetch_limit = self.settings.fetch_limit
+        cursor = self.channel_cursors.get_cursor(channel_username)
+
+        pump_addresses = []
+        if cursor is None:
+            last_message_id = None
+            async for message in self.telegram_client.iter_messages(channel_username, limit=fetch_limit):
+                last_message_id = max(last_message_id or 0, message.id)
+                pump_addresses.extend(self._extract_pump_addresses(message.text))
+            return pump_addresses, last_message_id
+
+        min_id = cursor
+        for _ in range(self.settings.telegram_backfill_max_pages):
+            page_size = 0
+            async for message in self.telegram_client.iter_messages(channel_username, limit=fetch_limit,
+                                                                    min_id=min_id, reverse=True):
+                page_size += 1
+                min_id = max(min_id, message.id)
+                pump_addresses.extend(self._extract_pump_addresses(message.text))
+            if page_size < fetch_limit:
+                break
+        else:
+            LOGGER.info(f"Backfill of {channel_username} continues from message {min_id} on the next iteration")
+        return pump_addresses, min_id if min_id != cursor else None
+
+    async def _traced_fetch_channel_messages(self, channel_username: str) -> Tuple[List[str], int | None]:
+        with span('telegram iter_messages', 'api', channel=channel_username):
+            return await self._fetch_channel_messages(channel_username)
 
     async def fetch_pump_addresses_from_telegram(self) -> List[CoinData]:
-        await self.telegram_client.start(phone)
+        with get_metrics().timed('shitcoins_stage_duration_seconds', {'stage': 'telegram'}):
+            await self.telegram_client.start(self.settings.phone)
 
-        FETCH_LIMIT = int(os.getenv('FETCH_LIMIT', 100))
-        channel_username = os.getenv('CHANNEL_USERNAME')
+            channel_usernames = self._channel_usernames()
+            try:
+                channels_messages = await asyncio.gather(*(self._traced_fetch_channel_messages(channel_username)
+                                                           for channel_username in channel_usernames))
+            finally:
+                await self.telegram_client.disconnect()
 
         telegram_addresses_market_cap: Dict[str, float] = {}
+        for pump_addresses, _ in channels_messages:
+            for pump_address in pump_addresses:
+                telegram_addresses_market_cap[pump_address] = 0
 
-        async for message in self.telegram_client.iter_messages(channel_username, limit=FETCH_LIMIT):
-            text = message.text
-            if text:
-                lines = text.split('\n')
-                potential_address = None
-                for line in lines:
-                    if 'pump' in line:
-                        potential_address = line.strip().strip('`')
-                        if potential_address.endswith('pump'):
-                            telegram_addresses_market_cap[potential_address] = 0
-        await self.telegram_client.disconnect()
-
-        new_addresses = [address for address in telegram_addresses_market_cap
-                         if address not in self.seen_addresses]
+        new_addresses = self.seen_addresses.filter_unseen(telegram_addresses_market_cap)
 
-        return_coins_data: List[CoinData] = []
+        # new addresses are queued with the resolver, which also retries ones DexScreener had not indexed yet
+        # on earlier iterations, so a coin is never lost just because it was not indexed on first sight
+        self.market_info_resolver.add(new_addresses)
+        with get_metrics().timed('shitcoins_stage_duration_seconds', {'stage': 'dexscreener'}):
+            with span('dexscreener resolve', addresses=len(self.market_info_resolver.pending_addresses)):
+                address_to_market_info = await asyncio.to_thread(self.market_info_resolver.resolve)
 
-        if new_addresses:
-            attempts = 0
-
-            while attempts < DEX_RETRY_ATTEMPTS:
-                attempts += 1
-                dexscreener_addr_to_market_info = self.fetch_pump_address_info_dexscreener(new_addresses)
-
-                for new_address in new_addresses:
-                    if new_address in dexscreener_addr_to_market_info:
-                        if self._is_within_market_cap(dexscreener_addr_to_market_info[new_address]['market_cap']):
-                            return_coins_data.append(CoinData(coin_address=new_address,
-                                                              first_buy_statistics=None,
-                                                              market_info=dexscreener_addr_to_market_info[new_address],
-                                                              holders=[]))
-                        else:
-                            LOGGER.warning(f"Market cap for {new_address} is out of range.")
-
-                if return_coins_data:
-                    break
-                else:
-                    LOGGER.warning(
-                        f"Attempt {attempts} failed to get market info. Retrying in {DEX_DELAY_SEC} seconds.")
-                    await asyncio.sleep(DEX_DELAY_SEC)
-
-        self.seen_addresses.extend(new_addresses)
-        self.seen_addresses = list(set(self.seen_addresses))
-        self._save_seen_addresses()
+        return_coins_data: List[CoinData] = []
+        for address, market_info in address_to_market_info.items():
+            if self._is_within_market_cap(market_info['market_cap']):
+                return_coins_data.append(CoinData(coin_address=address,
+                                                  first_buy_statistics=None,
+                                                  market_info=market_info,
+                                                  holders=[]))
+            else:
+                LOGGER.warning(f"Market cap for {address} is out of range.")
+
+        pending_addresses = self.market_info_resolver.pending_addresses
+        if pending_addresses:
+            LOGGER.info(f"{len(pending_addresses)} addresses are waiting to be indexed by DexScreener.")
+
+        self.seen_addresses.add(new_addresses)
+        # cursors only move once the addresses read are recorded as seen
+        for channel_username, (_, last_message_id) in zip(channel_usernames, channels_messages):
+            if last_message_id is not None:
+                self.channel_cursors.put_cursor(channel_username, last_message_id)
 
         return return_coins_data
 
     def _is_within_market_cap(self, market_cap: float) -> bool:
-        MIN_MARKET_CAP = float(os.getenv('MIN_MARKET_CAP'))
-        MAX_MARKET_CAP = float(os.getenv('MAX_MARKET_CAP'))
-        return MIN_MARKET_CAP <= market_cap <= MAX_MARKET_CAP
\ No newline at end of file
+        return self.settings.min_market_cap <= market_cap <= self.settings.max_market_cap
\ No newline at end of file
@@ -1,14 +1,29 @@
 from __future__ import annotations
 
-from typing import TypedDict, List
+from typing import TypedDict, List, Dict
 
 from shitcoins.model.first_buy_statistics import FirstBuyStatistics
+from shitcoins.model.funder_cluster import FunderCluster
 from shitcoins.model.holder import Holder
+from shitcoins.model.holder_overlap import HolderOverlap
 
 from shitcoins.model.market_info import MarketInfo
 
 
-class CoinData(TypedDict):
+class _OptionalCoinDataFields(TypedDict, total=False):
+    # seconds spent per stage, i.e. holders_sec, classification_sec, first_buys_wait_sec
+    timings: Dict[str, float]
+    # COMPLETE, or PARTIAL when the coin's deadline passed before all of its holders were classified
+    classification_status: str
+    # id the coin's trace spans are recorded under
+    trace_id: str
+    # share of the holders also holding other recently seen coins
+    holder_overlap: HolderOverlap
+    # FRESH holders grouped by a wallet that funded them
+    funder_clusters: List[FunderCluster]
+
+
+class CoinData(_OptionalCoinDataFields):
     coin_address: str
     market_info: MarketInfo
     first_buy_statistics: FirstBuyStatistics | None
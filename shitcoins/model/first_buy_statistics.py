@@ -5,5 +5,5 @@ class FirstBuyStatistics(TypedDict):
     duplicate_count: int
     duplicate_wallet_count: int
     duplicate_pct: float
-
-
+    # COMPLETE, PARTIAL when only some first block transactions were fetched in time or UNKNOWN
+    status: str
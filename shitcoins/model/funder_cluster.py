@@ -0,0 +1,9 @@
+from typing import List, TypedDict
+
+
+class FunderCluster(TypedDict):
+    # wallet that funded every holder of the cluster, directly or through other wallets
+    funder: str
+    holders: List[str]
+    # transfers between the funder and the closest of the holders, 1 when it funded a holder directly
+    hops: int
@@ -1,7 +1,12 @@
 from typing import TypedDict
 
 
-class Holder(TypedDict):
+class _OptionalHolderFields(TypedDict, total=False):
+    # reason a holder was excluded from classification, i.e. PROGRAM, AMM, CEX
+    label: str
+
+
+class Holder(_OptionalHolderFields):
     address: str
     transactions_count: int
     status: str
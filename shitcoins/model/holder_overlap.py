@@ -0,0 +1,9 @@
+from typing import Dict, TypedDict
+
+
+class HolderOverlap(TypedDict):
+    # percentage of the coin's holders that also hold any other coin seen within the window
+    overlap_pct: float
+    # percentage of the coin's holders holding each of the most overlapping other coins, by coin address
+    coin_overlap_pct: Dict[str, float]
+    window_hours: float
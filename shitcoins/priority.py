@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import math
+from datetime import datetime, timezone
+
+from shitcoins.model.coin_data import CoinData
+
+# weights of the signals a coin's priority is made of, each signal is on a log10 or 0-1 scale
+LIQUIDITY_WEIGHT = 1.0
+MARKET_CAP_WEIGHT = 0.5
+# bonus of a coin created just now, falling linearly to nothing at YOUNG_COIN_HOURS old
+YOUNG_COIN_WEIGHT = 2.0
+YOUNG_COIN_HOURS = 24
+
+
+def coin_priority(coin_data: CoinData, now: datetime | None = None) -> float:
+    """
+    Cheap estimate of how likely a coin is to end in an alert, from the DexScreener market info it was discovered
+    with: coins with more liquidity and market cap, and younger coins, go first when the API budget is tight
+    :param now: naive UTC time to measure the coin's age from
+    :return: priority, higher is processed first
+    """
+    market_info = coin_data.get('market_info') or {}
+    priority = LIQUIDITY_WEIGHT * math.log10(1 + max(0.0, market_info.get('liquidity') or 0)) \
+        + MARKET_CAP_WEIGHT * math.log10(1 + max(0.0, market_info.get('market_cap') or 0))
+    created_at_utc = market_info.get('created_at_utc')
+    if isinstance(created_at_utc, datetime):
+        now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+        age_hours = max(0.0, (now - created_at_utc).total_seconds() / 3600)
+        priority += YOUNG_COIN_WEIGHT * max(0.0, 1 - age_hours / YOUNG_COIN_HOURS)
+    return priority
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, List
+
+
+class ProviderError(Exception):
+    """
+    Raised when a provider could not answer a request, the caller decides whether to give up or ask another provider
+    """
+
+
+class RateLimitedError(ProviderError):
+    """
+    Raised when a provider answered 429, retrying after TOO_MANY_REQUESTS_BACKOFF_SEC may succeed
+    """
+
+
+@dataclass
+class ActivityPage:
+    # block times of the wallet's transactions on this page, newest first
+    block_times: List[int] = field(default_factory=list)
+    # passed to the next activity_page call to get the following, older page, None on the last page
+    cursor: Any = None
+
+
+class HolderDataProvider(ABC):
+    """
+    Source of the holder data the pipeline classifies: a token's holders and a wallet's transaction history
+    """
+    name: str
+
+    @abstractmethod
+    def token_holders(self, token_address: str) -> List[str]:
+        """
+        :return: owner addresses of the token's holders, largest holder first
+        :raises ProviderError: if no holders could be fetched at all
+        """
+
+    @abstractmethod
+    def activity_page(self, wallet: str, limit: int, cursor: Any = None) -> ActivityPage:
+        """
+        :param limit: transactions per page, a page with fewer is the last
+        :param cursor: cursor of the previous page, None for the newest page
+        :raises ProviderError: if the page could not be fetched
+        """
+
+    def close(self):
+        pass
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Tuple, TypeVar
+
+from shitcoins.metrics.registry import get_metrics
+from shitcoins.providers.base import ActivityPage, HolderDataProvider, ProviderError, RateLimitedError
+
+LOGGER = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# methods of HolderDataProvider whose latency decides when to hedge
+HEDGED_METHODS = ('token_holders', 'activity_page')
+
+
+class LatencyWindow:
+    """
+    Latest latencies of one provider method in shared memory, so every worker process forked after it was created
+    records into and reads the quantile of the same window
+    """
+
+    def __init__(self, size: int = 200):
+        self.size = size
+        self._latencies = multiprocessing.Array('d', size)
+        # number of latencies ever recorded, the next one overwrites the oldest at recorded % size
+        self._recorded = multiprocessing.Value('q', 0, lock=False)
+
+    def record(self, latency_sec: float):
+        with self._latencies.get_lock():
+            self._latencies[self._recorded.value % self.size] = latency_sec
+            self._recorded.value += 1
+
+    def __len__(self) -> int:
+        return min(self._recorded.value, self.size)
+
+    def quantile(self, quantile: float) -> float | None:
+        """
+        :return: the latency quantile of the window, None while it is empty
+        """
+        with self._latencies.get_lock():
+            latencies = sorted(self._latencies[:min(self._recorded.value, self.size)])
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(quantile * len(latencies)))]
+
+
+class HedgedProvider(HolderDataProvider):
+    """
+    Asks the primary provider first and, only when it has not answered within its usual (p95) latency or has failed,
+    sends the same request to the backup provider and uses whichever answers first. Around one request in twenty is
+    sent twice, so the slowest answers get faster for little more than the cost of the primary alone.
+
+    Pages of a wallet's history after the first are asked from the provider that answered the first page, since a
+    cursor only means something to the provider that returned it.
+    """
+
+    def __init__(self, primary: HolderDataProvider, backup: HolderDataProvider, quantile: float = 0.95,
+                 initial_hedge_delay_sec: float = 2.0, min_samples: int = 20,
+                 latency_windows: Dict[str, LatencyWindow] | None = None, max_workers: int = 8):
+        """
+        :param quantile: latency quantile of the primary after which the backup is asked
+        :param initial_hedge_delay_sec: hedge delay until min_samples latencies of a method were measured
+        :param latency_windows: method -> latencies of the primary, shared by all processes asking it, by default
+        windows of this provider's own answers only
+        """
+        self.primary = primary
+        self.backup = backup
+        self.name = f"{primary.name}+{backup.name}"
+        self.quantile = quantile
+        self.initial_hedge_delay_sec = initial_hedge_delay_sec
+        self.min_samples = min_samples
+        # method -> latest latencies of the primary's successful answers
+        self._latency_windows = latency_windows or {method: LatencyWindow() for method in HEDGED_METHODS}
+        # a losing request cannot be cancelled once sent, it finishes in the background
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='hedged')
+
+    def hedge_delay_sec(self, method: str) -> float:
+        """
+        :return: how long the primary has to answer method before the backup is asked too
+        """
+        latency_window = self._latency_windows[method]
+        if len(latency_window) < self.min_samples:
+            return self.initial_hedge_delay_sec
+        return latency_window.quantile(self.quantile)
+
+    def _record_latency(self, method: str, start_time: float, future: Future):
+        # every answer of the primary counts, also the ones that lost the race, or slow answers would never be seen
+        if future.cancelled() or future.exception() is not None:
+            return
+        self._latency_windows[method].record(time.monotonic() - start_time)
+
+    def _race(self, method: str, call: Callable[[HolderDataProvider], T]) -> Tuple[HolderDataProvider, T]:
+        """
+        :return: the provider that answered first and its answer
+        :raises ProviderError: if both failed, a RateLimitedError if either was rate limited
+        """
+        start_time = time.monotonic()
+        primary_future = self._executor.submit(call, self.primary)
+        primary_future.add_done_callback(lambda future: self._record_latency(method, start_time, future))
+        hedge_delay_sec = self.hedge_delay_sec(method)
+        done, _ = wait([primary_future], timeout=hedge_delay_sec)
+        if done and primary_future.exception() is None:
+            get_metrics().inc('shitcoins_hedged_requests_total', {'method': method, 'hedged': 'false'})
+            return self.primary, primary_future.result()
+
+        if done:
+            LOGGER.warning(f"{self.primary.name} {method} failed, asking {self.backup.name}: "
+                           f"{primary_future.exception()}")
+        else:
+            LOGGER.debug(f"{self.primary.name} {method} slower than {hedge_delay_sec:.2f}s, "
+                         f"asking {self.backup.name} too")
+        get_metrics().inc('shitcoins_hedged_requests_total', {'method': method, 'hedged': 'true'})
+        futures = {primary_future: self.primary, self._executor.submit(call, self.backup): self.backup}
+        errors: List[ProviderError] = []
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                provider = futures.pop(future)
+                if future.exception() is not None:
+                    if not isinstance(future.exception(), ProviderError):
+                        raise future.exception()
+                    errors.append(future.exception())
+                    continue
+                get_metrics().inc('shitcoins_hedge_wins_total', {'method': method, 'provider': provider.name})
+                return provider, future.result()
+        raise next((error for error in errors if isinstance(error, RateLimitedError)), errors[0])
+
+    def token_holders(self, token_address: str) -> List[str]:
+        _, owners = self._race('token_holders', lambda provider: provider.token_holders(token_address))
+        return owners
+
+    def activity_page(self, wallet: str, limit: int, cursor: Any = None) -> ActivityPage:
+        if cursor is None:
+            provider, page = self._race('activity_page', lambda provider: provider.activity_page(wallet, limit))
+        else:
+            provider_name, provider_cursor = cursor
+            provider = self.primary if provider_name == self.primary.name else self.backup
+            page = provider.activity_page(wallet, limit, provider_cursor)
+        return ActivityPage(block_times=page.block_times,
+                            cursor=(provider.name, page.cursor) if page.cursor is not None else None)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.primary.close()
+        self.backup.close()
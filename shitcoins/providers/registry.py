@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import logging
+import os
+from typing import Callable, Dict
+
+from shitcoins.providers.base import HolderDataProvider
+from shitcoins.providers.hedged import HEDGED_METHODS, HedgedProvider, LatencyWindow
+from shitcoins.providers.solana_rpc import SolanaRpcProvider
+from shitcoins.providers.solscan import SolscanProvider
+from shitcoins.settings import Settings, get_settings
+
+LOGGER = logging.getLogger(__name__)
+
+PROVIDERS: Dict[str, Callable[[Settings], HolderDataProvider]] = {
+    SolscanProvider.name: SolscanProvider,
+    SolanaRpcProvider.name: SolanaRpcProvider,
+}
+
+
+def check_holder_providers(settings: Settings):
+    """
+    :raises ValueError: if a provider in HOLDER_PROVIDERS is unknown or misses its API key, or FUNDING_TRACE is on
+    without SOLSCAN_API_KEY, before any work starts
+    """
+    for name in settings.holder_providers:
+        if name not in PROVIDERS:
+            raise ValueError(f"Unknown holder provider {name}, use {' or '.join(PROVIDERS)}.")
+        if name == SolscanProvider.name and not settings.solscan_api_key:
+            raise ValueError("API key not found. Please set it in the .env file.")
+        if name == SolanaRpcProvider.name and not settings.solana_api_key:
+            raise ValueError("SOLANA_API_KEY not found, the rpc holder provider needs it. Please set it in the "
+                             ".env file.")
+    # funders are looked up on Solscan whatever the holder providers are
+    if settings.funding_trace and not settings.solscan_api_key:
+        raise ValueError("SOLSCAN_API_KEY not found, FUNDING_TRACE needs it. Please set it in the .env file.")
+
+
+_latency_windows: Dict[str, Dict[str, LatencyWindow]] | None = None
+
+
+def get_latency_windows() -> Dict[str, Dict[str, LatencyWindow]]:
+    """
+    :return: provider -> method -> latencies of the provider's answers, of the whole process tree. Worker processes
+    inherit them when they were created before the workers were forked, which the holder classification pool makes
+    sure of, so every process hedges by the p95 latency of all requests rather than of its own few.
+    """
+    global _latency_windows
+    if _latency_windows is None:
+        _latency_windows = {name: {method: LatencyWindow() for method in HEDGED_METHODS} for name in PROVIDERS}
+    return _latency_windows
+
+
+def create_holder_provider(settings: Settings) -> HolderDataProvider:
+    """
+    :return: the first provider in HOLDER_PROVIDERS, hedged with the second when there is one
+    """
+    check_holder_providers(settings)
+    providers = [PROVIDERS[name](settings) for name in settings.holder_providers]
+    if len(providers) == 1:
+        return providers[0]
+    return HedgedProvider(providers[0], providers[1], initial_hedge_delay_sec=settings.holder_hedge_delay_sec,
+                          latency_windows=get_latency_windows()[providers[0].name])
+
+
+_provider: HolderDataProvider | None = None
+_provider_pid: int | None = None
+_provider_settings: Settings | None = None
+
+
+def get_holder_provider(settings: Settings | None = None) -> HolderDataProvider:
+    """
+    :return: the holder data provider of this process, created again when the settings changed so a reload takes
+    effect, and per process since its connections and threads must not be shared with forked worker processes
+    """
+    global _provider, _provider_pid, _provider_settings
+    settings = settings or get_settings()
+    if _provider is None or _provider_pid != os.getpid() or _provider_settings != settings:
+        # a provider replaced after a reload is not closed, other threads may still be using it
+        LOGGER.debug(f"Using holder providers {', '.join(settings.holder_providers)}")
+        _provider = create_holder_provider(settings)
+        _provider_pid = os.getpid()
+        _provider_settings = settings
+    return _provider
+
+
+def reset_holder_provider():
+    global _provider, _provider_pid, _provider_settings
+    if _provider is not None and _provider_pid == os.getpid():
+        _provider.close()
+    _provider = None
+    _provider_pid = None
+    _provider_settings = None
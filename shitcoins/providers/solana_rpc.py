@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import logging
+import time
+from typing import Any, Dict, List
+
+from shitcoins.metrics.registry import get_metrics
+from shitcoins.metrics.tracing import span
+from shitcoins.providers.base import ActivityPage, HolderDataProvider, ProviderError, RateLimitedError
+from shitcoins.replay.transports import get_http_session
+from shitcoins.settings import Settings, get_settings
+from shitcoins.sol.compute_unit_rate_limiter import ComputeUnitBudget, compute_units_of, get_compute_unit_budget
+
+LOGGER = logging.getLogger(__name__)
+
+TOKEN_PROGRAM_ID = 'TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA'
+# size of an SPL token account, the mint is its first 32 bytes
+TOKEN_ACCOUNT_SIZE = 165
+# JSON-RPC error code some providers answer instead of a 429 status
+RATE_LIMITED_CODES = (429, -32005)
+
+
+class SolanaRpcProvider(HolderDataProvider):
+    """
+    Solana JSON-RPC at SOLANA_API_KEY. Holders are the owners of the mint's token accounts from getProgramAccounts,
+    falling back to the 20 largest accounts from getTokenLargestAccounts on RPC providers that do not serve
+    getProgramAccounts for the token program. Wallet history is every transaction signature from
+    getSignaturesForAddress, not only SOL transfers, which counts towards SOLSCAN_SKIP_THRESHOLD the same way. Every
+    call is charged against the SOLANA_CU_PER_SEC budget bundle analysis spends from too.
+    """
+    name = 'rpc'
+
+    def __init__(self, settings: Settings | None = None, timeout_sec: float = 30,
+                 budget: ComputeUnitBudget | None = None):
+        """
+        :param budget: compute units every call is charged against, by default the process tree's budget shared with
+        bundle analysis
+        """
+        self._settings = settings
+        self._timeout_sec = timeout_sec
+        self._budget = budget
+
+    @property
+    def settings(self) -> Settings:
+        return self._settings or get_settings()
+
+    def _wait_for_compute_units(self, method: str):
+        cost = compute_units_of(method)
+        budget = self._budget or get_compute_unit_budget(self.settings)
+        with span('solana_rpc limiter wait', 'limiter', compute_units=cost):
+            wait_sec = budget.reserve(cost)
+            if wait_sec:
+                time.sleep(wait_sec)
+        get_metrics().inc('shitcoins_rate_limiter_compute_units_total', {'limiter': 'solana_rpc'}, cost)
+        if wait_sec:
+            get_metrics().inc('shitcoins_rate_limiter_wait_seconds_total', {'limiter': 'solana_rpc'}, wait_sec)
+
+    def _rpc(self, method: str, params: list) -> Any:
+        self._wait_for_compute_units(method)
+        with span(f"rpc {method}", 'api'):
+            start_time = time.monotonic()
+            try:
+                response = get_http_session().post(self.settings.solana_api_key, timeout=self._timeout_sec,
+                                                   json={'jsonrpc': '2.0', 'id': 1, 'method': method,
+                                                         'params': params})
+            except OSError as e:
+                get_metrics().record_request('solana_rpc', 'error', time.monotonic() - start_time)
+                raise ProviderError(f"{method} failed: {e}") from e
+            get_metrics().record_request('solana_rpc', response.status_code, time.monotonic() - start_time)
+        if response.status_code == 429:
+            raise RateLimitedError(f"Error: {response.status_code} - {response.text}")
+        if response.status_code != 200:
+            raise ProviderError(f"Error: {response.status_code} - {response.text}")
+        try:
+            body = response.json()
+        except ValueError as e:
+            raise ProviderError(f"Unreadable {method} response: {e}") from e
+        error = body.get('error')
+        if error is not None:
+            if error.get('code') in RATE_LIMITED_CODES:
+                raise RateLimitedError(f"{method} error: {error}")
+            raise ProviderError(f"{method} error: {error}")
+        return body.get('result')
+
+    def token_holders(self, token_address: str) -> List[str]:
+        try:
+            token_accounts = self._rpc('getProgramAccounts', [TOKEN_PROGRAM_ID, {
+                'encoding': 'jsonParsed',
+                'filters': [{'dataSize': TOKEN_ACCOUNT_SIZE}, {'memcmp': {'offset': 0, 'bytes': token_address}}]}])
+            balances = [(account['account']['data']['parsed']['info']['owner'],
+                         int(account['account']['data']['parsed']['info']['tokenAmount']['amount']))
+                        for account in token_accounts]
+        except RateLimitedError:
+            raise
+        except (ProviderError, KeyError, TypeError, ValueError) as e:
+            LOGGER.warning(f"getProgramAccounts failed for {token_address}, using the largest accounts only: {e}")
+            balances = self._largest_account_balances(token_address)
+
+        # an owner can hold the token in several accounts
+        owner_to_amount: Dict[str, int] = {}
+        for owner, amount in balances:
+            owner_to_amount[owner] = owner_to_amount.get(owner, 0) + amount
+        return sorted((owner for owner, amount in owner_to_amount.items() if amount > 0),
+                      key=lambda owner: owner_to_amount[owner], reverse=True)
+
+    def _largest_account_balances(self, token_address: str) -> List[tuple]:
+        largest_accounts = (self._rpc('getTokenLargestAccounts', [token_address]) or {}).get('value') or []
+        if not largest_accounts:
+            return []
+        accounts = (self._rpc('getMultipleAccounts', [[account['address'] for account in largest_accounts],
+                                                      {'encoding': 'jsonParsed'}]) or {}).get('value') or []
+        try:
+            return [(account['data']['parsed']['info']['owner'], int(largest['amount']))
+                    for largest, account in zip(largest_accounts, accounts) if account is not None]
+        except (KeyError, TypeError, ValueError) as e:
+            raise ProviderError(f"Unreadable token accounts of {token_address}: {e}") from e
+
+    def activity_page(self, wallet: str, limit: int, cursor: Any = None) -> ActivityPage:
+        # the cursor is the signature of the oldest transaction on the previous page
+        config: Dict[str, Any] = {'limit': limit}
+        if cursor is not None:
+            config['before'] = cursor
+        signatures = self._rpc('getSignaturesForAddress', [wallet, config]) or []
+        try:
+            return ActivityPage(block_times=[signature['blockTime'] for signature in signatures
+                                             if signature.get('blockTime') is not None],
+                                cursor=signatures[-1]['signature'] if len(signatures) >= limit else None)
+        except (KeyError, TypeError) as e:
+            raise ProviderError(f"Unreadable getSignaturesForAddress response for {wallet}: {e}") from e
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import logging
+import time
+from typing import Any, List
+
+import requests
+from requests import Response
+
+from shitcoins.metrics.registry import get_metrics
+from shitcoins.metrics.tracing import span
+from shitcoins.providers.base import ActivityPage, HolderDataProvider, ProviderError, RateLimitedError
+from shitcoins.replay.transports import get_http_session
+from shitcoins.settings import Settings, get_settings
+
+LOGGER = logging.getLogger(__name__)
+
+HOLDERS_PER_PAGE = 50
+
+
+class SolscanProvider(HolderDataProvider):
+    """
+    Solscan Pro API, holders from token/holders and wallet history from account/solTransfers
+    """
+    name = 'solscan'
+
+    def __init__(self, settings: Settings | None = None, timeout_sec: float = 30):
+        self._settings = settings
+        self._timeout_sec = timeout_sec
+
+    @property
+    def settings(self) -> Settings:
+        return self._settings or get_settings()
+
+    def _get(self, path: str, span_name: str, **span_args) -> Response:
+        settings = self.settings
+        headers = {
+            'accept': 'application/json',
+            'token': settings.solscan_api_key
+        }
+        with span(span_name, 'api', **span_args):
+            start_time = time.monotonic()
+            try:
+                response = get_http_session().get(f"{settings.solscan_api_url}{path}", headers=headers,
+                                                  timeout=self._timeout_sec)
+            except requests.RequestException as e:
+                get_metrics().record_request('solscan', 'error', time.monotonic() - start_time)
+                raise ProviderError(f"{span_name} failed: {e}") from e
+            get_metrics().record_request('solscan', response.status_code, time.monotonic() - start_time)
+        if response.status_code == 429:
+            raise RateLimitedError(f"Error: {response.status_code} - {response.text}")
+        if response.status_code != 200:
+            raise ProviderError(f"Error: {response.status_code} - {response.text}")
+        return response
+
+    def token_holders(self, token_address: str) -> List[str]:
+        owners: List[str] = []
+        page = 0
+        while True:
+            try:
+                response = self._get(f"/token/holders?tokenAddress={token_address}&limit={HOLDERS_PER_PAGE}"
+                                     f"&offset={page * HOLDERS_PER_PAGE}",
+                                     'solscan token/holders', offset=page * HOLDERS_PER_PAGE)
+                holders = response.json().get('data', [])
+            except (ProviderError, ValueError) as e:
+                if not owners:
+                    raise ProviderError(str(e)) from e
+                # the top holders already fetched are the ones that matter most, classify those
+                LOGGER.error(f"{e}, keeping the first {len(owners)} holders of {token_address}")
+                break
+            if not holders:
+                break  # No more data to fetch
+            owners.extend(holder['owner'] for holder in holders)
+            page += 1
+        return owners
+
+    def sol_transfers(self, wallet: str, limit: int, offset: int = 0, **span_args) -> List[dict]:
+        """
+        :param offset: number of transfers on the pages before, newest first
+        :return: a page of the wallet's SOL transfers, a page with fewer than limit is the last
+        :raises ProviderError: if the page could not be fetched, a RateLimitedError if Solscan answered 429
+        """
+        response = self._get(f"/account/solTransfers?account={wallet}&limit={limit}&offset={offset}",
+                             'solscan account/solTransfers', offset=offset, **span_args)
+        try:
+            return response.json()['data'] or []
+        except (ValueError, KeyError) as e:
+            raise ProviderError(f"Unreadable solTransfers response for {wallet}: {e}") from e
+
+    def activity_page(self, wallet: str, limit: int, cursor: Any = None) -> ActivityPage:
+        # the cursor is the offset of the page, the number of transfers on the pages before it
+        offset = cursor or 0
+        transfers = self.sol_transfers(wallet, limit, offset)
+        return ActivityPage(block_times=[transfer['blockTime'] for transfer in transfers],
+                            cursor=offset + len(transfers) if len(transfers) >= limit else None)
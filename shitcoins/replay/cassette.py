@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, Tuple
+
+from shitcoins.metrics.registry import get_metrics
+from shitcoins.settings import get_settings
+
+LOGGER = logging.getLogger(__name__)
+
+RECORD = 'record'
+REPLAY = 'replay'
+
+
+@dataclass
+class RecordedResponse:
+    status: int
+    body: bytes
+    elapsed_sec: float
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+class Cassette:
+    """
+    SQLite file of recorded API responses, zlib compressed and indexed by service and request key. Identical requests
+    made several times, e.g. polling the same page, are kept in the order they were made and replayed in that order,
+    the last one is repeated once they run out.
+    """
+
+    def __init__(self, db_path: str, mode: str, speed: float = 1.0):
+        """
+        :param mode: RECORD to add every response to the cassette, REPLAY to serve responses from it
+        :param speed: replay speed, 1 waits as long as each response took when recorded, 10 ten times less,
+        0 answers immediately
+        """
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown cassette mode {mode}, use {RECORD} or {REPLAY}")
+        self.db_path = db_path
+        self.mode = mode
+        self.speed = speed
+        self._lock = threading.Lock()
+        # worker processes record into the same file, so wait for each other's writes instead of failing
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS responses ("
+                           "service TEXT NOT NULL, request_key TEXT NOT NULL, seq INTEGER NOT NULL, "
+                           "recorded_at REAL NOT NULL, elapsed_sec REAL NOT NULL, status INTEGER NOT NULL, "
+                           "headers TEXT NOT NULL, body BLOB NOT NULL, PRIMARY KEY (service, request_key, seq))")
+        self._conn.commit()
+        # (service, request key) -> seq of the next response to replay
+        self._replay_positions: Dict[Tuple[str, str], int] = {}
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == RECORD
+
+    def record(self, service: str, request_key: str, response: RecordedResponse):
+        with self._lock:
+            # seq is picked in the insert itself, so processes recording the same request never collide
+            self._conn.execute("INSERT INTO responses VALUES (?, ?, (SELECT COALESCE(MAX(seq) + 1, 0) FROM responses "
+                               "WHERE service = ? AND request_key = ?), ?, ?, ?, ?, ?)",
+                               (service, request_key, service, request_key, time.time(), response.elapsed_sec,
+                                response.status, json.dumps(response.headers), zlib.compress(response.body)))
+            self._conn.commit()
+
+    def play(self, service: str, request_key: str) -> RecordedResponse | None:
+        """
+        :return: the next recorded response to the request, None if it was never recorded
+        """
+        with self._lock:
+            seq = self._replay_positions.get((service, request_key), 0)
+            row = self._conn.execute("SELECT elapsed_sec, status, headers, body FROM responses "
+                                     "WHERE service = ? AND request_key = ? AND seq <= ? ORDER BY seq DESC LIMIT 1",
+                                     (service, request_key, seq)).fetchone()
+            if row is not None:
+                self._replay_positions[(service, request_key)] = seq + 1
+        get_metrics().inc('shitcoins_cache_requests_total',
+                          {'cache': 'cassette', 'result': 'miss' if row is None else 'hit'})
+        if row is None:
+            LOGGER.warning(f"No recorded {service} response for {request_key}")
+            return None
+        elapsed_sec, status, headers, body = row
+        return RecordedResponse(status=status, body=zlib.decompress(body), elapsed_sec=elapsed_sec,
+                                headers=json.loads(headers))
+
+    def replay_delay(self, elapsed_sec: float) -> float:
+        return elapsed_sec / self.speed if self.speed > 0 else 0
+
+    def wait(self, elapsed_sec: float):
+        """
+        Waits as long as a response that took elapsed_sec when recorded takes at the replay speed
+        """
+        delay = self.replay_delay(elapsed_sec)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def async_wait(self, elapsed_sec: float):
+        delay = self.replay_delay(elapsed_sec)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def services(self) -> Dict[str, int]:
+        """
+        :return: number of recorded responses per service
+        """
+        with self._lock:
+            return dict(self._conn.execute("SELECT service, COUNT(*) FROM responses GROUP BY service").fetchall())
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_cassette: Cassette | None = None
+_cassette_pid: int | None = None
+
+
+def get_cassette() -> Cassette | None:
+    """
+    :return: the cassette of this process as configured by API_CASSETTE_MODE, API_CASSETTE_PATH and
+    API_CASSETTE_SPEED, None when API traffic is neither recorded nor replayed
+    """
+    global _cassette, _cassette_pid
+    settings = get_settings()
+    if not settings.api_cassette_mode:
+        return None
+    # a connection must not be shared with forked worker processes, each opens its own
+    if _cassette is None or _cassette_pid != os.getpid():
+        LOGGER.info(f"Using API cassette {settings.api_cassette_path} to {settings.api_cassette_mode}")
+        _cassette = Cassette(settings.api_cassette_path, settings.api_cassette_mode, speed=settings.api_cassette_speed)
+        _cassette_pid = os.getpid()
+    return _cassette
+
+
+def reset_cassette():
+    """
+    Closes the process wide cassette, so the next get_cassette call reads its configuration again
+    """
+    global _cassette, _cassette_pid
+    if _cassette is not None and _cassette_pid == os.getpid():
+        _cassette.close()
+    _cassette = None
+    _cassette_pid = None
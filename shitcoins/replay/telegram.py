@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import json
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator
+
+from shitcoins.replay.cassette import Cassette, RecordedResponse
+
+
+@dataclass
+class ReplayedMessage:
+    """
+    The parts of a Telegram message the fetcher reads
+    """
+    id: int
+    text: str | None
+
+
+class CassetteTelegramClient:
+    """
+    Wraps a TelegramClient to record the messages each iter_messages call returns, or to replay them without
+    connecting to Telegram at all. Everything else is passed through to the wrapped client while recording.
+    """
+
+    def __init__(self, client, cassette: Cassette):
+        self._client = client
+        self.cassette = cassette
+
+    async def start(self, *args, **kwargs):
+        if self.cassette.recording:
+            return await self._client.start(*args, **kwargs)
+
+    async def disconnect(self):
+        if self.cassette.recording:
+            return await self._client.disconnect()
+
+    async def iter_messages(self, entity: str, limit: int | None = None, **kwargs) -> AsyncIterator[ReplayedMessage]:
+        request_key = json.dumps({'entity': entity, 'limit': limit, **kwargs}, sort_keys=True)
+        if self.cassette.recording:
+            start_time = time.monotonic()
+            messages = []
+            async for message in self._client.iter_messages(entity, limit=limit, **kwargs):
+                messages.append({'id': message.id, 'text': message.text})
+                yield message
+            self.cassette.record('telegram', request_key, RecordedResponse(
+                status=200, body=json.dumps(messages).encode(), elapsed_sec=time.monotonic() - start_time))
+            return
+
+        recorded = self.cassette.play('telegram', request_key)
+        if recorded is None:
+            return
+        await self.cassette.async_wait(recorded.elapsed_sec)
+        for message in json.loads(recorded.body):
+            yield ReplayedMessage(id=message['id'], text=message['text'])
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
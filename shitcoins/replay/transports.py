@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Dict, List
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from shitcoins.replay.cassette import Cassette, RecordedResponse, get_cassette
+
+# response headers the app reads, everything else is left out of the cassette
+KEPT_HEADERS = ('content-type', 'retry-after')
+# the Telegram Bot API takes the bot token as part of the path
+_BOT_TOKEN_PATTERN = re.compile(r'/bot[^/]+/')
+
+
+def _service(url: str) -> str:
+    if 'solscan' in url:
+        return 'solscan'
+    if 'dexscreener' in url:
+        return 'dexscreener'
+    if _BOT_TOKEN_PATTERN.search(url):
+        return 'telegram_bot'
+    return 'http'
+
+
+def http_request_key(method: str, url: str, body: bytes | str | None) -> str:
+    """
+    :return: key a request is recorded under. Credentials are never part of it, and Bot API messages are matched by
+    order only since their text carries timings that never repeat exactly.
+    """
+    url = _BOT_TOKEN_PATTERN.sub('/bot<token>/', url)
+    if not body or _service(url) == 'telegram_bot':
+        return f"{method} {url}"
+    if isinstance(body, str):
+        body = body.encode()
+    return f"{method} {url} {hashlib.sha256(body).hexdigest()[:16]}"
+
+
+class CassetteAdapter(HTTPAdapter):
+    """
+    requests transport adapter recording every response into the cassette, or answering from it without any
+    network traffic when replaying. A request that was never recorded fails with a ConnectionError when replaying.
+    """
+
+    def __init__(self, cassette: Cassette, **kwargs):
+        super().__init__(**kwargs)
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        service = _service(request.url)
+        request_key = http_request_key(request.method, request.url, request.body)
+        if self.cassette.recording:
+            start_time = time.monotonic()
+            response = super().send(request, **kwargs)
+            self.cassette.record(service, request_key, RecordedResponse(
+                status=response.status_code, body=response.content, elapsed_sec=time.monotonic() - start_time,
+                headers={name: response.headers[name] for name in KEPT_HEADERS if name in response.headers}))
+            return response
+
+        recorded = self.cassette.play(service, request_key)
+        if recorded is None:
+            raise requests.ConnectionError(f"No recorded response for {request_key}", request=request)
+        self.cassette.wait(recorded.elapsed_sec)
+        response = requests.Response()
+        response.status_code = recorded.status
+        response._content = recorded.body
+        response.headers = CaseInsensitiveDict(recorded.headers)
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        response.reason = 'Replayed'
+        return response
+
+
+def http_adapter(**kwargs) -> HTTPAdapter:
+    """
+    :param kwargs: passed on to HTTPAdapter, e.g. pool sizes
+    :return: a CassetteAdapter when API traffic is recorded or replayed, otherwise a plain HTTPAdapter
+    """
+    cassette = get_cassette()
+    return CassetteAdapter(cassette, **kwargs) if cassette is not None else HTTPAdapter(**kwargs)
+
+
+def mount_http_adapter(session: requests.Session, **kwargs):
+    adapter = http_adapter(**kwargs)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+
+_http_session: requests.Session | None = None
+_http_session_pid: int | None = None
+
+
+def get_http_session() -> requests.Session:
+    """
+    :return: a pooled session for the calls that previously went through requests.get, one per process since
+    pooled connections must not be shared with forked worker processes
+    """
+    global _http_session, _http_session_pid
+    if _http_session is None or _http_session_pid != os.getpid():
+        _http_session = requests.Session()
+        mount_http_adapter(_http_session)
+        _http_session_pid = os.getpid()
+    return _http_session
+
+
+def reset_http_session():
+    global _http_session, _http_session_pid
+    _http_session = None
+    _http_session_pid = None
+
+
+def _rpc_request_key(rpc_request: dict) -> str:
+    return f"{rpc_request['method']} {json.dumps(rpc_request.get('params', []), sort_keys=True)}"
+
+
+class CassetteRpcTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport for the Solana JSON-RPC client. Each request of a batch is recorded on its own without its id,
+    so a replay matches them however calls happened to be batched together and answers with the ids asked for.
+    """
+
+    def __init__(self, cassette: Cassette, transport: httpx.AsyncBaseTransport | None = None):
+        self.cassette = cassette
+        self._transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        payload = json.loads(await request.aread())
+        rpc_requests: List[dict] = payload if isinstance(payload, list) else [payload]
+        if self.cassette.recording:
+            return await self._record(request, rpc_requests)
+
+        recorded_responses = [self.cassette.play('rpc', _rpc_request_key(rpc_request))
+                              for rpc_request in rpc_requests]
+        if any(recorded is None for recorded in recorded_responses):
+            raise httpx.ConnectError("No recorded response for part of the RPC request", request=request)
+        await self.cassette.async_wait(max(recorded.elapsed_sec for recorded in recorded_responses))
+
+        failed = next((recorded for recorded in recorded_responses if recorded.status != 200), None)
+        if failed is not None:
+            return httpx.Response(failed.status, headers=failed.headers, content=failed.body, request=request)
+        responses = [{**json.loads(recorded.body), 'id': rpc_request['id']}
+                     for rpc_request, recorded in zip(rpc_requests, recorded_responses)]
+        return httpx.Response(200, json=responses if isinstance(payload, list) else responses[0], request=request)
+
+    async def _record(self, request: httpx.Request, rpc_requests: List[dict]) -> httpx.Response:
+        start_time = time.monotonic()
+        response = await self._transport.handle_async_request(request)
+        body = await response.aread()
+        elapsed_sec = time.monotonic() - start_time
+        headers: Dict[str, str] = {name: response.headers[name] for name in KEPT_HEADERS if name in response.headers}
+
+        id_to_response = {}
+        if response.status_code == 200:
+            parsed = json.loads(body)
+            id_to_response = {rpc_response.get('id'): rpc_response
+                              for rpc_response in (parsed if isinstance(parsed, list) else [parsed])}
+        for rpc_request in rpc_requests:
+            rpc_response = id_to_response.get(rpc_request['id'])
+            if rpc_response is not None:
+                recorded = RecordedResponse(status=200, elapsed_sec=elapsed_sec, headers=headers,
+                                            body=json.dumps({k: v for k, v in rpc_response.items() if k != 'id'})
+                                            .encode())
+            else:
+                # a rate limited or failed request is replayed as the same failure
+                recorded = RecordedResponse(status=response.status_code, body=body, elapsed_sec=elapsed_sec,
+                                            headers=headers)
+            self.cassette.record('rpc', _rpc_request_key(rpc_request), recorded)
+        # the body was already decoded, so it is handed on without the encoding headers it was sent with
+        response_headers = [(name, value) for name, value in response.headers.items()
+                            if name.lower() not in ('content-encoding', 'content-length', 'transfer-encoding')]
+        return httpx.Response(response.status_code, headers=response_headers, content=body, request=request)
+
+    async def aclose(self):
+        await self._transport.aclose()
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, Callable
+
+from shitcoins.metrics.registry import get_metrics
+
+LOGGER = logging.getLogger(__name__)
+
+
+async def fixed_cadence(interval_sec: Callable[[], float], name: str) -> AsyncIterator[int]:
+    """
+    Yields at a fixed cadence, every interval_sec() seconds measured from the start of one tick to the start of the
+    next, however long the work done per tick takes. A tick running past the start of the next one is an overrun: the
+    slots it missed are skipped rather than run back to back, and the overrun is recorded.
+    :param interval_sec: read before every tick, so a settings reload changes the cadence
+    :param name: name the overrun metrics are labelled with
+    :return: the number of the tick, counting skipped slots
+    """
+    tick = 0
+    tick_start = time.monotonic()
+    while True:
+        yield tick
+        interval = interval_sec()
+        now = time.monotonic()
+        if interval <= 0:
+            tick, tick_start = tick + 1, now
+            await asyncio.sleep(0)
+            continue
+
+        tick += 1
+        next_start = tick_start + interval
+        if now > next_start:
+            overrun_sec = now - next_start
+            missed_slots = int(overrun_sec // interval) + 1
+            LOGGER.warning(f"{name} overran its {interval:g}s cadence by {overrun_sec:.1f}s, "
+                           f"skipping {missed_slots} slot(s)")
+            get_metrics().inc('shitcoins_schedule_overruns_total', {'task': name})
+            get_metrics().observe('shitcoins_schedule_overrun_seconds', overrun_sec, {'task': name})
+            tick += missed_slots
+            next_start += missed_slots * interval
+        tick_start = next_start
+        await asyncio.sleep(next_start - now)
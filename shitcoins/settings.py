@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import logging
+import os
+import signal
+from dataclasses import dataclass, field, fields, replace
+from typing import Any, Callable, List, Mapping, Tuple
+
+from dotenv import dotenv_values, load_dotenv
+
+LOGGER = logging.getLogger(__name__)
+
+
+class SettingsError(ValueError):
+    """
+    Raised with every invalid setting listed, so a misconfiguration fails at startup instead of inside a worker
+    """
+
+
+def _parse_bool(value: str) -> bool:
+    if value.lower() in ('true', '1', 'yes'):
+        return True
+    if value.lower() in ('false', '0', 'no'):
+        return False
+    raise ValueError(f"{value} is not true or false")
+
+
+def _parse_list(value: str) -> Tuple[str, ...]:
+    return tuple(item.strip() for item in value.split(',') if item.strip())
+
+
+def _positive(value) -> bool:
+    return value > 0
+
+
+def _not_negative(value) -> bool:
+    return value >= 0
+
+
+def _one_or_two_providers(value) -> bool:
+    return 1 <= len(value) <= 2
+
+
+def _cassette_mode(value) -> bool:
+    return value in ('record', 'replay')
+
+
+def _setting(env: str, parse: Callable[[str], Any] = str, default: Any = None,
+             check: Callable[[Any], bool] | None = None, empty_is_none: bool = False):
+    """
+    :param env: environment variable the setting is read from, unset or empty means default
+    :param check: validation of the parsed value, e.g. _positive
+    :param empty_is_none: an empty value disables the setting instead of falling back to default
+    """
+    return field(default=default, metadata={'env': env, 'parse': parse, 'check': check,
+                                            'empty_is_none': empty_is_none})
+
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    Immutable, validated snapshot of the configuration, parsed once at startup instead of on every call and passed
+    to worker processes along with their work. See .env.example for what each setting does.
+    """
+    # Telegram scraping
+    api_id: int | None = _setting('API_ID', int)
+    api_hash: str | None = _setting('API_HASH')
+    phone: str | None = _setting('PHONE')
+    channel_username: str | None = _setting('CHANNEL_USERNAME')
+    channel_usernames: Tuple[str, ...] = _setting('CHANNEL_USERNAMES', _parse_list, ())
+    fetch_limit: int = _setting('FETCH_LIMIT', int, 100, _positive)
+    telegram_cursors_path: str = _setting('TELEGRAM_CURSORS_PATH', default='telegram_cursors.sqlite3')
+    telegram_backfill_max_pages: int = _setting('TELEGRAM_BACKFILL_MAX_PAGES', int, 10, _positive)
+    seen_addresses_path: str = _setting('SEEN_ADDRESSES_PATH', default='seen_addresses.sqlite3')
+    seen_address_max_age_hours: float | None = _setting('SEEN_ADDRESS_MAX_AGE_HOURS', float, 168, _positive,
+                                                        empty_is_none=True)
+    seen_address_bloom_capacity: int = _setting('SEEN_ADDRESS_BLOOM_CAPACITY', int, 0, _not_negative)
+    wallet_overlap_path: str | None = _setting('WALLET_OVERLAP_PATH', default='wallet_overlap.sqlite3',
+                                               empty_is_none=True)
+    wallet_overlap_window_hours: float = _setting('WALLET_OVERLAP_WINDOW_HOURS', float, 24, _positive)
+
+    # Solscan holder discovery and classification
+    solscan_api_key: str | None = _setting('SOLSCAN_API_KEY')
+    solscan_api_url: str = _setting('SOLSCAN_API_URL', default='https://pro-api.solscan.io/v1.0')
+    solscan_max_trns_per_req: int = _setting('SOLSCAN_MAX_TRNS_PER_REQ', int, 50, _positive)
+    solscan_skip_threshold: int = _setting('SOLSCAN_SKIP_THRESHOLD', int, 200, _positive)
+    holder_providers: Tuple[str, ...] = _setting('HOLDER_PROVIDERS', _parse_list, ('solscan',), _one_or_two_providers)
+    holder_hedge_delay_sec: float = _setting('HOLDER_HEDGE_DELAY_SEC', float, 2, _positive)
+    too_many_requests_backoff_sec: float = _setting('TOO_MANY_REQUESTS_BACKOFF_SEC', float, 60, _not_negative)
+    fresh_wallet_hours: int = _setting('FRESH_WALLET_HOURS', int, 24, _positive)
+    min_holder_count: int = _setting('MIN_HOLDER_COUNT', int, 50, _not_negative)
+    holder_batch_size: int = _setting('HOLDER_BATCH_SIZE', int, 10, _positive)
+    funding_trace: bool = _setting('FUNDING_TRACE', _parse_bool, False)
+    funder_graph_path: str = _setting('FUNDER_GRAPH_PATH', default='funder_graph.sqlite3')
+    funding_max_hops: int = _setting('FUNDING_MAX_HOPS', int, 2, _positive)
+    funding_max_pages: int = _setting('FUNDING_MAX_PAGES', int, 2, _positive)
+    reserved_cpus: int = _setting('RESERVED_CPUS', int, 0, _not_negative)
+    run_with_db: bool = _setting('RUN_WITH_DB', _parse_bool, False)
+    db_user: str | None = _setting('DB_USER')
+    db_port: int | None = _setting('DB_PORT', int)
+
+    # DexScreener market info
+    dexscreener_tokens_url: str | None = _setting('DEXSCREENER_TOKENS_URL')
+    dex_delay_sec: float = _setting('DEX_DELAY_SEC', float, 15, _not_negative)
+    dex_retry_attempts: int = _setting('DEX_RETRY_ATTEMPTS', int, 10, _positive)
+    min_market_cap: float = _setting('MIN_MARKET_CAP', float, 10_000, _not_negative)
+    max_market_cap: float = _setting('MAX_MARKET_CAP', float, 1_000_000, _positive)
+
+    # Solana RPC first buy analysis
+    solana_api_key: str | None = _setting('SOLANA_API_KEY')
+    solana_skip_threshold: int = _setting('SOLANA_SKIP_THRESHOLD', int, 1_000_000, _positive)
+    solana_cu_per_sec: float = _setting('SOLANA_CU_PER_SEC', float, 330, _positive)
+    solana_rpc_batch_size: int = _setting('SOLANA_RPC_BATCH_SIZE', int, 20, _positive)
+    solana_rpc_batch_window_ms: float = _setting('SOLANA_RPC_BATCH_WINDOW_MS', float, 10, _not_negative)
+    bundle_analysis_budget_sec: float = _setting('BUNDLE_ANALYSIS_BUDGET_SEC', float, 30, _positive)
+    solana_cache_path: str | None = _setting('SOLANA_CACHE_PATH', default='solana_cache.sqlite3', empty_is_none=True)
+    known_addresses_file: str | None = _setting('KNOWN_ADDRESSES_FILE')
+
+    # alerts
+    bot_token: str | None = _setting('BOT_TOKEN')
+    chat_id: str | None = _setting('CHAT_ID')
+    send_percent_threshold: float = _setting('SEND_PERCENT_THRESHOLD', float, 10, _not_negative)
+    alert_per_chat_interval_sec: float = _setting('ALERT_PER_CHAT_INTERVAL_SEC', float, 3, _not_negative)
+    alert_global_per_sec: float = _setting('ALERT_GLOBAL_PER_SEC', float, 30, _positive)
+    alert_max_combined: int = _setting('ALERT_MAX_COMBINED', int, 5, _positive)
+
+    # main loop
+    loop_delay: float = _setting('LOOP_DELAY', float, 15, _not_negative)
+    coin_priority_aging_per_sec: float = _setting('COIN_PRIORITY_AGING_PER_SEC', float, 0.05, _not_negative)
+    coin_deadline_sec: float = _setting('COIN_DEADLINE_SEC', float, 120, _positive)
+    coins_archive_dir: str | None = _setting('COINS_ARCHIVE_DIR')
+    snapshot_archive_dir: str | None = _setting('SNAPSHOT_ARCHIVE_DIR')
+    metrics_port: int | None = _setting('METRICS_PORT', int, check=_not_negative)
+    trace_file: str | None = _setting('TRACE_FILE')
+    api_cassette_mode: str | None = _setting('API_CASSETTE_MODE', str.lower, check=_cassette_mode)
+    api_cassette_path: str = _setting('API_CASSETTE_PATH', default='api_cassette.sqlite3')
+    api_cassette_speed: float = _setting('API_CASSETTE_SPEED', float, 1, _not_negative)
+
+    def __post_init__(self):
+        if self.min_market_cap > self.max_market_cap:
+            raise SettingsError(f"MIN_MARKET_CAP {self.min_market_cap} is above MAX_MARKET_CAP {self.max_market_cap}")
+
+    @property
+    def channels(self) -> Tuple[str, ...]:
+        """
+        :return: channels to scrape, CHANNEL_USERNAMES takes precedence over the single CHANNEL_USERNAME
+        """
+        return self.channel_usernames or _parse_list(self.channel_username or '')
+
+    @classmethod
+    def from_env(cls, environ: Mapping[str, str] | None = None) -> Settings:
+        """
+        :raises SettingsError: listing every setting that failed to parse or validate
+        """
+        environ = os.environ if environ is None else environ
+        values = {}
+        errors: List[str] = []
+        for setting in fields(cls):
+            env, parse, check = setting.metadata['env'], setting.metadata['parse'], setting.metadata['check']
+            raw = environ.get(env)
+            if raw is None or raw.strip() == '':
+                values[setting.name] = None if raw is not None and setting.metadata['empty_is_none'] \
+                    else setting.default
+                continue
+            try:
+                value = parse(raw.strip())
+            except ValueError as e:
+                errors.append(f"{env}={raw} could not be parsed, {e}")
+                continue
+            if check is not None and not check(value):
+                errors.append(f"{env}={raw} must be {check.__name__.strip('_').replace('_', ' ')}")
+                continue
+            values[setting.name] = value
+        if errors:
+            raise SettingsError("Invalid settings: " + '; '.join(errors))
+        return cls(**values)
+
+    def with_overrides(self, **changes) -> Settings:
+        return replace(self, **changes)
+
+
+# variables set before the .env file was loaded, a reload never overrides them with .env values
+_process_environ_keys = frozenset(os.environ)
+_settings: Settings | None = None
+
+
+def _load_dotenv(reload: bool = False):
+    if not reload:
+        load_dotenv()
+        return
+    for key, value in dotenv_values().items():
+        if key not in _process_environ_keys and value is not None:
+            os.environ[key] = value
+
+
+def get_settings() -> Settings:
+    """
+    :return: the settings of this process, parsed from the environment and .env file on first use
+    """
+    global _settings
+    if _settings is None:
+        _load_dotenv()
+        _settings = Settings.from_env()
+    return _settings
+
+
+def reload_settings() -> Settings:
+    """
+    Parses the environment and .env file again. Invalid settings raise and the previous settings stay in use.
+    """
+    global _settings
+    _load_dotenv(reload=True)
+    _settings = Settings.from_env()
+    return _settings
+
+
+def install_reload_handler(sig: int | None = None):
+    """
+    Reloads the settings whenever the process receives sig, SIGHUP by default (POSIX only). Settings read per call or
+    per loop iteration pick up the change, settings of long lived clients such as the alert rate limits need a restart.
+    """
+    def reload(signum, frame):
+        try:
+            reload_settings()
+            LOGGER.info("Reloaded settings")
+        except SettingsError as e:
+            LOGGER.error(f"Keeping the previous settings, {e}")
+
+    signal.signal(signal.SIGHUP if sig is None else sig, reload)
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import time
+from typing import Dict
+
+from shitcoins.metrics.registry import get_metrics
+from shitcoins.metrics.tracing import span
+from shitcoins.settings import Settings, get_settings
+
+LOGGER = logging.getLogger(__name__)
+
+# Alchemy compute unit cost of each Solana RPC method
+COMPUTE_UNITS_PER_METHOD: Dict[str, int] = {
+    'getTransaction': 59,
+    'getSignaturesForAddress': 40,
+    'getAccountInfo': 10,
+    'getMultipleAccounts': 10,
+    'getTokenLargestAccounts': 10,
+    'getTokenSupply': 10,
+}
+DEFAULT_COMPUTE_UNITS = 10
+
+
+class ComputeUnitBudget:
+    """
+    Token bucket over compute units per second kept in shared memory, so the main process and the worker processes
+    forked after it was created spend from one budget. Units are reserved up front: a caller is told how long to wait
+    for the units it already took, which serves callers of all processes in the order they asked.
+    """
+
+    def __init__(self, compute_units_per_second: float = 330):
+        # available compute units, the time.monotonic() they were last refilled at (the clock is system wide) and the
+        # compute units per second, also shared so a changed SOLANA_CU_PER_SEC applies to every process
+        self._state = multiprocessing.Array('d', [compute_units_per_second, time.monotonic(), compute_units_per_second])
+
+    @property
+    def compute_units_per_second(self) -> float:
+        return self._state[2]
+
+    @compute_units_per_second.setter
+    def compute_units_per_second(self, compute_units_per_second: float):
+        with self._state.get_lock():
+            self._state[2] = compute_units_per_second
+
+    def reserve(self, cost: int) -> float:
+        """
+        Spends cost compute units, going into debt if they are not available yet
+        :return: seconds to wait before the request they were spent on may be sent
+        """
+        with self._state.get_lock():
+            # allow at most one second worth of burst
+            rate = capacity = self._state[2]
+            # a request larger than the bucket (i.e. a big batch) waits for a full bucket and goes into debt
+            required = min(cost, capacity)
+            now = time.monotonic()
+            available = min(capacity, self._state[0] + (now - self._state[1]) * rate)
+            wait_sec = max(0.0, (required - available) / rate)
+            self._state[0] = available - cost
+            self._state[1] = now
+        return wait_sec
+
+
+_budget: ComputeUnitBudget | None = None
+
+
+def get_compute_unit_budget(settings: Settings | None = None) -> ComputeUnitBudget:
+    """
+    :param settings: settings to take SOLANA_CU_PER_SEC from, i.e. the ones a worker was sent, defaults to this
+    process's
+    :return: the SOLANA_CU_PER_SEC budget of the whole process tree. Worker processes inherit it when it was created
+    before they were forked, which the holder classification pool makes sure of.
+    """
+    global _budget
+    compute_units_per_second = (settings or get_settings()).solana_cu_per_sec
+    if _budget is None:
+        _budget = ComputeUnitBudget(compute_units_per_second)
+    elif _budget.compute_units_per_second != compute_units_per_second:
+        _budget.compute_units_per_second = compute_units_per_second
+    return _budget
+
+
+def compute_units_of(method: str, count: int = 1) -> int:
+    return COMPUTE_UNITS_PER_METHOD.get(method, DEFAULT_COMPUTE_UNITS) * count
+
+
+class ComputeUnitRateLimiter:
+    """
+    Waits for compute units of a budget before RPC calls. Waiting happens with asyncio.sleep, so only the coroutines
+    making RPC calls are held back while the rest of the event loop keeps running. Waiters are served in arrival order.
+    """
+
+    def __init__(self, compute_units_per_second: float = 330, method_costs: Dict[str, int] | None = None,
+                 budget: ComputeUnitBudget | None = None):
+        """
+        :param budget: budget shared with other processes, by default one of compute_units_per_second for this
+        limiter alone
+        """
+        self._budget = budget or ComputeUnitBudget(compute_units_per_second)
+        self._method_costs = method_costs or COMPUTE_UNITS_PER_METHOD
+        self._lock: asyncio.Lock | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self.total_wait_sec = 0.0
+
+    def cost_of(self, method: str, count: int = 1) -> int:
+        return self._method_costs.get(method, DEFAULT_COMPUTE_UNITS) * count
+
+    def _get_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        return self._lock
+
+    async def acquire(self, method: str, count: int = 1) -> float:
+        """
+        Waits until the compute units for count calls of method are available and spends them
+        :return: seconds spent waiting
+        """
+        return await self.acquire_compute_units(self.cost_of(method, count), f"{method} x{count}")
+
+    async def acquire_compute_units(self, cost: int, description: str = '') -> float:
+        """
+        Waits until cost compute units are available and spends them
+        :return: seconds spent waiting
+        """
+        with span('solana_rpc limiter wait', 'limiter', compute_units=cost):
+            async with self._get_lock():
+                wait_sec = self._budget.reserve(cost)
+                if wait_sec:
+                    await asyncio.sleep(wait_sec)
+
+        get_metrics().inc('shitcoins_rate_limiter_compute_units_total', {'limiter': 'solana_rpc'}, cost)
+        if wait_sec:
+            get_metrics().inc('shitcoins_rate_limiter_wait_seconds_total', {'limiter': 'solana_rpc'}, wait_sec)
+            self.total_wait_sec += wait_sec
+            LOGGER.debug(f"Waited {wait_sec:.3f}s for {cost} compute units ({description})")
+        return wait_sec
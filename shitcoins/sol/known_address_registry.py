@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import logging
+import os
+from functools import lru_cache
+from typing import Dict, List
+
+from solders.pubkey import Pubkey
+
+from shitcoins.model.holder import Holder
+from shitcoins.settings import get_settings
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_KNOWN_ADDRESSES_FILE = os.path.join(os.path.dirname(__file__), 'data', 'known_addresses.txt')
+PROGRAM_DERIVED_LABEL = 'PROGRAM_DERIVED'
+EXCLUDED_STATUS = 'EXCLUDED'
+
+
+def is_program_derived_address(address: str) -> bool:
+    """
+    Program derived addresses (bonding curves, pool vault authorities, escrow accounts) sit off the ed25519 curve,
+    so they can only be owned and signed for by a program and never represent a person's wallet.
+    """
+    try:
+        return not Pubkey.from_string(address).is_on_curve()
+    except ValueError:
+        return False
+
+
+class KnownAddressRegistry:
+
+    def __init__(self, address_to_label: Dict[str, str]):
+        self._address_to_label = address_to_label
+
+    @classmethod
+    def from_file(cls, file_path: str) -> KnownAddressRegistry:
+        """
+        Loads a registry from a whitespace separated '<address> <label>' file, ignoring blank and # lines
+        :param file_path: path of the known addresses data file
+        """
+        address_to_label: Dict[str, str] = {}
+        with open(file_path, 'r') as file:
+            for line in file:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                parts = line.split()
+                address_to_label[parts[0]] = parts[1] if len(parts) > 1 else 'KNOWN'
+        LOGGER.info(f"Loaded {len(address_to_label)} known addresses from {file_path}")
+        return cls(address_to_label)
+
+    def __len__(self):
+        return len(self._address_to_label)
+
+    def __contains__(self, address: str) -> bool:
+        return address in self._address_to_label
+
+    def label_for(self, address: str) -> str | None:
+        """
+        Returns why an address should not be classified, or None if it looks like a regular wallet
+        :param address: holder (token account owner) address
+        """
+        label = self._address_to_label.get(address)
+        if label is not None:
+            return label
+        if is_program_derived_address(address):
+            return PROGRAM_DERIVED_LABEL
+        return None
+
+    def tag_holders(self, holders: List[Holder]) -> int:
+        """
+        Marks known infrastructure holders as EXCLUDED so they are skipped before any api call is made
+        :return: number of holders excluded
+        """
+        excluded_count = 0
+        for holder in holders:
+            label = self.label_for(holder['address'])
+            if label is not None:
+                holder['status'] = EXCLUDED_STATUS
+                holder['label'] = label
+                excluded_count += 1
+        return excluded_count
+
+
+@lru_cache(maxsize=None)
+def get_known_address_registry() -> KnownAddressRegistry:
+    return KnownAddressRegistry.from_file(get_settings().known_addresses_file or DEFAULT_KNOWN_ADDRESSES_FILE)
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from typing import Callable, List, Set, Tuple, Type, get_args
+
+import httpx
+from solana.exceptions import SolanaRpcException
+from solana.rpc.async_api import AsyncClient
+from solana.rpc.core import RPCException
+from solana.rpc.providers.async_http import AsyncHTTPProvider
+from solders.rpc.requests import Body
+from solders.rpc.responses import RPCError
+
+from shitcoins.metrics.registry import get_metrics
+from shitcoins.metrics.tracing import current_trace_id, record_span
+from shitcoins.sol.compute_unit_rate_limiter import ComputeUnitRateLimiter
+
+LOGGER = logging.getLogger(__name__)
+
+# provider methods the batcher relies on, private api of the solana version pinned in pyproject.toml
+_PROVIDER_METHODS = ('make_request', 'make_batch_request_unparsed')
+
+# method, request body, response parser, future the caller is waiting on, trace of the caller
+_PendingRequest = Tuple[str, Body, Type, asyncio.Future, str | None]
+
+
+def rpc_provider(client: AsyncClient) -> AsyncHTTPProvider:
+    """
+    The only access to the client's private http provider, solana-py has no public api to send a prepared request
+    body or a batch of them. Checked here so a solana upgrade that changes it fails loudly instead of silently.
+    :raises TypeError: if the client's provider is not the one the batcher was written against
+    """
+    provider = getattr(client, '_provider', None)
+    if not isinstance(provider, AsyncHTTPProvider) or \
+            not all(callable(getattr(provider, method, None)) for method in _PROVIDER_METHODS):
+        raise TypeError(f"Unsupported solana AsyncClient provider {type(provider).__name__}, "
+                        f"expected an AsyncHTTPProvider with {', '.join(_PROVIDER_METHODS)}")
+    return provider
+
+
+def _parse_response(raw: str, parser: Type):
+    parsed = parser.from_json(raw)
+    if isinstance(parsed, get_args(RPCError)):
+        raise RPCException(parsed)
+    return parsed
+
+
+class RpcBatcher:
+    """
+    Collects RPC requests issued close together (within max_delay_sec, up to max_batch_size) and sends them as a
+    single JSON-RPC batch request, so a burst of getTransaction calls costs one HTTP round trip.
+    """
+
+    def __init__(self, client: AsyncClient, limiter: ComputeUnitRateLimiter, max_batch_size: int = 20,
+                 max_delay_sec: float = 0.01):
+        self._provider = rpc_provider(client)
+        self._limiter = limiter
+        self._max_batch_size = max_batch_size
+        self._max_delay_sec = max_delay_sec
+        self._pending: List[_PendingRequest] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._send_tasks: Set[asyncio.Task] = set()
+        self._request_id = 0
+
+    async def request(self, method: str, body_factory: Callable[[int], Body], parser: Type):
+        """
+        :method: RPC method name, used to account compute units
+        :body_factory: builds the request body from the request id used to match the batched response
+        :parser: solders response type to parse the result with
+        """
+        loop = asyncio.get_running_loop()
+        self._request_id += 1
+        future = loop.create_future()
+        self._pending.append((method, body_factory(self._request_id), parser, future, current_trace_id()))
+
+        if len(self._pending) >= self._max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self._max_delay_sec, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        while self._pending:
+            batch = self._pending[:self._max_batch_size]
+            self._pending = self._pending[self._max_batch_size:]
+            task = asyncio.ensure_future(self._send(batch))
+            self._send_tasks.add(task)
+            task.add_done_callback(self._send_tasks.discard)
+
+    async def _send(self, batch: List[_PendingRequest]):
+        start_time = None
+        try:
+            compute_units = sum(self._limiter.cost_of(method) for method, _, _, _, _ in batch)
+            await self._limiter.acquire_compute_units(compute_units, f"batch of {len(batch)}")
+            start_time = time.monotonic()
+
+            if len(batch) == 1:
+                _, body, parser, future, _ = batch[0]
+                response = await self._provider.make_request(body, parser)
+                get_metrics().record_request('solana_rpc', 200, time.monotonic() - start_time)
+                self._record_spans(batch, start_time)
+                if not future.done():
+                    future.set_result(response)
+                return
+
+            LOGGER.debug(f"Sending batch of {len(batch)} RPC requests")
+            provider = self._provider
+            try:
+                raw = await provider.make_batch_request_unparsed(tuple(body for _, body, _, _, _ in batch))
+            except httpx.HTTPError as e:
+                # same exception the client raises for single requests, named after the first request's method
+                raise SolanaRpcException(e, provider.make_batch_request_unparsed, provider, batch[0][1]) from e
+
+            get_metrics().record_request('solana_rpc', 200, time.monotonic() - start_time, count=len(batch))
+            get_metrics().observe('shitcoins_rpc_batch_size', len(batch))
+            self._record_spans(batch, start_time)
+            # responses in a batch may come back in any order
+            id_to_response = {response['id']: response for response in json.loads(raw)}
+            for _, body, parser, future, _ in batch:
+                if future.done():
+                    continue
+                try:
+                    future.set_result(_parse_response(json.dumps(id_to_response[body.id]), parser))
+                except (RPCException, KeyError) as e:
+                    future.set_exception(e)
+        except Exception as e:
+            get_metrics().record_request('solana_rpc', 'error', time.monotonic() - start_time if start_time else None,
+                                         count=len(batch))
+            for _, _, _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    @staticmethod
+    def _record_spans(batch: List[_PendingRequest], start_time: float):
+        """
+        Records the round trip once for every trace with a request in the batch, so each coin's trace shows it
+        """
+        duration_sec = time.monotonic() - start_time
+        methods = sorted({method for method, _, _, _, _ in batch})
+        for trace_id in {trace_id for _, _, _, _, trace_id in batch}:
+            record_span(f"solana_rpc {','.join(methods)}", time.time() - duration_sec, duration_sec, 'api',
+                        trace_id=trace_id, batch_size=len(batch))
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Callable, Type
+
+import httpx
+from solana.rpc.async_api import AsyncClient, Pubkey, Signature
+from solana.rpc.providers.core import DEFAULT_TIMEOUT
+from solders.commitment_config import CommitmentLevel
+from solders.rpc.config import RpcSignaturesForAddressConfig, RpcTransactionConfig
+from solders.rpc.requests import Body, GetSignaturesForAddress, GetTransaction
+from solders.rpc.responses import GetSignaturesForAddressResp, GetTransactionResp
+from solders.transaction_status import UiTransactionEncoding
+
+from shitcoins.replay.cassette import get_cassette
+from shitcoins.replay.transports import CassetteRpcTransport
+from shitcoins.settings import get_settings
+from shitcoins.sol.compute_unit_rate_limiter import ComputeUnitRateLimiter, get_compute_unit_budget
+from shitcoins.sol.rpc_batcher import RpcBatcher, rpc_provider
+
+LOGGER = logging.getLogger(__name__)
+
+
+class SolanaRpcSession:
+    """
+    Holds a single AsyncClient for the whole process so every mint and request shares one pooled connection
+    instead of opening (and TLS handshaking) a new client per call. Every call goes through the compute unit
+    rate limiter so the whole process stays within the RPC provider's budget, and calls made close together are
+    merged into JSON-RPC batch requests when max_batch_size is above 1.
+    """
+
+    def __init__(self, endpoint: str | None, limiter: ComputeUnitRateLimiter, max_batch_size: int = 1,
+                 batch_window_sec: float = 0.01):
+        self._endpoint = endpoint
+        self._client: AsyncClient | None = None
+        self._batcher: RpcBatcher | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._max_batch_size = max_batch_size
+        self._batch_window_sec = batch_window_sec
+        self.limiter = limiter
+
+    @property
+    def client(self) -> AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            # the underlying http session is bound to the event loop it was created in
+            LOGGER.debug(f"Opening Solana RPC session to {self._endpoint}")
+            self._client = AsyncClient(self._endpoint)
+            cassette = get_cassette()
+            if cassette is not None:
+                rpc_provider(self._client).session = httpx.AsyncClient(timeout=DEFAULT_TIMEOUT,
+                                                                       transport=CassetteRpcTransport(cassette))
+            self._batcher = RpcBatcher(self._client, self.limiter, self._max_batch_size, self._batch_window_sec)
+            self._loop = loop
+        return self._client
+
+    async def _request(self, method: str, body_factory: Callable[[int], Body], parser: Type):
+        client = self.client
+        if self._max_batch_size > 1:
+            return await self._batcher.request(method, body_factory, parser)
+        await self.limiter.acquire(method)
+        return await rpc_provider(client).make_request(body_factory(0), parser)
+
+    async def get_signatures_for_address(self, account: Pubkey, before: Signature | None = None,
+                                         commitment: CommitmentLevel = CommitmentLevel.Finalized
+                                         ) -> GetSignaturesForAddressResp:
+        config = RpcSignaturesForAddressConfig(before=before, commitment=commitment)
+        return await self._request('getSignaturesForAddress',
+                                   lambda request_id: GetSignaturesForAddress(account, config, request_id),
+                                   GetSignaturesForAddressResp)
+
+    async def get_transaction(self, tx_sig: Signature) -> GetTransactionResp:
+        config = RpcTransactionConfig(encoding=UiTransactionEncoding.Json, commitment=CommitmentLevel.Finalized,
+                                      max_supported_transaction_version=0)
+        return await self._request('getTransaction',
+                                   lambda request_id: GetTransaction(tx_sig, config, request_id),
+                                   GetTransactionResp)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+            self._batcher = None
+            self._loop = None
+
+
+_rpc_session: SolanaRpcSession | None = None
+
+
+def get_rpc_session() -> SolanaRpcSession:
+    global _rpc_session
+    if _rpc_session is None:
+        settings = get_settings()
+        # Alchemy rate limits at 330 Compute Units per Second on the free tier
+        # the budget is shared with the worker processes asking the rpc holder provider
+        limiter = ComputeUnitRateLimiter(budget=get_compute_unit_budget())
+        _rpc_session = SolanaRpcSession(settings.solana_api_key, limiter,
+                                        max_batch_size=settings.solana_rpc_batch_size,
+                                        batch_window_sec=settings.solana_rpc_batch_window_ms / 1000)
+    return _rpc_session
+
+
+def reset_rpc_session():
+    """
+    Forgets the process wide session, so the next get_rpc_session call reads its configuration again
+    """
+    global _rpc_session
+    _rpc_session = None
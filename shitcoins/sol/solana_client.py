@@ -2,76 +2,146 @@ from __future__ import annotations
 
 import asyncio
 import logging
-import os
 from datetime import datetime
 from typing import List
 
-from dotenv import load_dotenv
 import time
 
 import solana.exceptions
+from shitcoins.metrics.tracing import span
 from shitcoins.model.first_buy_statistics import FirstBuyStatistics
+from shitcoins.settings import get_settings
+from shitcoins.sol.rpc_session import get_rpc_session
+from shitcoins.sol.transaction_cache import TransactionCache, get_transaction_cache
 from shitcoins.util.time_util import datetime_from_utc_to_local
 from solana.rpc.async_api import AsyncClient, Signature, Pubkey
-from solana.rpc.commitment import Finalized
 from solders.rpc.responses import RpcConfirmedTransactionStatusWithSignature
 
 LOGGER = logging.getLogger(__name__)
-load_dotenv()
 
 
-async def get_first_transaction_sigs(mint_address: str, from_signature=None) -> (
-        list[RpcConfirmedTransactionStatusWithSignature], int | None):
+def _block_time_to_local(block_time: int | None) -> datetime | None:
+    if block_time is None:
+        return None
+    return datetime_from_utc_to_local(datetime.utcfromtimestamp(block_time))
+
+
+def _save_mint_cursor(transaction_cache: TransactionCache | None, mint_address: str,
+                      before_signature: Signature | None, complete: bool):
+    if transaction_cache is not None:
+        transaction_cache.put_mint_cursor(mint_address, before_signature, complete)
+
+
+async def _search_first_transaction_sigs(mint_address: str, from_signature=None, deadline: float | None = None) -> (
+        list[RpcConfirmedTransactionStatusWithSignature], int | None, bool):
     """
+    Walks the mint's signature history backwards, one get_signatures_for_address call per 1,000 signatures,
+    until the page holding the earliest transaction is found.
     :mint_address: the newly minted coin address
-    :from_signature: if known, a signature to begin checking from, otherwise default None and start from latest transaction
+    :from_signature: if known, a signature to begin checking from, otherwise default None and start from latest
+    transaction
+    :deadline: optional time.monotonic() value at which to give up searching
+    :return: last page of signatures, its earliest block time and whether it is the mint's first page
     :throws: SolanaRpcException
     """
-    async with AsyncClient(os.getenv("SOLANA_API_KEY")) as client:
-        mint_pubkey = Pubkey.from_string(mint_address)
-
-        # do we need to determine if there is no mint authority to slim it down further?
-        # account_info = (await client.get_account_info(pubkey=mint_pubkey)).value
-
-        start_time = time.time()
-        earliest_signature = from_signature
-        counter = 0
-        skip_threshold = int(os.getenv("SOLANA_SKIP_THRESHOLD"))
-        while counter < skip_threshold:
-            try:
-                signatures = (await client.get_signatures_for_address(account=mint_pubkey,
-                                                                      before=earliest_signature,
-                                                                      commitment=Finalized)).value
-                earliest_signature = signatures[-1].signature
-                earliest_transaction = (await client.get_transaction(tx_sig=earliest_signature,
-                                                                     max_supported_transaction_version=0)).value
-
-                earliest_ltime = datetime_from_utc_to_local(datetime.utcfromtimestamp(earliest_transaction.block_time))
-                counter += 1
-                if counter % 50:
-                    LOGGER.debug(f" Searching earliest transaction for {mint_address} :: "
-                                 f"Currently at {earliest_ltime}")
-
-                if len(signatures) < 1000:
-                    # found the earliest transaction
-                    LOGGER.info(f" Found earliest transaction execution "
-                                f":: {earliest_ltime} "
-                                f":: Coin {mint_address} ")
-                    LOGGER.debug(f"First transaction found in {round(time.time() - start_time, 2)} seconds")
-                    return signatures, earliest_transaction.block_time
-            except solana.exceptions.SolanaRpcException as e:
-                LOGGER.error(e)
-                raise
+    rpc_session = get_rpc_session()
+    transaction_cache = get_transaction_cache()
+    mint_pubkey = Pubkey.from_string(mint_address)
+
+    if from_signature is None and transaction_cache is not None:
+        # resume from where the last search of this mint got to, or straight at its first page
+        mint_cursor = transaction_cache.get_mint_cursor(mint_address)
+        if mint_cursor is not None:
+            from_signature, complete = mint_cursor
+            LOGGER.debug(f"Resuming earliest transaction search for {mint_address} "
+                         f"({'first page' if complete else 'checkpoint'} {from_signature})")
+
+    # do we need to determine if there is no mint authority to slim it down further?
+    # account_info = (await client.get_account_info(pubkey=mint_pubkey)).value
+
+    start_time = time.time()
+    earliest_signature = from_signature
+    page_before_signature = from_signature
+    signatures = []
+    earliest_block_time = None
+    counter = 0
+    skip_threshold = get_settings().solana_skip_threshold
+    while counter < skip_threshold:
+        if deadline is not None and time.monotonic() >= deadline:
+            LOGGER.warning(f" Ran out of time searching earliest transaction for {mint_address} :: "
+                           f"stopped at {_block_time_to_local(earliest_block_time)}")
+            _save_mint_cursor(transaction_cache, mint_address, earliest_signature, False)
+            return signatures, earliest_block_time, False
+
+        try:
+            page = (await rpc_session.get_signatures_for_address(account=mint_pubkey,
+                                                                 before=earliest_signature)).value
+        except solana.exceptions.SolanaRpcException as e:
+            LOGGER.error(e)
+            raise
+
+        if not page:
+            if not signatures and earliest_signature is not None:
+                # the search began at the earliest transaction itself, a checkpoint that happened to be the last
+                # signature of the first page, that page is not known so the search starts over from the latest
+                LOGGER.debug(f"Nothing before {earliest_signature} for {mint_address}, searching from the latest")
+                earliest_signature = page_before_signature = None
+                continue
+            # the previous page ended exactly on the earliest transaction
+            break
+
+        # signature statuses already carry the block time, no need to fetch the transaction itself
+        page_before_signature = earliest_signature
+        signatures = page
+        earliest_signature = signatures[-1].signature
+        earliest_block_time = signatures[-1].block_time
+        counter += 1
+        if counter % 50 == 0:
+            LOGGER.debug(f" Searching earliest transaction for {mint_address} :: "
+                         f"Currently at {_block_time_to_local(earliest_block_time)}")
+
+        if len(signatures) < 1000:
+            break
+    else:
         LOGGER.warning(f" UNABLE to determine earliest transaction within the last "
                        f"{(skip_threshold * 1000):,} transactions :: "
-                       f"return {earliest_ltime}")
-        return signatures, earliest_transaction.block_time
+                       f"return {_block_time_to_local(earliest_block_time)}")
+        _save_mint_cursor(transaction_cache, mint_address, earliest_signature, False)
+        return signatures, earliest_block_time, False
+
+    # found the earliest transaction
+    LOGGER.info(f" Found earliest transaction execution "
+                f":: {_block_time_to_local(earliest_block_time)} "
+                f":: Coin {mint_address} ")
+    LOGGER.debug(f"First transaction found in {round(time.time() - start_time, 2)} seconds")
+    _save_mint_cursor(transaction_cache, mint_address, page_before_signature, True)
+    return signatures, earliest_block_time, True
 
 
-async def get_transaction(client: AsyncClient, earliest_signature: Signature):
+async def get_first_transaction_sigs(mint_address: str, from_signature=None) -> (
+        list[RpcConfirmedTransactionStatusWithSignature], int | None):
+    """
+    :mint_address: the newly minted coin address
+    :from_signature: if known, a signature to begin checking from, otherwise default None and start from latest
+    transaction
+    :throws: SolanaRpcException
+    """
+    signatures, earliest_block_time, _ = await _search_first_transaction_sigs(mint_address, from_signature)
+    return signatures, earliest_block_time
+
+
+async def get_transaction(earliest_signature: Signature):
+    transaction_cache = get_transaction_cache()
+    if transaction_cache is not None:
+        cached_transaction = transaction_cache.get_transaction(earliest_signature)
+        if cached_transaction is not None:
+            return cached_transaction
+
     try:
-        earliest_transaction = (await client.get_transaction(tx_sig=earliest_signature,
-                                                             max_supported_transaction_version=0)).value
+        earliest_transaction = (await get_rpc_session().get_transaction(earliest_signature)).value
+        if earliest_transaction is not None and transaction_cache is not None:
+            # only finalized transactions are requested, so they can be cached forever
+            transaction_cache.put_transaction(earliest_signature, earliest_transaction)
         return earliest_transaction
     except solana.exceptions.SolanaRpcException as e:
         LOGGER.error(e)
@@ -79,12 +149,13 @@ async def get_transaction(client: AsyncClient, earliest_signature: Signature):
 
 
 async def get_transaction_stats(
-        earliest_signatures: List[RpcConfirmedTransactionStatusWithSignature]) -> FirstBuyStatistics:
+        earliest_signatures: List[RpcConfirmedTransactionStatusWithSignature],
+        deadline: float | None = None) -> FirstBuyStatistics:
     """
-    :earliest_signatures:
+    :earliest_signatures: the mint's earliest page of signatures, ordered newest to oldest
+    :deadline: optional time.monotonic() value, transactions not fetched by then are left out of PARTIAL stats
     """
     LOGGER.info(f"Checking bundling against {len(earliest_signatures)} transactions")
-    transactions_ui = []
     first_block_time = earliest_signatures[-1].block_time
     earliest_signatures.pop()  # remove first dev purchase
 
@@ -96,36 +167,63 @@ async def get_transaction_stats(
         else:
             break
 
-    async with AsyncClient(os.getenv("SOLANA_API_KEY")) as client:
-        # Alchemy rate limits at 330 Compute Units per Second
-        # (for free tier; growth tier allows us to double this function's speed)
-        signatures_chunked = [earliest_signatures_same_block_time[x:x + 5] for x
-                              in range(0, len(earliest_signatures_same_block_time), 5)]
-        # Each get_signature_block_time costs 59 Compute Units, thus chunk
-        for signatures in signatures_chunked:
-            results = [get_transaction(client, signature.signature) for signature in signatures]
-            transactions_ui.extend(await asyncio.gather(*results))
-            time.sleep(0.2)
-
-        # calculate total purchase pct and total buy count
-        total_purchase_amt = 0
-        total_buy_count = 0
-        for transaction_ui in transactions_ui:
-            meta = transaction_ui.transaction.meta
-            account_index = meta.pre_token_balances[0].account_index
-            pre_balance = meta.pre_token_balances[0].ui_token_amount.ui_amount
-            for post_token_balance in meta.post_token_balances:
-                if post_token_balance.account_index == account_index:
-                    post_balance = post_token_balance.ui_token_amount.ui_amount
-                    purchase_amt = pre_balance - post_balance
-                    total_purchase_amt += purchase_amt
-                    break
-            total_buy_count += len(transaction_ui.transaction.transaction.signatures)
-        total_purchase_pct = round((total_purchase_amt * 100) / 1000000000, 2)
+    # the session's compute unit rate limiter paces these calls, so they can all be issued at once
+    tasks = [asyncio.ensure_future(get_transaction(signature.signature))
+             for signature in earliest_signatures_same_block_time]
+    status = 'COMPLETE'
+    if tasks:
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        if pending:
+            LOGGER.warning(f"Ran out of time fetching first buys, using {len(done)} of {len(tasks)} transactions")
+            status = 'PARTIAL'
+            for task in pending:
+                task.cancel()
+        # keep the original ordering and surface errors the same way asyncio.gather would
+        transactions_ui = [task.result() for task in tasks if task in done]
+    else:
+        transactions_ui = []
+
+    # calculate total purchase pct and total buy count
+    total_purchase_amt = 0
+    total_buy_count = 0
+    for transaction_ui in transactions_ui:
+        meta = transaction_ui.transaction.meta
+        account_index = meta.pre_token_balances[0].account_index
+        pre_balance = meta.pre_token_balances[0].ui_token_amount.ui_amount
+        for post_token_balance in meta.post_token_balances:
+            if post_token_balance.account_index == account_index:
+                post_balance = post_token_balance.ui_token_amount.ui_amount
+                purchase_amt = pre_balance - post_balance
+                total_purchase_amt += purchase_amt
+                break
+        total_buy_count += len(transaction_ui.transaction.transaction.signatures)
+    total_purchase_pct = round((total_purchase_amt * 100) / 1000000000, 2)
 
     return FirstBuyStatistics(duplicate_wallet_count=len(earliest_signatures_same_block_time),
                               duplicate_count=total_buy_count,
-                              duplicate_pct=total_purchase_pct)
+                              duplicate_pct=total_purchase_pct,
+                              status=status)
+
+
+async def analyse_first_buys(mint_address: str, time_budget_sec: float) -> FirstBuyStatistics:
+    """
+    Finds the mint's first page of signatures and calculates its first buy (bundle) statistics within a time
+    budget. Never raises, instead returns PARTIAL stats when only some first block transactions could be fetched
+    in time and UNKNOWN stats when the first block could not be found at all.
+    :mint_address: the newly minted coin address
+    :time_budget_sec: seconds allowed for the whole analysis of this coin
+    """
+    deadline = time.monotonic() + time_budget_sec
+    try:
+        with span('get_first_transaction_sigs', mint_address=mint_address):
+            signatures, _, found = await _search_first_transaction_sigs(mint_address, deadline=deadline)
+        if found and signatures:
+            with span('get_transaction_stats', signatures=len(signatures)):
+                return await get_transaction_stats(signatures, deadline)
+    except Exception as e:
+        LOGGER.error(f"ERROR trying to determine if coin {mint_address} is bundled with sol API: {e}")
+    return FirstBuyStatistics(duplicate_wallet_count=0, duplicate_count=0, duplicate_pct=0, status='UNKNOWN')
 
 
 async def is_mint_authority_revoked(mint_address: str) -> bool:
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import logging
+import sqlite3
+import zlib
+from typing import Tuple
+
+from solders.signature import Signature
+from solders.transaction_status import EncodedConfirmedTransactionWithStatusMeta
+
+from shitcoins.metrics.registry import get_metrics
+from shitcoins.settings import get_settings
+
+LOGGER = logging.getLogger(__name__)
+
+
+class TransactionCache:
+    """
+    SQLite backed cache of finalized transactions keyed by signature and of per-mint signature search cursors.
+    Finalized transactions never change, so once fetched they never need to come from the RPC again.
+    """
+
+    def __init__(self, db_path: str):
+        self._conn = sqlite3.connect(db_path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA mmap_size=268435456")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS transactions ("
+                           "signature TEXT PRIMARY KEY, data BLOB NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS mint_cursors ("
+                           "mint_address TEXT PRIMARY KEY, before_signature TEXT, complete INTEGER NOT NULL)")
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get_transaction(self, signature: Signature) -> EncodedConfirmedTransactionWithStatusMeta | None:
+        row = self._conn.execute("SELECT data FROM transactions WHERE signature = ?", (str(signature),)).fetchone()
+        if row is None:
+            self.misses += 1
+            get_metrics().inc('shitcoins_cache_requests_total', {'cache': 'solana_transactions', 'result': 'miss'})
+            return None
+        self.hits += 1
+        get_metrics().inc('shitcoins_cache_requests_total', {'cache': 'solana_transactions', 'result': 'hit'})
+        return EncodedConfirmedTransactionWithStatusMeta.from_json(zlib.decompress(row[0]).decode())
+
+    def put_transaction(self, signature: Signature, transaction: EncodedConfirmedTransactionWithStatusMeta):
+        self._conn.execute("INSERT OR IGNORE INTO transactions VALUES (?, ?)",
+                           (str(signature), zlib.compress(transaction.to_json().encode())))
+        self._conn.commit()
+
+    def get_mint_cursor(self, mint_address: str) -> Tuple[Signature | None, bool] | None:
+        """
+        :return: None if the mint was never searched, otherwise the signature to resume searching before and
+        whether that search already reached the mint's first page of signatures
+        """
+        row = self._conn.execute("SELECT before_signature, complete FROM mint_cursors WHERE mint_address = ?",
+                                 (mint_address,)).fetchone()
+        if row is None:
+            return None
+        before_signature = Signature.from_string(row[0]) if row[0] is not None else None
+        return before_signature, bool(row[1])
+
+    def put_mint_cursor(self, mint_address: str, before_signature: Signature | None, complete: bool):
+        """
+        :param before_signature: when complete, the signature the mint's first page is fetched before, otherwise the
+        earliest signature reached so far
+        """
+        self._conn.execute("INSERT OR REPLACE INTO mint_cursors VALUES (?, ?, ?)",
+                           (mint_address, str(before_signature) if before_signature is not None else None,
+                            int(complete)))
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+_transaction_cache: TransactionCache | None = None
+
+
+def get_transaction_cache() -> TransactionCache | None:
+    """
+    :return: the process wide cache, or None if disabled by setting SOLANA_CACHE_PATH to an empty value
+    """
+    global _transaction_cache
+    if _transaction_cache is None:
+        db_path = get_settings().solana_cache_path
+        if not db_path:
+            return None
+        LOGGER.info(f"Using Solana transaction cache {db_path}")
+        _transaction_cache = TransactionCache(db_path)
+    return _transaction_cache
@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+import sqlite3
+
+
+class ChannelCursorStore:
+    """
+    Persists the id of the last processed message per Telegram channel, so scraping resumes after it
+    """
+
+    def __init__(self, db_path: str):
+        self._conn = sqlite3.connect(db_path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS channel_cursors ("
+                           "channel TEXT PRIMARY KEY, min_id INTEGER NOT NULL)")
+        self._conn.commit()
+
+    def get_cursor(self, channel: str) -> int | None:
+        """
+        :return: id of the last processed message of the channel, or None if the channel was never read
+        """
+        row = self._conn.execute("SELECT min_id FROM channel_cursors WHERE channel = ?", (channel,)).fetchone()
+        return row[0] if row is not None else None
+
+    def put_cursor(self, channel: str, min_id: int):
+        self._conn.execute("INSERT OR REPLACE INTO channel_cursors VALUES (?, ?)", (channel, min_id))
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
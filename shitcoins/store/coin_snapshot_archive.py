@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import logging
+import os
+import uuid
+from datetime import date, datetime, timezone
+from typing import List
+
+from shitcoins.model.coin_data import CoinData
+from shitcoins.telegram_alert import fresh_holder_stats
+
+LOGGER = logging.getLogger(__name__)
+
+TIMING_COLUMNS = ['holders_sec', 'classification_sec', 'first_buys_wait_sec']
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("The coin snapshot archive needs pyarrow, install it with pip install shitcoins[archive]") \
+            from e
+    return pyarrow
+
+
+class CoinSnapshotArchive:
+    """
+    Append-only archive of per coin snapshots as Parquet files, one file per append, partitioned by day as
+    date=YYYY-MM-DD directories so scans over a date range only read the matching days. Holder statuses are stored as
+    list columns, so a snapshot is one row and thresholds can be backtested without replaying any API.
+    """
+
+    def __init__(self, archive_dir: str):
+        self._pa = _import_pyarrow()
+        self.archive_dir = archive_dir
+        self._last_append_day: date | None = None
+        holder_type = self._pa.struct([('address', self._pa.string()), ('status', self._pa.string()),
+                                       ('transactions_count', self._pa.int64())])
+        self.schema = self._pa.schema([
+            ('snapshot_at', self._pa.timestamp('ms', tz='UTC')),
+            ('coin_address', self._pa.string()),
+            ('token_name', self._pa.string()),
+            ('market_cap', self._pa.float64()),
+            ('liquidity', self._pa.float64()),
+            ('price', self._pa.float64()),
+            ('created_at_utc', self._pa.timestamp('ms')),
+            ('holder_count', self._pa.int32()),
+            ('fresh_count', self._pa.int32()),
+            ('holders', self._pa.list_(holder_type)),
+            ('duplicate_count', self._pa.int32()),
+            ('duplicate_wallet_count', self._pa.int32()),
+            ('duplicate_pct', self._pa.float64()),
+            ('first_buys_status', self._pa.string()),
+        ] + [(column, self._pa.float64()) for column in TIMING_COLUMNS])
+
+    def append(self, coins_data: List[CoinData], snapshot_at: datetime | None = None) -> str | None:
+        """
+        Writes the coins as a new file in the partition of the snapshot's day, once the day rolls over the previous
+        day's files are compacted
+        :return: path of the written file, None if there were no coins
+        """
+        if not coins_data:
+            return None
+        snapshot_at = snapshot_at or datetime.now(timezone.utc)
+        rows = [self._to_row(coin_data, snapshot_at) for coin_data in coins_data]
+        table = self._pa.Table.from_pylist(rows, schema=self.schema)
+
+        partition_dir = os.path.join(self.archive_dir, f"date={snapshot_at.date().isoformat()}")
+        os.makedirs(partition_dir, exist_ok=True)
+        path = os.path.join(partition_dir, f"part-{snapshot_at.strftime('%H%M%S')}-{uuid.uuid4().hex[:8]}.parquet")
+        # write under a temporary name first, so scans never see a partially written file
+        self._pa.parquet.write_table(table, path + '.tmp', compression='zstd')
+        os.replace(path + '.tmp', path)
+
+        if self._last_append_day is not None and self._last_append_day != snapshot_at.date():
+            self.compact(self._last_append_day)
+        self._last_append_day = snapshot_at.date()
+        return path
+
+    def scan(self, start_date: date | None = None, end_date: date | None = None, columns: List[str] | None = None):
+        """
+        :return: pyarrow Table of the snapshots taken from start_date up to and including end_date
+        """
+        dataset = self._pa.dataset.dataset(self.archive_dir, format='parquet',
+                                           schema=self.schema.append(self._pa.field('date', self._pa.string())),
+                                           partitioning=self._partitioning(), exclude_invalid_files=True)
+        field = self._pa.dataset.field('date')
+        date_filter = None
+        if start_date is not None:
+            date_filter = field >= start_date.isoformat()
+        if end_date is not None:
+            end_filter = field <= end_date.isoformat()
+            date_filter = end_filter if date_filter is None else date_filter & end_filter
+        return dataset.to_table(columns=columns, filter=date_filter)
+
+    def compact(self, day: date):
+        """
+        Merges the day's many small files, one per loop iteration, into a single file
+        """
+        partition_dir = os.path.join(self.archive_dir, f"date={day.isoformat()}")
+        if not os.path.isdir(partition_dir):
+            return
+        paths = sorted(os.path.join(partition_dir, name) for name in os.listdir(partition_dir)
+                       if name.endswith('.parquet'))
+        if len(paths) < 2:
+            return
+        table = self._pa.concat_tables(self._pa.parquet.read_table(path, schema=self.schema) for path in paths)
+        compacted_path = os.path.join(partition_dir, f"compacted-{uuid.uuid4().hex[:8]}.parquet")
+        self._pa.parquet.write_table(table, compacted_path + '.tmp', compression='zstd')
+        os.replace(compacted_path + '.tmp', compacted_path)
+        for path in paths:
+            os.remove(path)
+        LOGGER.info(f"Compacted {len(paths)} snapshot files of {day}")
+
+    def _partitioning(self):
+        return self._pa.dataset.partitioning(self._pa.schema([('date', self._pa.string())]), flavor='hive')
+
+    @staticmethod
+    def _to_row(coin_data: CoinData, snapshot_at: datetime) -> dict:
+        market_info = coin_data.get('market_info') or {}
+        first_buy_statistics = coin_data.get('first_buy_statistics') or {}
+        timings = coin_data.get('timings') or {}
+        holders = coin_data.get('holders', [])
+        # same counts the alert was sent with, so backtests on the fresh ratio match what was alerted
+        holder_count, fresh_count, _ = fresh_holder_stats(coin_data)
+        return {
+            'snapshot_at': snapshot_at,
+            'coin_address': coin_data['coin_address'],
+            'token_name': market_info.get('token_name'),
+            'market_cap': market_info.get('market_cap'),
+            'liquidity': market_info.get('liquidity'),
+            'price': market_info.get('price'),
+            'created_at_utc': market_info.get('created_at_utc'),
+            'holder_count': holder_count,
+            'fresh_count': fresh_count,
+            'holders': [{'address': holder['address'], 'status': holder['status'],
+                         'transactions_count': holder.get('transactions_count')} for holder in holders],
+            'duplicate_count': first_buy_statistics.get('duplicate_count'),
+            'duplicate_wallet_count': first_buy_statistics.get('duplicate_wallet_count'),
+            'duplicate_pct': first_buy_statistics.get('duplicate_pct'),
+            'first_buys_status': first_buy_statistics.get('status'),
+            **{column: timings.get(column) for column in TIMING_COLUMNS},
+        }
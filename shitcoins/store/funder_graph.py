@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class FunderEdge:
+    # sender of the wallet's first inbound SOL transfer, None when it could not be found within the pages searched
+    funder: str | None
+    funded_at: float | None = None
+
+
+class FunderGraph:
+    """
+    Memo of which wallet funded which, kept in memory and persisted in SQLite. A wallet's first inbound transfer
+    never changes, so an edge is looked up once and shared by every coin and every later run.
+    """
+
+    def __init__(self, db_path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS funders ("
+                           "wallet TEXT PRIMARY KEY, funder TEXT, funded_at REAL, resolved_at REAL NOT NULL)")
+        self._conn.commit()
+        self._wallet_to_edge: Dict[str, FunderEdge] = {
+            wallet: FunderEdge(funder, funded_at)
+            for wallet, funder, funded_at in self._conn.execute("SELECT wallet, funder, funded_at FROM funders")}
+
+    def __len__(self) -> int:
+        return len(self._wallet_to_edge)
+
+    def get(self, wallet: str) -> FunderEdge | None:
+        """
+        :return: the wallet's edge, None if it was never looked up
+        """
+        return self._wallet_to_edge.get(wallet)
+
+    def put(self, wallet: str, edge: FunderEdge):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO funders VALUES (?, ?, ?, ?)",
+                               (wallet, edge.funder, edge.funded_at, time.time()))
+            self._conn.commit()
+            self._wallet_to_edge[wallet] = edge
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
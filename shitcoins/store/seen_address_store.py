@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Iterable, List
+
+from shitcoins.util.bloom_filter import BloomFilter
+
+LOGGER = logging.getLogger(__name__)
+
+
+class SeenAddressStore:
+    """
+    Set of coin addresses that were already processed, persisted append-only in SQLite so saving costs only the
+    newly seen addresses. Entries older than max_age_sec are aged out on periodic compaction.
+
+    By default all addresses are kept in memory as a set. With bloom_capacity set, only a bloom filter is kept in
+    memory and its positives are confirmed against SQLite, which bounds memory regardless of how many addresses
+    were ever seen.
+    """
+
+    def __init__(self, db_path: str, max_age_sec: float | None = None, bloom_capacity: int = 0,
+                 compact_interval_sec: float = 3600):
+        self._conn = sqlite3.connect(db_path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS seen_addresses ("
+                           "address TEXT PRIMARY KEY, first_seen REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS seen_addresses_first_seen ON seen_addresses (first_seen)")
+        self._conn.commit()
+        self._max_age_sec = max_age_sec
+        self._bloom_capacity = bloom_capacity
+        self._compact_interval_sec = compact_interval_sec
+        self._last_compacted_at = 0.0
+        self._addresses: set[str] | None = None
+        self._bloom_filter: BloomFilter | None = None
+        self.compact()
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM seen_addresses").fetchone()[0]
+
+    def __contains__(self, address: str) -> bool:
+        if self._addresses is not None:
+            return address in self._addresses
+        if address not in self._bloom_filter:
+            return False
+        return self._conn.execute("SELECT 1 FROM seen_addresses WHERE address = ?", (address,)).fetchone() is not None
+
+    def filter_unseen(self, addresses: Iterable[str]) -> List[str]:
+        return [address for address in addresses if address not in self]
+
+    def add(self, addresses: Iterable[str], now: float | None = None):
+        """
+        Persists only the addresses that were not seen yet, compacting first if the compaction interval passed
+        """
+        now = time.time() if now is None else now
+        if now - self._last_compacted_at >= self._compact_interval_sec:
+            self.compact(now)
+
+        new_addresses = [address for address in dict.fromkeys(addresses) if address not in self]
+        if not new_addresses:
+            return
+        self._conn.executemany("INSERT OR IGNORE INTO seen_addresses VALUES (?, ?)",
+                               [(address, now) for address in new_addresses])
+        self._conn.commit()
+        for address in new_addresses:
+            self._remember(address)
+
+    def compact(self, now: float | None = None):
+        """
+        Deletes aged out addresses and rebuilds the in memory set or bloom filter from what is left
+        """
+        now = time.time() if now is None else now
+        if self._max_age_sec is not None:
+            deleted = self._conn.execute("DELETE FROM seen_addresses WHERE first_seen < ?",
+                                         (now - self._max_age_sec,)).rowcount
+            self._conn.commit()
+            if deleted:
+                LOGGER.info(f"Aged out {deleted} seen addresses")
+                self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+        if self._bloom_capacity:
+            self._addresses = None
+            # size for what is stored now plus the configured headroom, a bloom filter cannot grow
+            self._bloom_filter = BloomFilter(len(self) + self._bloom_capacity)
+        else:
+            self._addresses = set()
+        for (address,) in self._conn.execute("SELECT address FROM seen_addresses"):
+            self._remember(address)
+        self._last_compacted_at = now
+
+    def import_json(self, json_path: str):
+        """
+        One-off import of the legacy seen addresses JSON list, which is renamed once imported
+        """
+        if not os.path.exists(json_path):
+            return
+        with open(json_path, 'r') as file:
+            addresses = json.load(file)
+        self.add(addresses)
+        os.replace(json_path, json_path + '.imported')
+        LOGGER.info(f"Imported {len(addresses)} seen addresses from {json_path}")
+
+    def _remember(self, address: str):
+        if self._addresses is not None:
+            self._addresses.add(address)
+        else:
+            self._bloom_filter.add(address)
+            if self._bloom_filter.count > self._bloom_filter.capacity:
+                # filter is over capacity, rebuild it at the next add instead of letting false positives grow
+                self._last_compacted_at = 0.0
+
+    def close(self):
+        self._conn.close()
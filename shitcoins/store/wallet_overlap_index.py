@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import logging
+import sqlite3
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Set
+
+from shitcoins.model.holder_overlap import HolderOverlap
+
+LOGGER = logging.getLogger(__name__)
+
+
+class WalletOverlapIndex:
+    """
+    Inverted index from wallet address to the coins it was seen holding and when, kept in memory and persisted
+    append-only in SQLite so it survives restarts. Adding a coin stores only its new (wallet, coin) pairs, and the
+    share of a coin's holders also holding other recent coins is answered from memory without any API request.
+    Pairs older than max_age_sec are aged out on periodic compaction.
+    """
+
+    def __init__(self, db_path: str, max_age_sec: float | None = None, compact_interval_sec: float = 3600):
+        self._conn = sqlite3.connect(db_path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS wallet_coins ("
+                           "wallet TEXT NOT NULL, coin TEXT NOT NULL, seen_at REAL NOT NULL, "
+                           "PRIMARY KEY (wallet, coin))")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS wallet_coins_seen_at ON wallet_coins (seen_at)")
+        self._conn.commit()
+        self._max_age_sec = max_age_sec
+        self._compact_interval_sec = compact_interval_sec
+        self._last_compacted_at = 0.0
+        # wallet -> coin -> time the wallet was first seen holding the coin
+        self._wallet_to_coins: Dict[str, Dict[str, float]] = {}
+        self._coin_to_wallets: Dict[str, Set[str]] = {}
+        self.compact()
+
+    def __len__(self) -> int:
+        return len(self._coin_to_wallets)
+
+    def wallets(self, coin_address: str) -> Set[str]:
+        return self._coin_to_wallets.get(coin_address, set())
+
+    def add_coin(self, coin_address: str, wallets: Iterable[str], now: float | None = None):
+        """
+        Persists only the coin's wallets that were not indexed for it yet, compacting first if the compaction
+        interval passed
+        """
+        now = time.time() if now is None else now
+        if now - self._last_compacted_at >= self._compact_interval_sec:
+            self.compact(now)
+
+        coin_wallets = self._coin_to_wallets.setdefault(coin_address, set())
+        new_wallets = [wallet for wallet in dict.fromkeys(wallets) if wallet not in coin_wallets]
+        if not new_wallets:
+            return
+        self._conn.executemany("INSERT OR IGNORE INTO wallet_coins VALUES (?, ?, ?)",
+                               [(wallet, coin_address, now) for wallet in new_wallets])
+        self._conn.commit()
+        for wallet in new_wallets:
+            self._remember(wallet, coin_address, now)
+
+    def coin_overlap(self, coin_address: str, window_sec: float | None = None, coins: Iterable[str] | None = None,
+                     now: float | None = None) -> Dict[str, float]:
+        """
+        :param window_sec: only count other coins the wallets were seen holding within this many seconds
+        :param coins: only count these other coins, by default every other coin
+        :return: fraction of the coin's wallets holding each other coin, for coins sharing at least one wallet
+        """
+        wallets = self.wallets(coin_address)
+        if not wallets:
+            return {}
+        since = (time.time() if now is None else now) - window_sec if window_sec is not None else None
+        coins = set(coins) if coins is not None else None
+        coin_counts: Counter = Counter()
+        for wallet in wallets:
+            for coin, seen_at in self._wallet_to_coins[wallet].items():
+                if coin != coin_address and (since is None or seen_at >= since) and (coins is None or coin in coins):
+                    coin_counts[coin] += 1
+        return {coin: count / len(wallets) for coin, count in coin_counts.items()}
+
+    def overlap(self, coin_address: str, window_sec: float, top: int = 3, now: float | None = None) -> HolderOverlap:
+        """
+        :return: share of the coin's wallets also holding any other coin seen within window_sec, with the top most
+        overlapping coins
+        """
+        wallets = self.wallets(coin_address)
+        since = (time.time() if now is None else now) - window_sec
+        shared_wallets = sum(1 for wallet in wallets
+                             if any(coin != coin_address and seen_at >= since
+                                    for coin, seen_at in self._wallet_to_coins[wallet].items()))
+        coin_overlap = self.coin_overlap(coin_address, window_sec, now=now)
+        top_coins: List[str] = sorted(coin_overlap, key=coin_overlap.get, reverse=True)[:top]
+        return HolderOverlap(overlap_pct=shared_wallets / len(wallets) * 100 if wallets else 0,
+                             coin_overlap_pct={coin: coin_overlap[coin] * 100 for coin in top_coins},
+                             window_hours=window_sec / 3600)
+
+    def compact(self, now: float | None = None):
+        """
+        Deletes aged out pairs and rebuilds the in memory index from what is left
+        """
+        now = time.time() if now is None else now
+        if self._max_age_sec is not None:
+            deleted = self._conn.execute("DELETE FROM wallet_coins WHERE seen_at < ?",
+                                         (now - self._max_age_sec,)).rowcount
+            self._conn.commit()
+            if deleted:
+                LOGGER.info(f"Aged out {deleted} wallet coin pairs")
+                self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+        self._wallet_to_coins = {}
+        self._coin_to_wallets = {}
+        for wallet, coin, seen_at in self._conn.execute("SELECT wallet, coin, seen_at FROM wallet_coins"):
+            self._remember(wallet, coin, seen_at)
+        self._last_compacted_at = now
+
+    def _remember(self, wallet: str, coin_address: str, seen_at: float):
+        self._wallet_to_coins.setdefault(wallet, {})[coin_address] = seen_at
+        self._coin_to_wallets.setdefault(coin_address, set()).add(wallet)
+
+    def close(self):
+        self._conn.close()
@@ -1,15 +1,50 @@
+from __future__ import annotations
+
 import os
 import json
+from datetime import datetime
+from typing import List, Tuple
+
 import requests
-from dotenv import load_dotenv
 
+from shitcoins.metrics.tracing import span, trace
+from shitcoins.model.coin_data import CoinData
+from shitcoins.settings import get_settings
+from shitcoins.sol.known_address_registry import EXCLUDED_STATUS
 from shitcoins.util.time_util import datetime_from_utc_to_local
 
-# Load environment variables from .env file
-load_dotenv()
-BOT_TOKEN = os.getenv('BOT_TOKEN')
-CHAT_ID = os.getenv('CHAT_ID')
-SEND_PERCENT_THRESHOLD = float(os.getenv('SEND_PERCENT_THRESHOLD'))
+# message templates are built once, rendering a coin only fills in its values
+COIN_TEMPLATE = '\n'.join([
+    '<strong>{token_name}</strong>',
+    '',
+    '<code>{coin_address}</code>',
+    '',
+    '🚀Market Cap: <strong>{market_cap}</strong>',
+    '💦Liquidity: <strong>{liquidity}</strong>',
+    '🕗Token Age (ACST): <strong>{token_age}</strong>',
+    '👥Holders: <strong>{total_addresses}</strong>',
+    '👀Fresh: <strong>{fresh_addresses} ({percent_fresh:.2f}%)</strong>',
+]).format_map
+FIRST_BUYS_TEMPLATE = '\n'.join([
+    '⛳Duplicate First Buys: <strong>{duplicate_count}</strong>',
+    '⛳% Of Total Billion Supply: <strong>{duplicate_pct}%</strong>',
+    '⛳# Of Wallets: <strong>{duplicate_wallet_count}</strong>',
+]).format_map
+HOLDER_OVERLAP_TEMPLATE = '🔗Holders In Other Coins ({window_hours:g}h): <strong>{overlap_pct:.2f}%</strong>'.format_map
+OVERLAP_COIN_TEMPLATE = '    <code>{coin_address}</code> <strong>{pct:.2f}%</strong>'.format_map
+FUNDER_CLUSTERS_TEMPLATE = ('💸Fresh Holders With A Shared Funder: '
+                            '<strong>{clustered} in {clusters} groups</strong>').format_map
+FUNDER_CLUSTER_TEMPLATE = '    <code>{funder}</code> funded <strong>{holders}</strong> ({hops} hops)'.format_map
+CLASSIFICATION_PARTIAL_TEMPLATE = '⏱Holders: <strong>partial, {unclassified} not classified in time</strong>'.format_map
+FIRST_BUYS_PARTIAL_LINE = '⛳First Buys: <strong>partial (analysis ran out of time)</strong>'
+FIRST_BUYS_UNKNOWN_LINE = '⛳Duplicate First Buys: <strong>N/A</strong>'
+LINKS_FOOTER = '\n'.join([
+    '',
+    '🐤Twitter: <a href="http://www.twitter.com/">N/A</a>',
+    '🌎Website: <a href="http://www.pornhub.com/">N/A</a>',
+    '📬Telegram: <a href="http://www.telegram.com/">N/A</a>',
+    '',
+])
 
 
 # Function to send message to Telegram
@@ -25,128 +60,123 @@ def send_telegram_message(message, bot_token, chat_id):
     return response
 
 
+def fresh_holder_stats(coin_data: CoinData) -> Tuple[int, int, float]:
+    """
+    :return: number of holders, number of fresh holders and the fresh percentage
+    """
+    # known infrastructure holders (pools, bonding curve, exchanges) would skew the fresh ratio
+    holders = [holder for holder in coin_data.get('holders', []) if holder['status'] != EXCLUDED_STATUS]
+    total_addresses = len(holders)
+    fresh_addresses = sum(1 for holder in holders if holder['status'] == 'FRESH')
+    percent_fresh = (fresh_addresses / total_addresses) * 100 if total_addresses != 0 else 0
+    return total_addresses, fresh_addresses, percent_fresh
+
+
+def render_alert(coin_data: CoinData) -> str:
+    total_addresses, fresh_addresses, percent_fresh = fresh_holder_stats(coin_data)
+    market_info = coin_data.get('market_info') or {}
+
+    created_at_utc = market_info.get('created_at_utc')
+    message = [COIN_TEMPLATE({
+        'token_name': market_info.get('token_name', 'N/A'),
+        'coin_address': coin_data['coin_address'],
+        'market_cap': "${:,.2f}".format(market_info['market_cap']) if 'market_cap' in market_info else 'N/A',
+        'liquidity': "${:,.2f}".format(market_info['liquidity']) if 'liquidity' in market_info else 'N/A',
+        'token_age': datetime_from_utc_to_local(created_at_utc).ctime() if created_at_utc is not None else 'N/A',
+        'total_addresses': total_addresses,
+        'fresh_addresses': fresh_addresses,
+        'percent_fresh': percent_fresh,
+    })]
+
+    if coin_data.get('classification_status') == 'PARTIAL':
+        message.append(CLASSIFICATION_PARTIAL_TEMPLATE({
+            'unclassified': sum(1 for holder in coin_data.get('holders', []) if holder['status'] == 'UNKNOWN')}))
+
+    holder_overlap = coin_data.get('holder_overlap')
+    if holder_overlap is not None:
+        message.append(HOLDER_OVERLAP_TEMPLATE(holder_overlap))
+        message.extend(OVERLAP_COIN_TEMPLATE({'coin_address': coin_address, 'pct': pct})
+                       for coin_address, pct in holder_overlap['coin_overlap_pct'].items())
+
+    funder_clusters = coin_data.get('funder_clusters')
+    if funder_clusters:
+        message.append(FUNDER_CLUSTERS_TEMPLATE({
+            'clustered': len({holder for cluster in funder_clusters for holder in cluster['holders']}),
+            'clusters': len(funder_clusters)}))
+        message.extend(FUNDER_CLUSTER_TEMPLATE({'funder': cluster['funder'], 'holders': len(cluster['holders']),
+                                                'hops': cluster['hops']})
+                       for cluster in funder_clusters[:3])
+
+    first_buy_statistics = coin_data.get('first_buy_statistics')
+    if first_buy_statistics is not None and first_buy_statistics.get('status') == 'UNKNOWN':
+        message.append(FIRST_BUYS_UNKNOWN_LINE)
+    elif first_buy_statistics is not None:
+        if first_buy_statistics.get('status') == 'PARTIAL':
+            message.append(FIRST_BUYS_PARTIAL_LINE)
+        message.append(FIRST_BUYS_TEMPLATE({key: first_buy_statistics.get(key, 'N/A') for key in
+                                            ['duplicate_count', 'duplicate_pct', 'duplicate_wallet_count']}))
+
+    message.append(LINKS_FOOTER)
+    return '\n'.join(message)
+
+
+def archive_coins(coins_data: List[CoinData], archive_dir: str):
+    """
+    Writes each coin to <archive_dir>/<coin address>.json, only for keeping a record, alerts do not read them back
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    for coin_data in coins_data:
+        with open(os.path.join(archive_dir, f"{coin_data['coin_address']}.json"), 'w') as json_file:
+            json.dump(coin_data, json_file, indent=4, default=str)
+
+
+def alert_coins(coins_data: List[CoinData], bot_token=None, chat_id=None, debug=False, dispatcher=None):
+    """
+    Renders an alert for every coin and sends the ones with enough fresh holders
+    :param dispatcher: AlertDispatcher to queue messages on instead of sending them here with a blocking request
+    """
+    for coin_data in coins_data:
+        with trace(coin_data.get('trace_id')), span('alert', coin_address=coin_data['coin_address']):
+            _alert_coin(coin_data, bot_token, chat_id, debug, dispatcher)
+
+
+def _alert_coin(coin_data: CoinData, bot_token, chat_id, debug, dispatcher):
+    alert = render_alert(coin_data)
+
+    print(alert)
+    print('-' * 40)
+
+    percent_fresh = fresh_holder_stats(coin_data)[2]
+    send_percent_threshold = get_settings().send_percent_threshold
+    if dispatcher is not None and chat_id and percent_fresh >= send_percent_threshold:
+        dispatcher.enqueue(alert, chat_id)
+    elif bot_token and chat_id and percent_fresh >= send_percent_threshold:
+        response = send_telegram_message(alert, bot_token, chat_id)
+        if debug:
+            print(f'Telegram response: {response.text}')
+
+
 # Function to calculate fresh and old percentages and send Telegram alerts
-def alert(coins_dir='coins', bot_token=None, chat_id=None, debug=False):
+def alert(coins_dir='coins', bot_token=None, chat_id=None, debug=False, dispatcher=None):
+    """
+    Sends alerts for coins archived as JSON files in coins_dir, see alert_coins for coins already in memory
+    """
+    coins_data = []
     for filename in os.listdir(coins_dir):
         if filename.endswith('.json'):
             file_path = os.path.join(coins_dir, filename)
-
             if debug:
                 print(f'Processing file: {file_path}')
-
             try:
                 with open(file_path, 'r') as file:
                     coin_data = json.load(file)
-                if debug:
-                    print(f'Read JSON data: {coin_data}')
             except Exception as e:
                 if debug:
                     print(f'Error reading file: {file_path}, Error: {e}')
                 continue
-
-            holders = coin_data.get('holders', [])
-            firstBuystatistics = coin_data.get("first_buy_statistics", None)
-            total_addresses = len(holders)
-            fresh_addresses = sum(1 for holder in holders if holder['status'] == 'FRESH')
-
-            percent_fresh = 0
-            if total_addresses != 0:
-                percent_fresh = (fresh_addresses / total_addresses) * 100
-            coin_address = os.path.splitext(filename)[0]
-
-            market_cap_formatted = "${:,.2f}".format(coin_data['market_info']['market_cap'])
-            liquidity_formatted = "${:,.2f}".format(coin_data['market_info']['liquidity'])
-
-            message = []
-
-            try:
-                message.append(f'<strong>{coin_data["market_info"]["token_name"]}</strong>')
-            except KeyError:
-                message.append('<strong>N/A</strong>')
-
-            message.append('')
-
-            try:
-                message.append(f'<code>{coin_address}</code>')
-            except KeyError:
-                message.append('<code>N/A</code>')
-
-            message.append('')
-
-            try:
-                message.append(f"🚀Market Cap: <strong>{market_cap_formatted}</strong>")
-            except KeyError:
-                message.append("🚀Market Cap: <strong>N/A</strong>")
-
-            try:
-                message.append(f"💦Liquidity: <strong>{liquidity_formatted}</strong>")
-            except KeyError:
-                message.append("💦Liquidity: <strong>N/A</strong>")
-            try:
-                utc_time = coin_data['market_info']['created_at_utc']
-                if utc_time is not None:
-                    local_creation_time = datetime_from_utc_to_local(utc_time)
-                    message.append(f"🕗Token Age (ACST): <strong>{local_creation_time.ctime()}</strong>")
-                else:
-                    message.append(f"🕗Token Age (ACST): <strong>N/A</strong>")
-            except KeyError:
-                message.append(f"🕗Token Age (ACST): <strong>N/A</strong>")
-
-            try:
-                message.append(f"👥Holders: <strong>{total_addresses}</strong>")
-            except KeyError:
-                message.append("👥Holders: <strong>N/A</strong>")
-
-            try:
-                message.append(f"👀Fresh: <strong>{fresh_addresses} ({percent_fresh:.2f}%)</strong>")
-            except KeyError:
-                message.append("👀Fresh: <strong>N/A</strong>")
-
-            # message.append("⛳Bundled: <strong>N/A</strong>")
-            if firstBuystatistics is not None:
-                try:
-                    message.append(f"⛳Duplicate First Buys: "
-                                   f"<strong>{firstBuystatistics['duplicate_count']}</strong>")
-                except KeyError:
-                    message.append("⛳Duplicate First Buys: <strong>N/A</strong>")
-                try:
-                    message.append(f"⛳% Of Total Billion Supply: "
-                                   f"<strong>{firstBuystatistics['duplicate_pct']}%</strong>")
-                except KeyError:
-                    message.append("⛳& Of Total: <strong>N/A</strong>")
-
-                try:
-                    message.append(f"⛳# Of Wallets: "
-                                   f"<strong>{firstBuystatistics['duplicate_wallet_count']}</strong>")
-                except KeyError:
-                    message.append("⛳# Of Wallets: <strong>N/A</strong>")
-
-            message.append('')
-            #get twitter link
-            try:
-                message.append('🐤Twitter: <a href="http://www.twitter.com/">N/A</a>')
-            except KeyError:
-                message.append('🐤Twitter: <a href="http://www.twitter.com/">N/A</a>')
-            #get website link
-            try:
-                message.append('🌎Website: <a href="http://www.pornhub.com/">N/A</a>')
-            except KeyError:
-                message.append('🌎Website: <a href="http://www.pornhub.com/">N/A</a>')
-            #get telegram channel link
-            try:
-                message.append('📬Telegram: <a href="http://www.telegram.com/">N/A</a>')
-            except KeyError:
-                message.append('📬Telegram: <a href="http://www.telegram.com/">N/A</a>')
-
-            message.append('')
-
-            alert = '\n'.join(message)
-
-            print(alert)
-            print('-' * 40)
-
-            if bot_token and chat_id and percent_fresh >= SEND_PERCENT_THRESHOLD:
-                response = send_telegram_message(alert, bot_token, chat_id)
-                if debug:
-                    print(f'Telegram response: {response.text}')
-
+            coin_data['coin_address'] = os.path.splitext(filename)[0]
+            created_at_utc = coin_data['market_info'].get('created_at_utc')
+            if isinstance(created_at_utc, str):
+                coin_data['market_info']['created_at_utc'] = datetime.fromisoformat(created_at_utc)
+            coins_data.append(coin_data)
+    alert_coins(coins_data, bot_token=bot_token, chat_id=chat_id, debug=debug, dispatcher=dispatcher)
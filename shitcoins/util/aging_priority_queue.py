@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import time
+from typing import Generic, List, Set, Tuple, TypeVar
+
+T = TypeVar('T')
+
+
+class AgingPriorityQueue(Generic[T]):
+    """
+    Max priority queue whose items gain aging_per_sec priority for every second they wait, so a low priority item is
+    never starved by a steady stream of higher priority ones: it is served at the latest once it waited
+    (priority difference / aging_per_sec) seconds.
+
+    Every item ages at the same rate, so the order between two waiting items never changes and a heap keyed on
+    priority - aging_per_sec * pushed_at serves the highest effective priority in O(log n), without re-scoring.
+
+    Items can also have a deadline. Aging alone cannot promise an item is served before its deadline, so pop serves
+    items whose deadline is closer than the time they take to serve first, earliest deadline first.
+    """
+
+    def __init__(self, aging_per_sec: float = 0.0):
+        self._aging_per_sec = aging_per_sec
+        # (-key, push order, item), the push order keeps items of equal priority first in first out
+        self._heap: List[Tuple[float, int, T]] = []
+        # (deadline, push order, item) of the items pushed with a deadline
+        self._deadlines: List[Tuple[float, int, T]] = []
+        # push order of the waiting items with a deadline, i.e. in both heaps
+        self._with_deadline: Set[int] = set()
+        # push order of items popped from one heap and still to be skipped in the other
+        self._popped: Set[int] = set()
+        self._counter = itertools.count()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def push(self, item: T, priority: float, now: float | None = None, deadline: float | None = None):
+        """
+        :param priority: higher is served first
+        :param now: time.monotonic() value the item is pushed at
+        :param deadline: optional time.monotonic() value by which the item must be served
+        """
+        now = time.monotonic() if now is None else now
+        order = next(self._counter)
+        heapq.heappush(self._heap, (-(priority - self._aging_per_sec * now), order, item))
+        if deadline is not None:
+            heapq.heappush(self._deadlines, (deadline, order, item))
+            self._with_deadline.add(order)
+        self._size += 1
+
+    def _skip_popped(self, heap: List[Tuple[float, int, T]]):
+        while heap and heap[0][1] in self._popped:
+            self._popped.discard(heapq.heappop(heap)[1])
+
+    def _popped_item(self, order: int, item: T) -> T:
+        self._size -= 1
+        if order in self._with_deadline:
+            # still in the other heap, where it is skipped once it reaches the top
+            self._with_deadline.discard(order)
+            self._popped.add(order)
+        return item
+
+    def pop(self, now: float | None = None, urgent_within_sec: float | None = None) -> T:
+        """
+        :param now: time.monotonic() value the item is popped at
+        :param urgent_within_sec: time it takes to serve an item, one whose deadline is closer than that, or already
+        passed, is served before any other. None to serve by priority only.
+        :return: the most urgent item, otherwise the item with the highest priority including the priority it gained
+        waiting
+        :raises IndexError: if the queue is empty
+        """
+        if urgent_within_sec is not None:
+            self._skip_popped(self._deadlines)
+            now = time.monotonic() if now is None else now
+            if self._deadlines and self._deadlines[0][0] - now <= urgent_within_sec:
+                _, order, item = heapq.heappop(self._deadlines)
+                return self._popped_item(order, item)
+
+        self._skip_popped(self._heap)
+        _, order, item = heapq.heappop(self._heap)
+        return self._popped_item(order, item)
@@ -0,0 +1,78 @@
+import threading
+import time
+import unittest
+from datetime import datetime
+from types import SimpleNamespace
+
+from shitcoins.dex.dexscreener_client import DexScreenerClient, aggregate_market_info, DEXSCREENER_TOKENS_URL
+
+
+def _pair(address: str, fdv: float, liquidity: float = 1000.0, price: float = 0.001) -> dict:
+    return {'baseToken': {'address': address, 'name': f"token {address}"}, 'fdv': fdv,
+            'liquidity': {'usd': liquidity}, 'priceUsd': str(price)}
+
+
+class _FakeSession:
+
+    def __init__(self, delay_sec: float = 0.0, unreadable_urls: int = 0):
+        self.urls = []
+        self._delay_sec = delay_sec
+        # the first unreadable_urls requests are answered 200 with a body that is not the expected JSON
+        self._unreadable_urls = unreadable_urls
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        with self._lock:
+            self.urls.append(url)
+            unreadable = len(self.urls) <= self._unreadable_urls
+        time.sleep(self._delay_sec)
+        if unreadable:
+            return SimpleNamespace(status_code=200, json=lambda: {'schemaVersion': '1.0.0'})
+        addresses = url[len(DEXSCREENER_TOKENS_URL):].split(',')
+        return SimpleNamespace(status_code=200, json=lambda: {'pairs': [_pair(address, 100) for address in addresses]})
+
+
+class TestDexScreenerClient(unittest.TestCase):
+
+    def test_aggregate_market_info_averages_fdv_over_pairs(self):
+        market_info = aggregate_market_info([_pair('a', 100, liquidity=5), _pair('a', 300, liquidity=7),
+                                             _pair('b', 50)])
+        self.assertEqual(200, market_info['a']['market_cap'])
+        # liquidity and price come from the first pair
+        self.assertEqual(5, market_info['a']['liquidity'])
+        self.assertEqual(50, market_info['b']['market_cap'])
+
+    def test_aggregate_market_info_takes_creation_time_from_first_pair(self):
+        market_info = aggregate_market_info([{**_pair('a', 100), 'pairCreatedAt': 1_700_000_000_000},
+                                             {**_pair('a', 100), 'pairCreatedAt': 1_600_000_000_000}, _pair('b', 50)])
+        self.assertEqual(datetime(2023, 11, 14, 22, 13, 20), market_info['a']['created_at_utc'])
+        self.assertIsNone(market_info['b']['created_at_utc'])
+
+    def test_fetch_market_info_requests_each_chunk_with_its_own_addresses(self):
+        client = DexScreenerClient()
+        client._session = _FakeSession()
+        addresses = [f"address{i}" for i in range(65)]
+
+        market_info = client.fetch_market_info(addresses)
+
+        self.assertEqual(3, len(client._session.urls))
+        chunk_sizes = [len(url[len(DEXSCREENER_TOKENS_URL):].split(',')) for url in client._session.urls]
+        self.assertEqual([30, 30, 5], sorted(chunk_sizes, reverse=True))
+        self.assertEqual(set(addresses), set(market_info))
+
+    def test_fetch_market_info_fetches_chunks_concurrently(self):
+        client = DexScreenerClient(max_concurrent_requests=4)
+        client._session = _FakeSession(delay_sec=0.3)
+        start_time = time.monotonic()
+        client.fetch_market_info([f"address{i}" for i in range(120)])
+        self.assertTrue(time.monotonic() - start_time < 0.6)
+
+    def test_unreadable_chunk_does_not_fail_the_other_chunks(self):
+        client = DexScreenerClient(max_concurrent_requests=1)
+        client._session = _FakeSession(unreadable_urls=1)
+        addresses = [f"address{i}" for i in range(65)]
+
+        with self.assertLogs('shitcoins.dex.dexscreener_client', 'ERROR'):
+            market_info = client.fetch_market_info(addresses)
+
+        self.assertEqual(set(addresses[30:]), set(market_info))
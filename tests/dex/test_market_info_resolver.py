@@ -0,0 +1,51 @@
+import unittest
+from typing import List
+
+from shitcoins.dex.market_info_resolver import MarketInfoResolver
+from shitcoins.model.market_info import MarketInfo
+
+
+class _FakeDexScreenerClient:
+
+    def __init__(self):
+        self.indexed_addresses = set()
+        self.queries: List[List[str]] = []
+
+    def fetch_market_info(self, pump_addresses: List[str]):
+        self.queries.append(list(pump_addresses))
+        return {address: MarketInfo(token_name=address, market_cap=50_000, liquidity=1, price=1, created_at_utc=None)
+                for address in pump_addresses if address in self.indexed_addresses}
+
+
+class TestMarketInfoResolver(unittest.TestCase):
+
+    def setUp(self):
+        self.client = _FakeDexScreenerClient()
+        self.resolver = MarketInfoResolver(self.client, retry_delay_sec=10, max_attempts=3)
+
+    def test_unindexed_addresses_are_carried_over_and_only_they_are_retried(self):
+        self.client.indexed_addresses = {'a'}
+        self.resolver.add(['a', 'b'])
+
+        self.assertEqual(['a'], list(self.resolver.resolve(now=0)))
+        self.assertEqual(['b'], self.resolver.pending_addresses)
+
+        # not due yet, no request made
+        self.assertEqual({}, self.resolver.resolve(now=5))
+        self.assertEqual(1, len(self.client.queries))
+
+        self.client.indexed_addresses = {'a', 'b'}
+        self.assertEqual(['b'], list(self.resolver.resolve(now=10)))
+        self.assertEqual(['b'], self.client.queries[-1])
+        self.assertEqual([], self.resolver.pending_addresses)
+
+    def test_retry_delay_backs_off_and_address_is_dropped_after_max_attempts(self):
+        self.resolver.add(['b'])
+        self.resolver.resolve(now=0)
+        self.resolver.resolve(now=10)
+        # second failure doubles the delay
+        self.resolver.resolve(now=25)
+        self.assertEqual(2, len(self.client.queries))
+        self.resolver.resolve(now=30)
+        self.assertEqual(3, len(self.client.queries))
+        self.assertEqual([], self.resolver.pending_addresses)
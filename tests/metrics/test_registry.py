@@ -0,0 +1,66 @@
+import unittest
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+
+from shitcoins.metrics.http_server import start_metrics_server
+from shitcoins.metrics.registry import MetricsRegistry, get_metrics
+
+
+def _record_in_worker(requests_count: int) -> dict:
+    for _ in range(requests_count):
+        get_metrics().record_request('solscan', 200, 0.2)
+    get_metrics().record_request('solscan', 429)
+    return get_metrics().snapshot(reset=True)
+
+
+class TestMetricsRegistry(unittest.TestCase):
+
+    def test_counters_and_histograms_render_as_prometheus_text(self):
+        metrics = MetricsRegistry(buckets=(0.1, 1.0))
+        metrics.inc('shitcoins_cache_requests_total', {'cache': 'market_info', 'result': 'hit'}, 2)
+        metrics.observe('shitcoins_stage_duration_seconds', 0.5, {'stage': 'telegram'})
+        metrics.observe('shitcoins_stage_duration_seconds', 5, {'stage': 'telegram'})
+
+        text = metrics.render_prometheus()
+        self.assertIn('# TYPE shitcoins_cache_requests_total counter', text)
+        self.assertIn('shitcoins_cache_requests_total{cache="market_info",result="hit"} 2', text)
+        self.assertIn('# TYPE shitcoins_stage_duration_seconds histogram', text)
+        self.assertIn('shitcoins_stage_duration_seconds_bucket{stage="telegram",le="0.1"} 0', text)
+        self.assertIn('shitcoins_stage_duration_seconds_bucket{stage="telegram",le="1.0"} 1', text)
+        self.assertIn('shitcoins_stage_duration_seconds_bucket{stage="telegram",le="+Inf"} 2', text)
+        self.assertIn('shitcoins_stage_duration_seconds_sum{stage="telegram"} 5.5', text)
+        self.assertIn('shitcoins_stage_duration_seconds_count{stage="telegram"} 2', text)
+
+    def test_worker_process_snapshots_are_aggregated(self):
+        metrics = MetricsRegistry()
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            for snapshot in executor.map(_record_in_worker, [3, 4]):
+                metrics.merge(snapshot)
+
+        text = metrics.render_prometheus()
+        self.assertIn('shitcoins_provider_requests_total{provider="solscan",status="200"} 7', text)
+        self.assertIn('shitcoins_provider_rate_limited_total{provider="solscan"} 2', text)
+        self.assertIn('shitcoins_provider_request_duration_seconds_count{provider="solscan"} 7', text)
+
+    def test_worker_snapshots_leave_out_the_parent_metrics(self):
+        get_metrics().inc('shitcoins_parent_only_total', value=10)
+        self.addCleanup(get_metrics().snapshot, reset=True)
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            snapshots = list(executor.map(_record_in_worker, [1, 1]))
+        for snapshot in snapshots:
+            get_metrics().merge(snapshot)
+
+        text = get_metrics().render_prometheus()
+        self.assertIn('shitcoins_parent_only_total 10', text)
+
+    def test_metrics_are_served_over_http(self):
+        metrics = MetricsRegistry()
+        metrics.inc('shitcoins_coins_processed_total', value=3)
+        server = start_metrics_server(0, metrics=metrics)
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics") as response:
+                self.assertTrue(response.headers['Content-Type'].startswith('text/plain; version=0.0.4'))
+                self.assertIn('shitcoins_coins_processed_total 3', response.read().decode())
+        finally:
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,86 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock
+
+from shitcoins.metrics.tracing import current_trace_id, get_tracer, new_trace_id, reset_tracer, span, trace
+from shitcoins.settings import reload_settings
+
+
+def _span_in_worker(trace_id: str):
+    with trace(trace_id), span('worker span'):
+        pass
+    get_tracer().close()
+
+
+def _read_events(path: str):
+    with open(path) as file:
+        # every process appends to the file, so it has no closing bracket
+        return json.loads(file.read().rstrip().rstrip(',') + ']')
+
+
+class TestTracing(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.trace_file = os.path.join(self.temp_dir.name, 'trace.json')
+        self.env = mock.patch.dict(os.environ, {'TRACE_FILE': self.trace_file})
+        self.env.start()
+        reload_settings()
+        reset_tracer()
+
+    def tearDown(self):
+        reset_tracer()
+        self.env.stop()
+        reload_settings()
+        self.temp_dir.cleanup()
+
+    def test_spans_are_written_as_complete_events_of_the_current_trace(self):
+        with trace('coin-trace'), span('outer', coin_address='coin'):
+            with span('inner', 'api'):
+                pass
+        with span('untraced'):
+            pass
+
+        events = {event['name']: event for event in _read_events(self.trace_file)}
+        self.assertEqual({'outer', 'inner', 'untraced'}, set(events))
+        self.assertEqual('X', events['inner']['ph'])
+        self.assertEqual('api', events['inner']['cat'])
+        self.assertEqual({'trace_id': 'coin-trace', 'coin_address': 'coin'}, events['outer']['args'])
+        self.assertIsNone(events['untraced']['args']['trace_id'])
+        self.assertLessEqual(events['outer']['ts'], events['inner']['ts'])
+        self.assertGreaterEqual(events['outer']['dur'], events['inner']['dur'])
+
+    def test_trace_is_inherited_by_tasks_and_threads(self):
+        async def traced():
+            with trace('coin-trace'):
+                task = asyncio.create_task(asyncio.sleep(0, result=current_trace_id()))
+                thread_trace_id = await asyncio.to_thread(current_trace_id)
+            return await task, thread_trace_id
+
+        self.assertEqual(('coin-trace', 'coin-trace'), asyncio.run(traced()))
+        self.assertIsNone(current_trace_id())
+
+    def test_worker_process_spans_are_appended_to_the_same_file(self):
+        trace_id = new_trace_id()
+        with span('parent span'):
+            pass
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            executor.submit(_span_in_worker, trace_id).result()
+
+        events = _read_events(self.trace_file)
+        self.assertEqual(['parent span', 'worker span'], [event['name'] for event in events])
+        self.assertEqual(trace_id, events[1]['args']['trace_id'])
+        self.assertNotEqual(events[0]['pid'], events[1]['pid'])
+
+    def test_spans_are_not_recorded_without_trace_file(self):
+        with mock.patch.dict(os.environ, {'TRACE_FILE': ''}):
+            reload_settings()
+            reset_tracer()
+            with span('ignored'):
+                pass
+            self.assertIsNone(get_tracer())
+        self.assertFalse(os.path.exists(self.trace_file))
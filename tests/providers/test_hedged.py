@@ -0,0 +1,116 @@
+import multiprocessing
+import threading
+import time
+import unittest
+from typing import Any, List
+
+from shitcoins.providers.base import ActivityPage, HolderDataProvider, ProviderError, RateLimitedError
+from shitcoins.providers.hedged import HedgedProvider, LatencyWindow
+
+
+class FakeProvider(HolderDataProvider):
+
+    def __init__(self, name: str, delay_sec: float = 0, error: ProviderError | None = None):
+        self.name = name
+        self.delay_sec = delay_sec
+        self.error = error
+        self.calls: List[tuple] = []
+        self._lock = threading.Lock()
+
+    def _answer(self, call: tuple):
+        with self._lock:
+            self.calls.append(call)
+        time.sleep(self.delay_sec)
+        if self.error is not None:
+            raise self.error
+
+    def token_holders(self, token_address: str) -> List[str]:
+        self._answer(('token_holders', token_address))
+        return [f"{self.name} holder"]
+
+    def activity_page(self, wallet: str, limit: int, cursor: Any = None) -> ActivityPage:
+        self._answer(('activity_page', wallet, cursor))
+        page = cursor or 0
+        return ActivityPage(block_times=[1000 - page], cursor=page + 1 if page < 2 else None)
+
+
+class TestLatencyWindow(unittest.TestCase):
+
+    def test_quantile_is_taken_over_the_latest_latencies(self):
+        window = LatencyWindow(size=10)
+        self.assertIsNone(window.quantile(0.95))
+        for latency in range(1, 16):
+            window.record(latency)
+        self.assertEqual(10, len(window))
+        self.assertEqual(15, window.quantile(0.95))
+        self.assertEqual(6, window.quantile(0))
+
+    def test_latencies_recorded_in_forked_processes_are_shared(self):
+        window = LatencyWindow()
+        workers = [multiprocessing.get_context('fork').Process(target=window.record, args=(i,)) for i in range(3)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(3, len(window))
+
+
+class TestHedgedProvider(unittest.TestCase):
+
+    def _hedged(self, primary: FakeProvider, backup: FakeProvider, **kwargs) -> HedgedProvider:
+        hedged = HedgedProvider(primary, backup, **kwargs)
+        self.addCleanup(hedged.close)
+        return hedged
+
+    def test_fast_primary_is_never_hedged(self):
+        primary, backup = FakeProvider('primary'), FakeProvider('backup')
+        hedged = self._hedged(primary, backup, initial_hedge_delay_sec=1)
+        for _ in range(5):
+            self.assertEqual(['primary holder'], hedged.token_holders('coin'))
+        self.assertEqual(5, len(primary.calls))
+        self.assertEqual([], backup.calls)
+
+    def test_slow_primary_is_hedged_and_backup_answer_used(self):
+        primary, backup = FakeProvider('primary', delay_sec=1), FakeProvider('backup')
+        hedged = self._hedged(primary, backup, initial_hedge_delay_sec=0.05)
+        start = time.monotonic()
+        self.assertEqual(['backup holder'], hedged.token_holders('coin'))
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(1, len(primary.calls))
+
+    def test_failed_primary_is_hedged_without_waiting(self):
+        primary, backup = FakeProvider('primary', error=ProviderError('down')), FakeProvider('backup')
+        hedged = self._hedged(primary, backup, initial_hedge_delay_sec=5)
+        start = time.monotonic()
+        self.assertEqual(['backup holder'], hedged.token_holders('coin'))
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_rate_limited_error_raised_when_both_fail(self):
+        primary = FakeProvider('primary', error=ProviderError('down'))
+        backup = FakeProvider('backup', error=RateLimitedError('429'))
+        hedged = self._hedged(primary, backup, initial_hedge_delay_sec=0.01)
+        with self.assertRaises(RateLimitedError):
+            hedged.token_holders('coin')
+
+    def test_hedge_delay_follows_the_primary_p95_latency(self):
+        primary, backup = FakeProvider('primary'), FakeProvider('backup')
+        hedged = self._hedged(primary, backup, initial_hedge_delay_sec=3, min_samples=20)
+        self.assertEqual(3, hedged.hedge_delay_sec('token_holders'))
+        for latency in range(1, 101):
+            hedged._latency_windows['token_holders'].record(latency / 100)
+        self.assertAlmostEqual(0.96, hedged.hedge_delay_sec('token_holders'))
+        self.assertEqual(3, hedged.hedge_delay_sec('activity_page'))
+
+    def test_later_activity_pages_stick_to_the_provider_of_the_first(self):
+        primary, backup = FakeProvider('primary', delay_sec=0.5), FakeProvider('backup')
+        hedged = self._hedged(primary, backup, initial_hedge_delay_sec=0.05)
+        page = hedged.activity_page('wallet', 10)
+        block_times = list(page.block_times)
+        while page.cursor is not None:
+            page = hedged.activity_page('wallet', 10, page.cursor)
+            block_times.extend(page.block_times)
+
+        self.assertEqual([1000, 999, 998], block_times)
+        self.assertEqual([('activity_page', 'wallet', None), ('activity_page', 'wallet', 1),
+                          ('activity_page', 'wallet', 2)], backup.calls)
+        self.assertEqual([('activity_page', 'wallet', None)], primary.calls)
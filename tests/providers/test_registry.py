@@ -0,0 +1,41 @@
+import unittest
+
+from shitcoins.providers.hedged import HedgedProvider
+from shitcoins.providers.registry import check_holder_providers, get_holder_provider, reset_holder_provider
+from shitcoins.providers.solscan import SolscanProvider
+from shitcoins.settings import Settings, SettingsError
+
+
+class TestHolderProviderRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(reset_holder_provider)
+
+    def test_single_provider_is_not_hedged(self):
+        provider = get_holder_provider(Settings(solscan_api_key='key'))
+        self.assertIsInstance(provider, SolscanProvider)
+
+    def test_second_provider_hedges_the_first(self):
+        provider = get_holder_provider(Settings(solscan_api_key='key', solana_api_key='http://rpc',
+                                                holder_providers=('rpc', 'solscan'), holder_hedge_delay_sec=0.5))
+        self.assertIsInstance(provider, HedgedProvider)
+        self.assertEqual('rpc+solscan', provider.name)
+        self.assertEqual(0.5, provider.hedge_delay_sec('token_holders'))
+
+    def test_provider_is_reused_until_the_settings_change(self):
+        settings = Settings(solscan_api_key='key')
+        provider = get_holder_provider(settings)
+        self.assertIs(provider, get_holder_provider(settings.with_overrides()))
+        self.assertIsNot(provider, get_holder_provider(settings.with_overrides(solscan_api_key='other')))
+
+    def test_missing_api_keys_and_unknown_providers_are_rejected(self):
+        with self.assertRaisesRegex(ValueError, 'API key not found'):
+            check_holder_providers(Settings())
+        with self.assertRaisesRegex(ValueError, 'SOLANA_API_KEY'):
+            check_holder_providers(Settings(solscan_api_key='key', holder_providers=('solscan', 'rpc')))
+        with self.assertRaisesRegex(ValueError, 'FUNDING_TRACE'):
+            check_holder_providers(Settings(solana_api_key='key', holder_providers=('rpc',), funding_trace=True))
+        with self.assertRaisesRegex(ValueError, 'Unknown holder provider'):
+            check_holder_providers(Settings(holder_providers=('helius',)))
+        with self.assertRaisesRegex(SettingsError, 'HOLDER_PROVIDERS=solscan,rpc,solscan must be one or two'):
+            Settings.from_env({'HOLDER_PROVIDERS': 'solscan,rpc,solscan'})
@@ -0,0 +1,55 @@
+import unittest
+
+from benchmarks.mock_servers import BLOCK_TIME, MockApiConfig, MockApiServer, mock_pubkey
+from shitcoins.providers.base import ProviderError
+from shitcoins.providers.solana_rpc import SolanaRpcProvider
+from shitcoins.providers.solscan import SolscanProvider
+from shitcoins.settings import Settings
+
+
+class TestSolanaRpcProvider(unittest.TestCase):
+
+    def setUp(self):
+        self.server = MockApiServer(MockApiConfig(latency_sec=0, holders_per_token=60, signatures_per_mint=25)).start()
+        self.addCleanup(self.server.stop)
+        env = self.server.env()
+        self.settings = Settings(solscan_api_key='key', solscan_api_url=env['SOLSCAN_API_URL'],
+                                 solana_api_key=env['SOLANA_API_KEY'])
+        self.provider = SolanaRpcProvider(self.settings)
+        self.coin = mock_pubkey('coin')
+
+    def test_token_holders_match_solscan_largest_first(self):
+        owners = self.provider.token_holders(self.coin)
+        self.assertEqual(SolscanProvider(self.settings).token_holders(self.coin), owners)
+        self.assertEqual(60, len(owners))
+        self.assertEqual(1, self.server.request_counts['rpc getProgramAccounts'])
+
+    def test_token_holders_fall_back_to_the_largest_accounts(self):
+        original_rpc_result = self.server.rpc_result
+
+        def rpc_result(method, params):
+            if method == 'getProgramAccounts':
+                raise ValueError("getProgramAccounts is disabled")
+            return original_rpc_result(method, params)
+        self.server.rpc_result = rpc_result
+
+        with self.assertLogs('shitcoins.providers.solana_rpc', 'WARNING'):
+            owners = self.provider.token_holders(self.coin)
+        self.assertEqual([mock_pubkey(f"{self.coin}:holder:{i}") for i in range(20)], owners)
+
+    def test_activity_pages_are_followed_by_signature(self):
+        wallet = mock_pubkey('wallet')
+        page = self.provider.activity_page(wallet, 10)
+        block_times = list(page.block_times)
+        while page.cursor is not None:
+            page = self.provider.activity_page(wallet, 10, page.cursor)
+            block_times.extend(page.block_times)
+
+        self.assertEqual(25, len(block_times))
+        self.assertEqual(sorted(block_times, reverse=True), block_times)
+        self.assertEqual(BLOCK_TIME, block_times[-1])
+
+    def test_http_errors_raise_provider_error(self):
+        provider = SolanaRpcProvider(self.settings.with_overrides(solana_api_key=f"{self.server.base_url}/missing"))
+        with self.assertRaises(ProviderError):
+            provider.activity_page(mock_pubkey('wallet'), 10)
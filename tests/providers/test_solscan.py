@@ -0,0 +1,34 @@
+import unittest
+
+from benchmarks.mock_servers import MockApiConfig, MockApiServer, mock_pubkey
+from shitcoins.providers.base import ProviderError
+from shitcoins.providers.hedged import HedgedProvider
+from shitcoins.providers.solana_rpc import SolanaRpcProvider
+from shitcoins.providers.solscan import SolscanProvider
+from shitcoins.settings import Settings
+
+
+class TestSolscanProvider(unittest.TestCase):
+
+    def setUp(self):
+        self.server = MockApiServer(MockApiConfig(latency_sec=0, holders_per_token=60)).start()
+        self.addCleanup(self.server.stop)
+        # nothing listens on port 9 (discard), so every Solscan request fails to connect
+        self.settings = Settings(solscan_api_key='key', solscan_api_url='http://127.0.0.1:9/solscan',
+                                 solana_api_key=self.server.env()['SOLANA_API_KEY'])
+
+    def test_unreachable_solscan_raises_provider_error(self):
+        with self.assertRaises(ProviderError):
+            SolscanProvider(self.settings).activity_page(mock_pubkey('wallet'), 10)
+        with self.assertRaises(ProviderError):
+            SolscanProvider(self.settings).token_holders(mock_pubkey('coin'))
+        with self.assertRaises(ProviderError):
+            SolscanProvider(self.settings).sol_transfers(mock_pubkey('wallet'), 10)
+
+    def test_unreachable_solscan_falls_back_to_rpc_when_hedged(self):
+        hedged = HedgedProvider(SolscanProvider(self.settings), SolanaRpcProvider(self.settings),
+                                initial_hedge_delay_sec=5)
+        self.addCleanup(hedged.close)
+        coin = mock_pubkey('coin')
+        with self.assertLogs('shitcoins.providers.hedged', 'WARNING'):
+            self.assertEqual(mock_pubkey(f"{coin}:holder:0"), hedged.token_holders(coin)[0])
@@ -0,0 +1,49 @@
+import os
+import tempfile
+import time
+import unittest
+
+from shitcoins.replay.cassette import Cassette, RECORD, REPLAY, RecordedResponse
+
+
+class TestCassette(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, 'cassette.sqlite3')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _record(self, *bodies: bytes):
+        cassette = Cassette(self.db_path, RECORD)
+        for body in bodies:
+            cassette.record('solscan', 'GET /page', RecordedResponse(status=200, body=body, elapsed_sec=0.2,
+                                                                     headers={'content-type': 'application/json'}))
+        cassette.close()
+
+    def test_repeated_requests_replay_in_recorded_order_then_repeat_the_last(self):
+        self._record(b'first', b'second')
+
+        cassette = Cassette(self.db_path, REPLAY, speed=0)
+        self.assertEqual([b'first', b'second', b'second'],
+                         [cassette.play('solscan', 'GET /page').body for _ in range(3)])
+        self.assertEqual({'content-type': 'application/json'}, cassette.play('solscan', 'GET /page').headers)
+        self.assertIsNone(cassette.play('solscan', 'GET /other'))
+        self.assertEqual({'solscan': 2}, cassette.services())
+        cassette.close()
+
+    def test_replay_speed_scales_recorded_timing(self):
+        self._record(b'body')
+
+        cassette = Cassette(self.db_path, REPLAY, speed=4)
+        recorded = cassette.play('solscan', 'GET /page')
+        start_time = time.monotonic()
+        cassette.wait(recorded.elapsed_sec)
+        self.assertAlmostEqual(0.05, time.monotonic() - start_time, delta=0.04)
+        self.assertEqual(0, Cassette(self.db_path, REPLAY, speed=0).replay_delay(recorded.elapsed_sec))
+        cassette.close()
+
+    def test_unknown_mode_is_rejected(self):
+        with self.assertRaises(ValueError):
+            Cassette(self.db_path, 'rewind')
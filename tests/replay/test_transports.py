@@ -0,0 +1,140 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import requests
+from solders.signature import Signature
+
+from benchmarks.mock_servers import MockApiConfig, MockApiServer, mock_pubkey, mock_signature
+from shitcoins.dex.dexscreener_client import DexScreenerClient
+from shitcoins.replay.cassette import RECORD, REPLAY, Cassette, reset_cassette
+from shitcoins.replay.telegram import CassetteTelegramClient
+from shitcoins.replay.transports import http_request_key, reset_http_session
+from shitcoins.settings import reload_settings
+from shitcoins.sol.compute_unit_rate_limiter import ComputeUnitRateLimiter
+from shitcoins.sol.rpc_session import SolanaRpcSession
+
+
+class TestCassetteTransports(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.server = MockApiServer(MockApiConfig(latency_sec=0, holders_per_token=60)).start()
+        self.env = {**self.server.env(), 'API_CASSETTE_PATH': os.path.join(self.temp_dir.name, 'cassette.sqlite3'),
+                    'API_CASSETTE_SPEED': '0', 'SOLSCAN_API_KEY': 'secret', 'MIN_HOLDER_COUNT': '1'}
+
+    def tearDown(self):
+        self.server.stop()
+        reset_cassette()
+        reset_http_session()
+        reload_settings()
+        self.temp_dir.cleanup()
+
+    def _run(self, mode: str, action):
+        reset_cassette()
+        reset_http_session()
+        with mock.patch.dict(os.environ, {**self.env, 'API_CASSETTE_MODE': mode}):
+            reload_settings()
+            return action()
+
+    def test_http_responses_replay_without_network(self):
+        from shitcoins.get_holders import get_holders
+        token_address = mock_pubkey('token')
+        pump_addresses = [mock_pubkey(f"pump:{i}") for i in range(40)]
+
+        def fetch():
+            dexscreener_client = DexScreenerClient()
+            try:
+                return get_holders(token_address), dexscreener_client.fetch_market_info(pump_addresses)
+            finally:
+                dexscreener_client.close()
+
+        with mock.patch('builtins.print'):
+            recorded = self._run(RECORD, fetch)
+            requests_recorded = sum(self.server.request_counts.values())
+            self.server.reset_counts()
+            replayed = self._run(REPLAY, fetch)
+
+        self.assertEqual(recorded, replayed)
+        self.assertEqual(60, len(replayed[0]))
+        self.assertEqual(5, requests_recorded)
+        self.assertEqual(0, sum(self.server.request_counts.values()))
+
+    def test_unrecorded_request_fails_when_replaying(self):
+        def fetch():
+            dexscreener_client = DexScreenerClient()
+            try:
+                return dexscreener_client._session.get(self.server.env()['DEXSCREENER_TOKENS_URL'] + 'unknown')
+            finally:
+                dexscreener_client.close()
+
+        with self.assertRaises(requests.ConnectionError):
+            self._run(REPLAY, fetch)
+
+    def test_rpc_batch_replays_as_single_requests(self):
+        signatures = [Signature.from_string(mock_signature(f"mint:{i}")) for i in range(3)]
+
+        def fetch(max_batch_size: int):
+            async def get_transactions():
+                session = SolanaRpcSession(self.server.env()['SOLANA_API_KEY'], ComputeUnitRateLimiter(1_000_000),
+                                           max_batch_size=max_batch_size)
+                try:
+                    responses = await asyncio.gather(*(session.get_transaction(signature)
+                                                       for signature in signatures))
+                    return [response.value.transaction.transaction.signatures for response in responses]
+                finally:
+                    await session.close()
+            return asyncio.run(get_transactions())
+
+        recorded = self._run(RECORD, lambda: fetch(max_batch_size=5))
+        self.assertEqual(1, self.server.request_counts['rpc getTransaction'])
+        replayed = self._run(REPLAY, lambda: fetch(max_batch_size=1))
+        self.assertEqual(recorded, replayed)
+        self.assertEqual(1, self.server.request_counts['rpc getTransaction'])
+
+    def test_bot_token_is_not_recorded(self):
+        request_key = http_request_key('POST', 'https://api.telegram.org/bot123:secret/sendMessage', b'text=coin')
+        self.assertEqual('POST https://api.telegram.org/bot<token>/sendMessage', request_key)
+
+
+class _FakeTelegramClient:
+
+    def __init__(self):
+        self.started = False
+
+    async def start(self, phone):
+        self.started = True
+
+    async def iter_messages(self, channel, limit, min_id=0, reverse=False):
+        for message_id in range(min_id + 1, min_id + limit + 1):
+            yield SimpleNamespace(id=message_id, text=f"{channel}{message_id}pump")
+
+
+class TestCassetteTelegramClient(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, 'cassette.sqlite3')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    @staticmethod
+    async def _read(client, min_id):
+        return [(message.id, message.text)
+                async for message in client.iter_messages('channel', limit=2, min_id=min_id, reverse=True)]
+
+    async def test_messages_replay_without_connecting(self):
+        recording_client = CassetteTelegramClient(_FakeTelegramClient(), Cassette(self.db_path, RECORD))
+        await recording_client.start('phone')
+        self.assertTrue(recording_client._client.started)
+        recorded = await self._read(recording_client, min_id=5)
+
+        replaying_client = CassetteTelegramClient(_FakeTelegramClient(), Cassette(self.db_path, REPLAY, speed=0))
+        await replaying_client.start('phone')
+        self.assertFalse(replaying_client._client.started)
+        self.assertEqual(recorded, await self._read(replaying_client, min_id=5))
+        self.assertEqual([], await self._read(replaying_client, min_id=7))
@@ -0,0 +1,55 @@
+import asyncio
+import multiprocessing
+import time
+import unittest
+
+from shitcoins.sol.compute_unit_rate_limiter import ComputeUnitBudget, ComputeUnitRateLimiter
+
+
+class TestComputeUnitRateLimiter(unittest.IsolatedAsyncioTestCase):
+
+    def test_cost_of_known_and_unknown_methods(self):
+        limiter = ComputeUnitRateLimiter()
+        self.assertEqual(59, limiter.cost_of('getTransaction'))
+        self.assertEqual(590, limiter.cost_of('getTransaction', count=10))
+        self.assertEqual(10, limiter.cost_of('someNewMethod'))
+
+    async def test_acquire_keeps_compute_unit_budget(self):
+        limiter = ComputeUnitRateLimiter(compute_units_per_second=590)
+        start_time = time.monotonic()
+        # first second worth is burst, the next 10 calls must be spread over one more second
+        await asyncio.gather(*[limiter.acquire('getTransaction') for _ in range(20)])
+        elapsed = time.monotonic() - start_time
+        self.assertTrue(0.9 < elapsed < 1.5, elapsed)
+        self.assertTrue(limiter.total_wait_sec > 0)
+
+    async def test_acquire_larger_than_bucket_does_not_deadlock(self):
+        limiter = ComputeUnitRateLimiter(compute_units_per_second=100)
+        await limiter.acquire('getTransaction', count=3)
+        start_time = time.monotonic()
+        await limiter.acquire('getAccountInfo')
+        # the 77 compute unit debt has to be paid back first
+        self.assertTrue(time.monotonic() - start_time > 0.8)
+
+    async def test_waiting_does_not_block_other_coroutines(self):
+        limiter = ComputeUnitRateLimiter(compute_units_per_second=59)
+        ticks = []
+
+        async def ticker():
+            for _ in range(5):
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.1)
+
+        await limiter.acquire('getTransaction')
+        await asyncio.gather(limiter.acquire('getTransaction'), ticker())
+        self.assertEqual(5, len(ticks))
+        self.assertTrue(ticks[-1] - ticks[0] < 0.8)
+
+    async def test_budget_is_shared_with_forked_processes(self):
+        budget = ComputeUnitBudget(compute_units_per_second=100)
+        limiter = ComputeUnitRateLimiter(budget=budget)
+        worker = multiprocessing.get_context('fork').Process(target=budget.reserve, args=(100,))
+        worker.start()
+        worker.join()
+        # the worker spent the whole bucket, so this process waits for it to refill
+        self.assertGreater(await limiter.acquire('getSignaturesForAddress'), 0.3)
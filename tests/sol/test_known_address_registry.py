@@ -0,0 +1,47 @@
+import os
+import tempfile
+import unittest
+
+from shitcoins.model.holder import Holder
+from shitcoins.sol.known_address_registry import (KnownAddressRegistry, get_known_address_registry,
+                                                  is_program_derived_address)
+
+
+class TestKnownAddressRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.wallet_address = '716gAK3yUXGsB6CQbUw6Yr26neWa4TzZePdYHN299ANd'
+        self.raydium_authority = '5Q544fKrFoe6tsEbD7S8EmxGTJYAKtTVhAW5Q5pge4j1'
+        self.pump_fun_program = '6EF8rrecthR5Dkzon8Nwu78hRvfCKubJ14M5uBEwF6P'
+
+    def test_is_program_derived_address(self):
+        self.assertTrue(is_program_derived_address(self.raydium_authority))
+        self.assertFalse(is_program_derived_address(self.wallet_address))
+        self.assertFalse(is_program_derived_address('bad address'))
+
+    def test_from_file_ignores_comments_and_blank_lines(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as file:
+            file.write(f"# comment\n\n{self.pump_fun_program} PROGRAM\n")
+        registry = KnownAddressRegistry.from_file(file.name)
+        os.remove(file.name)
+        self.assertEqual(1, len(registry))
+        self.assertEqual('PROGRAM', registry.label_for(self.pump_fun_program))
+
+    def test_label_for(self):
+        registry = KnownAddressRegistry({self.pump_fun_program: 'PROGRAM'})
+        self.assertEqual('PROGRAM', registry.label_for(self.pump_fun_program))
+        self.assertEqual('PROGRAM_DERIVED', registry.label_for(self.raydium_authority))
+        self.assertIsNone(registry.label_for(self.wallet_address))
+
+    def test_tag_holders_excludes_known_and_program_derived(self):
+        holders = [Holder(address=self.wallet_address, status='UNKNOWN', transactions_count=0),
+                   Holder(address=self.raydium_authority, status='UNKNOWN', transactions_count=0)]
+        excluded_count = KnownAddressRegistry({}).tag_holders(holders)
+        self.assertEqual(1, excluded_count)
+        self.assertEqual('UNKNOWN', holders[0]['status'])
+        self.assertEqual('EXCLUDED', holders[1]['status'])
+        self.assertEqual('PROGRAM_DERIVED', holders[1]['label'])
+
+    def test_default_registry_loads_packaged_file(self):
+        registry = get_known_address_registry()
+        self.assertTrue(self.raydium_authority in registry)
@@ -0,0 +1,79 @@
+import asyncio
+import json
+import unittest
+
+import httpx
+from solana.exceptions import SolanaRpcException
+from solana.rpc.async_api import AsyncClient
+from solders.pubkey import Pubkey
+from solders.signature import Signature
+
+from shitcoins.sol.compute_unit_rate_limiter import ComputeUnitRateLimiter
+from shitcoins.sol.rpc_batcher import RpcBatcher, rpc_provider
+from shitcoins.sol.rpc_session import SolanaRpcSession
+
+
+class TestRpcBatcher(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.http_requests = []
+        self.status_code = 200
+        self.limiter = ComputeUnitRateLimiter(compute_units_per_second=100_000)
+
+    def _handle(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        self.http_requests.append(body)
+        if self.status_code != 200:
+            return httpx.Response(self.status_code, text='error')
+
+        def result(req):
+            block_time = req['id'] * 10
+            return {'jsonrpc': '2.0', 'id': req['id'],
+                    'result': [{'signature': str(Signature.default()), 'slot': 1, 'err': None, 'memo': None,
+                                'blockTime': block_time, 'confirmationStatus': 'finalized'}]}
+
+        if isinstance(body, list):
+            # answer out of order, the batcher has to match responses by id
+            return httpx.Response(200, json=[result(req) for req in reversed(body)])
+        return httpx.Response(200, json=result(body))
+
+    def _session(self, max_batch_size: int) -> SolanaRpcSession:
+        session = SolanaRpcSession('http://localhost:8899', self.limiter, max_batch_size=max_batch_size)
+        client: AsyncClient = session.client
+        rpc_provider(client).session = httpx.AsyncClient(transport=httpx.MockTransport(self._handle))
+        return session
+
+    async def test_concurrent_requests_are_sent_as_batches(self):
+        session = self._session(max_batch_size=4)
+        responses = await asyncio.gather(*[session.get_signatures_for_address(Pubkey.default())
+                                           for _ in range(10)])
+        self.assertEqual(3, len(self.http_requests))
+        self.assertEqual([4, 4, 2], [len(request) for request in self.http_requests])
+        self.assertEqual(list(range(10, 110, 10)), [response.value[0].block_time for response in responses])
+
+    async def test_single_request_is_not_wrapped_in_batch(self):
+        session = self._session(max_batch_size=4)
+        response = await session.get_signatures_for_address(Pubkey.default())
+        self.assertEqual(1, len(self.http_requests))
+        self.assertIsInstance(self.http_requests[0], dict)
+        self.assertEqual(1, len(response.value))
+
+    async def test_batching_disabled(self):
+        session = self._session(max_batch_size=1)
+        await asyncio.gather(*[session.get_signatures_for_address(Pubkey.default()) for _ in range(3)])
+        self.assertEqual(3, len(self.http_requests))
+
+    async def test_http_error_is_raised_to_every_caller(self):
+        self.status_code = 429
+        session = self._session(max_batch_size=4)
+        results = await asyncio.gather(*[session.get_signatures_for_address(Pubkey.default()) for _ in range(3)],
+                                       return_exceptions=True)
+        self.assertTrue(all(isinstance(result, SolanaRpcException) for result in results))
+
+    async def test_rpc_provider_of_the_pinned_solana_version(self):
+        client = AsyncClient('http://localhost:8899')
+        self.assertIs(client._provider, rpc_provider(client))
+
+        client._provider = object()
+        with self.assertRaises(TypeError):
+            RpcBatcher(client, self.limiter)
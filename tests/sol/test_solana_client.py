@@ -1,7 +1,12 @@
+import asyncio
 import logging
+import os
 import unittest
+from types import SimpleNamespace
+from unittest import mock
 
-from shitcoins.sol.solana_client import get_first_transaction_sigs, get_transaction_stats
+from shitcoins.sol.solana_client import get_first_transaction_sigs, get_transaction_stats, analyse_first_buys
+from shitcoins.settings import reload_settings
 from solana.rpc.async_api import Signature
 import base58
 
@@ -11,6 +16,10 @@ logging.basicConfig(level=logging.INFO)
 class TestSolanaClient(unittest.IsolatedAsyncioTestCase):
 
     def setUp(self):
+        # keep the persistent transaction cache out of these tests
+        cache_patcher = mock.patch('shitcoins.sol.solana_client.get_transaction_cache', return_value=None)
+        cache_patcher.start()
+        self.addCleanup(cache_patcher.stop)
         self.pump_address = '3QJzpi68a3CUVPGVUjYLWziGKCAvbNXmC5VFNy1ypump'
         self.signature_base58 = (base58
                                  .b58decode(
@@ -34,3 +43,61 @@ class TestSolanaClient(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(20, first_buy_stats['duplicate_count'])
         self.assertEqual(4, first_buy_stats['duplicate_wallet_count'])
         self.assertEqual(57.79, first_buy_stats['duplicate_pct'])
+
+    async def test_get_first_transaction_sigs_makes_one_call_per_page(self):
+        os.environ['SOLANA_SKIP_THRESHOLD'] = '1000'
+        reload_settings()
+        pages = [[SimpleNamespace(signature=f"{page}-{i}", block_time=2000 - page) for i in range(size)]
+                 for page, size in enumerate([1000, 1000, 300])]
+        session = mock.AsyncMock()
+        session.get_signatures_for_address.side_effect = [SimpleNamespace(value=page) for page in pages]
+
+        with mock.patch('shitcoins.sol.solana_client.get_rpc_session', return_value=session):
+            signatures, earliest_block_time = await get_first_transaction_sigs(self.pump_address)
+
+        self.assertEqual(pages[2], signatures)
+        self.assertEqual(1998, earliest_block_time)
+        self.assertEqual(3, session.get_signatures_for_address.await_count)
+        self.assertEqual('1-999', session.get_signatures_for_address.await_args.kwargs['before'])
+        session.get_transaction.assert_not_awaited()
+
+    async def test_analyse_first_buys_over_budget_returns_unknown(self):
+        os.environ['SOLANA_SKIP_THRESHOLD'] = '1000'
+        reload_settings()
+        session = mock.AsyncMock()
+        session.get_signatures_for_address.return_value = SimpleNamespace(
+            value=[SimpleNamespace(signature=str(i), block_time=1) for i in range(1000)])
+
+        with mock.patch('shitcoins.sol.solana_client.get_rpc_session', return_value=session):
+            first_buy_stats = await analyse_first_buys(self.pump_address, time_budget_sec=0.05)
+
+        self.assertEqual('UNKNOWN', first_buy_stats['status'])
+
+    async def test_analyse_first_buys_rpc_error_returns_unknown(self):
+        os.environ['SOLANA_SKIP_THRESHOLD'] = '1000'
+        reload_settings()
+        session = mock.AsyncMock()
+        session.get_signatures_for_address.side_effect = ValueError('rpc down')
+
+        with mock.patch('shitcoins.sol.solana_client.get_rpc_session', return_value=session):
+            first_buy_stats = await analyse_first_buys(self.pump_address, time_budget_sec=1)
+
+        self.assertEqual('UNKNOWN', first_buy_stats['status'])
+
+    async def test_analyse_first_buys_slow_transactions_returns_partial(self):
+        os.environ['SOLANA_SKIP_THRESHOLD'] = '1000'
+        reload_settings()
+
+        async def slow_get_transaction(signature):
+            await asyncio.sleep(10)
+
+        session = mock.AsyncMock()
+        session.get_signatures_for_address.return_value = SimpleNamespace(
+            value=[SimpleNamespace(signature=str(i), block_time=1) for i in range(5)])
+        session.get_transaction.side_effect = slow_get_transaction
+
+        with mock.patch('shitcoins.sol.solana_client.get_rpc_session', return_value=session):
+            first_buy_stats = await analyse_first_buys(self.pump_address, time_budget_sec=0.2)
+
+        self.assertEqual('PARTIAL', first_buy_stats['status'])
+        self.assertEqual(4, first_buy_stats['duplicate_wallet_count'])
@@ -0,0 +1,108 @@
+import json
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from solders.rpc.responses import GetTransactionResp
+from solders.signature import Signature
+
+from shitcoins.sol.solana_client import get_first_transaction_sigs, get_transaction
+from shitcoins.sol.transaction_cache import TransactionCache
+from shitcoins.settings import reload_settings
+
+TRANSACTION_RESPONSE = {
+    "jsonrpc": "2.0", "id": 1,
+    "result": {"slot": 430, "blockTime": 1718937526,
+               "meta": {"err": None, "fee": 5000, "innerInstructions": [], "postBalances": [499998932500, 1],
+                        "postTokenBalances": [], "preBalances": [499998937500, 1], "preTokenBalances": [],
+                        "logMessages": [], "rewards": [], "status": {"Ok": None},
+                        "loadedAddresses": {"readonly": [], "writable": []}},
+               "transaction": {"message": {"accountKeys": ["3UVYmECPPMZSCqWKfENfuoTv51fTDTWicX9xmBD2euKe",
+                                                           "Vote111111111111111111111111111111111111111"],
+                                           "header": {"numReadonlySignedAccounts": 0,
+                                                      "numReadonlyUnsignedAccounts": 1,
+                                                      "numRequiredSignatures": 1},
+                                           "instructions": [{"accounts": [0], "data": "37u9WtQpcm6ULa3W",
+                                                             "programIdIndex": 1}],
+                                           "recentBlockhash": "mfcyqEXB3DnHXki6KjjmZck6YjmZLvpAByy2fj4nh6B"},
+                               "signatures": [str(Signature.default())]}}}
+
+
+def _signature(i: int) -> Signature:
+    return Signature(i.to_bytes(64, 'little'))
+
+
+class TestTransactionCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        os.environ['SOLANA_SKIP_THRESHOLD'] = '1000'
+        reload_settings()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = TransactionCache(os.path.join(self.temp_dir.name, 'cache.sqlite3'))
+        self.pump_address = '3QJzpi68a3CUVPGVUjYLWziGKCAvbNXmC5VFNy1ypump'
+        self.transaction = GetTransactionResp.from_json(json.dumps(TRANSACTION_RESPONSE))
+
+    def tearDown(self):
+        self.cache.close()
+        self.temp_dir.cleanup()
+
+    def test_transaction_round_trip(self):
+        self.assertIsNone(self.cache.get_transaction(_signature(1)))
+        self.cache.put_transaction(_signature(1), self.transaction.value)
+        self.assertEqual(self.transaction.value, self.cache.get_transaction(_signature(1)))
+        self.assertEqual(1, self.cache.hits)
+        self.assertEqual(1, self.cache.misses)
+
+    def test_mint_cursor_round_trip(self):
+        self.assertIsNone(self.cache.get_mint_cursor(self.pump_address))
+        self.cache.put_mint_cursor(self.pump_address, None, True)
+        self.assertEqual((None, True), self.cache.get_mint_cursor(self.pump_address))
+        self.cache.put_mint_cursor(self.pump_address, _signature(5), False)
+        self.assertEqual((_signature(5), False), self.cache.get_mint_cursor(self.pump_address))
+
+    async def test_get_transaction_served_from_cache(self):
+        session = mock.AsyncMock()
+        session.get_transaction.return_value = self.transaction
+        with mock.patch('shitcoins.sol.solana_client.get_rpc_session', return_value=session), \
+                mock.patch('shitcoins.sol.solana_client.get_transaction_cache', return_value=self.cache):
+            first = await get_transaction(_signature(1))
+            second = await get_transaction(_signature(1))
+
+        self.assertEqual(first, second)
+        self.assertEqual(1, session.get_transaction.await_count)
+
+    async def test_repeated_search_resumes_at_first_page(self):
+        pages = [[SimpleNamespace(signature=_signature(page * 1000 + i), block_time=2000 - page) for i in range(size)]
+                 for page, size in enumerate([1000, 1000, 300])]
+        session = mock.AsyncMock()
+        session.get_signatures_for_address.side_effect = [SimpleNamespace(value=page) for page in pages + pages[2:]]
+
+        with mock.patch('shitcoins.sol.solana_client.get_rpc_session', return_value=session), \
+                mock.patch('shitcoins.sol.solana_client.get_transaction_cache', return_value=self.cache):
+            await get_first_transaction_sigs(self.pump_address)
+            signatures, earliest_block_time = await get_first_transaction_sigs(self.pump_address)
+
+        self.assertEqual(pages[2], signatures)
+        # 3 calls for the first search, a single call straight to the first page for the second
+        self.assertEqual(4, session.get_signatures_for_address.await_count)
+        self.assertEqual(pages[1][-1].signature, session.get_signatures_for_address.await_args.kwargs['before'])
+
+    async def test_search_resumed_at_the_earliest_transaction_starts_over(self):
+        pages = [[SimpleNamespace(signature=_signature(page * 1000 + i), block_time=2000 - page) for i in range(size)]
+                 for page, size in enumerate([1000, 300])]
+        # an earlier search ran out of time right after the first page, checkpointed at its last signature
+        self.cache.put_mint_cursor(self.pump_address, pages[1][-1].signature, False)
+        session = mock.AsyncMock()
+        session.get_signatures_for_address.side_effect = [SimpleNamespace(value=page) for page in [[]] + pages]
+
+        with mock.patch('shitcoins.sol.solana_client.get_rpc_session', return_value=session), \
+                mock.patch('shitcoins.sol.solana_client.get_transaction_cache', return_value=self.cache):
+            signatures, earliest_block_time = await get_first_transaction_sigs(self.pump_address)
+
+        self.assertEqual(pages[1], signatures)
+        self.assertEqual(1999, earliest_block_time)
+        self.assertIsNone(session.get_signatures_for_address.await_args_list[1].kwargs['before'])
+        # the cursor points at the first page, not at the empty page past it
+        self.assertEqual((pages[0][-1].signature, True), self.cache.get_mint_cursor(self.pump_address))
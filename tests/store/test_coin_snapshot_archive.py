@@ -0,0 +1,59 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+from datetime import date, datetime, timezone
+
+from shitcoins.model.coin_data import CoinData
+from shitcoins.model.first_buy_statistics import FirstBuyStatistics
+from shitcoins.model.holder import Holder
+from shitcoins.model.market_info import MarketInfo
+
+
+def _coin_data(coin_address: str) -> CoinData:
+    return CoinData(coin_address=coin_address,
+                    market_info=MarketInfo(token_name='Coin', market_cap=50_000, liquidity=1000, price=0.1,
+                                           created_at_utc=None),
+                    first_buy_statistics=FirstBuyStatistics(duplicate_count=2, duplicate_wallet_count=1,
+                                                            duplicate_pct=0.5, status='COMPLETE'),
+                    holders=[Holder(address='a', transactions_count=1, status='FRESH'),
+                             Holder(address='b', transactions_count=200, status='OLD'),
+                             Holder(address='pool', transactions_count=None, status='EXCLUDED')],
+                    timings={'holders_sec': 1.5, 'classification_sec': 10.0})
+
+
+@unittest.skipIf(importlib.util.find_spec('pyarrow') is None, 'pyarrow is not installed')
+class TestCoinSnapshotArchive(unittest.TestCase):
+
+    def setUp(self):
+        from shitcoins.store.coin_snapshot_archive import CoinSnapshotArchive
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.archive = CoinSnapshotArchive(self.temp_dir.name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_snapshots_are_partitioned_by_day_and_scanned_by_date_range(self):
+        self.archive.append([_coin_data('first')], datetime(2024, 6, 1, 12, tzinfo=timezone.utc))
+        self.archive.append([_coin_data('second'), _coin_data('third')], datetime(2024, 6, 2, tzinfo=timezone.utc))
+
+        self.assertEqual(['date=2024-06-01', 'date=2024-06-02'], sorted(os.listdir(self.temp_dir.name)))
+        table = self.archive.scan(start_date=date(2024, 6, 2),
+                                  columns=['coin_address', 'holder_count', 'fresh_count', 'holders_sec'])
+        self.assertEqual(['second', 'third'], table.column('coin_address').to_pylist())
+        # excluded infrastructure holders are left out of the counts, like in the alert
+        self.assertEqual([2, 2], table.column('holder_count').to_pylist())
+        self.assertEqual([1, 1], table.column('fresh_count').to_pylist())
+        self.assertEqual([1.5, 1.5], table.column('holders_sec').to_pylist())
+
+        holders = self.archive.scan(end_date=date(2024, 6, 1)).column('holders').to_pylist()
+        self.assertEqual(['FRESH', 'OLD', 'EXCLUDED'], [holder['status'] for holder in holders[0]])
+
+    def test_previous_day_is_compacted_when_day_rolls_over(self):
+        for hour in range(3):
+            self.archive.append([_coin_data(f"coin{hour}")], datetime(2024, 6, 1, hour, tzinfo=timezone.utc))
+        self.assertEqual(3, len(os.listdir(os.path.join(self.temp_dir.name, 'date=2024-06-01'))))
+
+        self.archive.append([_coin_data('next day')], datetime(2024, 6, 2, tzinfo=timezone.utc))
+        self.assertEqual(1, len(os.listdir(os.path.join(self.temp_dir.name, 'date=2024-06-01'))))
+        self.assertEqual(4, self.archive.scan().num_rows)
@@ -0,0 +1,59 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from shitcoins.store.seen_address_store import SeenAddressStore
+
+
+class TestSeenAddressStore(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, 'seen.sqlite3')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_added_addresses_are_seen_after_reopening(self):
+        store = SeenAddressStore(self.db_path)
+        store.add(['a', 'b', 'a'])
+        self.assertEqual(['c'], store.filter_unseen(['a', 'c', 'b']))
+        store.close()
+
+        store = SeenAddressStore(self.db_path)
+        self.assertIn('a', store)
+        self.assertEqual(2, len(store))
+        store.close()
+
+    def test_old_addresses_age_out_on_compaction(self):
+        store = SeenAddressStore(self.db_path, max_age_sec=100, compact_interval_sec=30)
+        now = time.time()
+        store.add(['old'], now=now)
+        store.add(['new'], now=now + 60)
+        self.assertIn('old', store)
+        # compaction interval passed, 'old' is over max age
+        store.add([], now=now + 101)
+        self.assertNotIn('old', store)
+        self.assertIn('new', store)
+        store.close()
+
+    def test_bloom_filter_front_confirms_against_sqlite(self):
+        store = SeenAddressStore(self.db_path, bloom_capacity=100)
+        self.assertIsNone(store._addresses)
+        store.add([f"address{i}" for i in range(150)])
+        self.assertIn('address149', store)
+        self.assertEqual([], store.filter_unseen([f"address{i}" for i in range(150)]))
+        self.assertEqual(['other'], store.filter_unseen(['other']))
+        store.close()
+
+    def test_legacy_json_is_imported_once(self):
+        json_path = os.path.join(self.temp_dir.name, 'seen_addresses.json')
+        with open(json_path, 'w') as file:
+            json.dump(['a', 'b'], file)
+        store = SeenAddressStore(self.db_path)
+        store.import_json(json_path)
+        self.assertIn('b', store)
+        self.assertFalse(os.path.exists(json_path))
+        store.close()
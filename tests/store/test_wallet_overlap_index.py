@@ -0,0 +1,63 @@
+import os
+import tempfile
+import time
+import unittest
+
+from shitcoins.store.wallet_overlap_index import WalletOverlapIndex
+
+
+class TestWalletOverlapIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, 'overlap.sqlite3')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_coin_overlap_is_the_share_of_holders_in_each_other_coin(self):
+        index = WalletOverlapIndex(self.db_path)
+        now = time.time()
+        index.add_coin('x', ['a', 'b', 'z'], now=now)
+        index.add_coin('y', ['a', 'y1'], now=now)
+        index.add_coin('coin', ['a', 'b', 'c', 'd', 'a'], now=now)
+
+        self.assertEqual({'x': 0.5, 'y': 0.25}, index.coin_overlap('coin', now=now))
+        self.assertEqual({'y': 0.25}, index.coin_overlap('coin', coins=['y'], now=now))
+        overlap = index.overlap('coin', window_sec=3600, now=now)
+        # a and b hold another coin
+        self.assertEqual(50, overlap['overlap_pct'])
+        self.assertEqual(['x', 'y'], list(overlap['coin_overlap_pct']))
+        self.assertEqual(1, overlap['window_hours'])
+        index.close()
+
+    def test_coins_outside_the_window_do_not_count(self):
+        index = WalletOverlapIndex(self.db_path)
+        now = time.time()
+        index.add_coin('old', ['a'], now=now - 7200)
+        index.add_coin('new', ['b'], now=now - 60)
+        index.add_coin('coin', ['a', 'b'], now=now)
+        self.assertEqual({'new': 0.5}, index.coin_overlap('coin', window_sec=3600, now=now))
+        self.assertEqual(50, index.overlap('coin', window_sec=3600, now=now)['overlap_pct'])
+        index.close()
+
+    def test_index_is_rebuilt_from_sqlite_and_ages_out(self):
+        index = WalletOverlapIndex(self.db_path, max_age_sec=100, compact_interval_sec=30)
+        now = time.time()
+        index.add_coin('x', ['a'], now=now)
+        index.add_coin('y', ['b'], now=now + 60)
+        index.close()
+
+        index = WalletOverlapIndex(self.db_path, max_age_sec=100, compact_interval_sec=30)
+        self.assertEqual({'a'}, index.wallets('x'))
+        # compaction interval passed, 'x' is over max age
+        index.add_coin('coin', ['a', 'b'], now=now + 101)
+        self.assertEqual(set(), index.wallets('x'))
+        self.assertEqual({'y': 0.5}, index.coin_overlap('coin', now=now + 101))
+        index.close()
+
+    def test_unknown_coin_has_no_overlap(self):
+        index = WalletOverlapIndex(self.db_path)
+        self.assertEqual({}, index.coin_overlap('missing'))
+        self.assertEqual(0, index.overlap('missing', window_sec=3600)['overlap_pct'])
+        index.close()
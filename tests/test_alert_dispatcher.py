@@ -0,0 +1,76 @@
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+
+from shitcoins.alert_dispatcher import AlertDispatcher, COMBINED_MESSAGE_SEPARATOR
+
+
+class _FakeSession:
+
+    def __init__(self, responses=None, delay_sec=0.0):
+        self.posts = []
+        self._responses = list(responses or [])
+        self._delay_sec = delay_sec
+        self._lock = threading.Lock()
+
+    def post(self, url, data):
+        time.sleep(self._delay_sec)
+        with self._lock:
+            self.posts.append((time.monotonic(), data))
+            if self._responses:
+                return self._responses.pop(0)
+        return SimpleNamespace(status_code=200, text='ok', json=lambda: {'ok': True})
+
+    def close(self):
+        pass
+
+
+def _too_many_requests(retry_after: float):
+    return SimpleNamespace(status_code=429, text='Too Many Requests',
+                           json=lambda: {'ok': False, 'parameters': {'retry_after': retry_after}})
+
+
+class TestAlertDispatcher(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.dispatcher = AlertDispatcher('token', per_chat_interval_sec=0.2, global_messages_per_sec=100,
+                                          max_combined=3)
+
+    async def asyncTearDown(self):
+        await self.dispatcher.close()
+
+    async def test_enqueue_does_not_wait_for_slow_send(self):
+        self.dispatcher._session = _FakeSession(delay_sec=0.5)
+        self.dispatcher.start()
+        start_time = time.monotonic()
+        self.dispatcher.enqueue('coin', 'chat')
+        self.assertLess(time.monotonic() - start_time, 0.1)
+        await self.dispatcher.join()
+        self.assertEqual(1, self.dispatcher.sent_count)
+
+    async def test_burst_is_combined_per_chat(self):
+        self.dispatcher._session = _FakeSession()
+        self.dispatcher.start()
+        for i in range(4):
+            self.dispatcher.enqueue(f"coin{i}", 'chat')
+        self.dispatcher.enqueue('other coin', 'other chat')
+        await self.dispatcher.join()
+
+        texts = [data['text'] for _, data in self.dispatcher._session.posts]
+        # the other chat is not held up behind the first chat's second message
+        self.assertEqual([COMBINED_MESSAGE_SEPARATOR.join(['coin0', 'coin1', 'coin2']), 'other coin', 'coin3'], texts)
+
+    async def test_same_chat_is_spaced_and_retried_after_retry_after(self):
+        self.dispatcher._session = _FakeSession(responses=[_too_many_requests(0.3)])
+        self.dispatcher.start()
+        self.dispatcher.enqueue('coin', 'chat')
+        await self.dispatcher.join()
+        self.dispatcher.enqueue('coin2', 'chat')
+        await self.dispatcher.join()
+
+        post_times = [post_time for post_time, _ in self.dispatcher._session.posts]
+        self.assertEqual(3, len(post_times))
+        self.assertGreaterEqual(post_times[1] - post_times[0], 0.29)
+        self.assertGreaterEqual(post_times[2] - post_times[1], 0.19)
+        self.assertEqual(2, self.dispatcher.sent_count)
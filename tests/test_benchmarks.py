@@ -0,0 +1,37 @@
+import unittest
+from unittest import mock
+
+from benchmarks.mock_servers import MockApiConfig
+from benchmarks.run_benchmarks import find_regressions, run_benchmarks
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_scenarios_run_against_mock_servers(self):
+        with mock.patch('builtins.print'):
+            results = run_benchmarks(['get_holders', 'first_buys', 'dexscreener'],
+                                     {'get_holders': [60], 'first_buys': [10], 'dexscreener': [40]}, coins=1,
+                                     config=MockApiConfig(latency_sec=0))
+
+        name_to_result = {result.name: result for result in results}
+        # holder pages of 50 and 10, then the empty page that ends paging
+        self.assertEqual(3, name_to_result['get_holders'].requests_per_coin)
+        # one signatures page and one batch of first block transactions
+        self.assertEqual(2, name_to_result['first_buys'].requests_per_coin)
+        # 40 addresses take two chunks of at most 30
+        self.assertEqual(2, name_to_result['dexscreener'].requests_per_coin)
+        self.assertTrue(all(result.items_per_sec > 0 for result in results))
+
+    def test_mock_rate_limit_answers_429(self):
+        with mock.patch('builtins.print'):
+            results = run_benchmarks(['dexscreener'], {'dexscreener': [300]}, coins=1,
+                                     config=MockApiConfig(latency_sec=0, rate_limit_per_sec=5))
+        self.assertEqual(5, results[0].rate_limited_per_coin)
+
+    def test_find_regressions_compares_throughput_with_tolerance(self):
+        with mock.patch('builtins.print'):
+            results = run_benchmarks(['dexscreener'], {'dexscreener': [30]}, coins=1,
+                                     config=MockApiConfig(latency_sec=0))
+        baseline = [{'name': 'dexscreener', 'size': 30, 'items_per_sec': results[0].items_per_sec * 2}]
+        self.assertEqual(1, len(find_regressions(results, baseline, tolerance=0.2)))
+        self.assertEqual([], find_regressions(results, baseline, tolerance=0.6))
@@ -1,16 +1,27 @@
 import os
+import time
 import unittest
 from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from unittest import mock
 
 import psycopg2
 import psycopg2.extras
 
-from shitcoins.check_holder_transfers import multiprocess_coin_holders, check_holder
+from benchmarks.mock_servers import MockApiConfig, MockApiServer, mock_pubkey
+from shitcoins.check_holder_transfers import (multiprocess_coin_holders, check_holder, check_holder_batch,
+                                              _chunk_holder_addresses, _classify_from_wallet_db,
+                                              HolderClassificationPool,
+                                              get_classification_pool, get_first_transfer_time_or_status,
+                                              reset_classification_pool)
+from shitcoins.metrics.registry import get_metrics
 from shitcoins.model.coin_data import CoinData
 from shitcoins.database.table.wallet_repository import WalletRepository
 from shitcoins.model.holder import Holder
 from shitcoins.model.market_info import MarketInfo
 from shitcoins.mp.multi_process_rate_limiter import MultiProcessRateLimiter
+from shitcoins.providers.registry import get_holder_provider, get_latency_windows, reset_holder_provider
+from shitcoins.settings import Settings, reload_settings
 
 
 class TestCheckHolderTransfers(unittest.TestCase):
@@ -36,6 +47,7 @@ class TestCheckHolderTransfers(unittest.TestCase):
         os.environ['FRESH_WALLET_HOURS'] = '24'
         os.environ['SOLSCAN_SKIP_THRESHOLD'] = '200'
         os.environ['SOLSCAN_MAX_TRNS_PER_REQ'] = '50'
+        reload_settings()
         self.conn = psycopg2.connect(
             database='shitcoins', user=os.environ['DB_USER'], host='localhost', port=os.environ['DB_PORT']
         )
@@ -46,18 +58,22 @@ class TestCheckHolderTransfers(unittest.TestCase):
         Basic test without db to see that multiprocess_coin_holders succeeds with old addresses
         """
         os.environ['RUN_WITH_DB'] = 'false'
+        reload_settings()
         coin_data: CoinData = CoinData(coin_address=self.pump_address,
                                        market_info=MarketInfo(market_cap=0, liquidity=0, price=0),
                                        holders=self.holders)
         coin_data: CoinData = multiprocess_coin_holders(coin_data)
         self.assertEqual(self.pump_address, coin_data["coin_address"])
         self.assertEqual(2, len(coin_data['holders']))
-        self.assertEqual(self.expected_holder_addr_old['address'], coin_data['holders'][0]['address'])
+        # holders keep their original order
+        self.assertEqual(self.expected_holder_addr_old2['address'], coin_data['holders'][0]['address'])
+        self.assertEqual(self.expected_holder_addr_old['address'], coin_data['holders'][1]['address'])
         self.assertEqual('OLD', coin_data['holders'][1]['status'])
 
     def test_multiprocess_coin_holders_respects_skip_threshold(self):
         os.environ['SOLSCAN_SKIP_THRESHOLD'] = '50'
         os.environ['RUN_WITH_DB'] = 'false'
+        reload_settings()
         # change old to be identified as skip by lowering skip
         coin_data: CoinData = CoinData(coin_address=self.pump_address, holders=[self.expected_holder_addr_old])
         coin_data: CoinData = multiprocess_coin_holders(coin_data)
@@ -69,6 +85,7 @@ class TestCheckHolderTransfers(unittest.TestCase):
         Test multiprocess_coin_holder function does not save UNKNOWN wallet to database
         """
         os.environ['RUN_WITH_DB'] = 'true'
+        reload_settings()
         wallet_repo = WalletRepository(self.conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor))
         wallet_repo.truncate_all_entries()
         coin_data: CoinData = CoinData(coin_address=self.pump_address,
@@ -86,6 +103,7 @@ class TestCheckHolderTransfers(unittest.TestCase):
         Test if multiprocess_coin_holders adds OLD to database
         """
         os.environ['RUN_WITH_DB'] = 'true'
+        reload_settings()
 
         # check items are in db as
         wallet_repo = WalletRepository(self.conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor))
@@ -99,6 +117,7 @@ class TestCheckHolderTransfers(unittest.TestCase):
         self.assertEqual('OLD', coin_data['holders'][1]['status'])
 
         os.environ['SOLSCAN_SKIP_THRESHOLD'] = '50'
+        reload_settings()
         holder_old2 = wallet_repo.get_wallet_entry(self.expected_holder_addr_old2['address'])
         self.assertEqual(self.expected_holder_addr_old2['address'], holder_old2['address'])
 
@@ -107,6 +126,7 @@ class TestCheckHolderTransfers(unittest.TestCase):
         This is a manual test. Place a debugger on get_first_transfer_time_or_status to see that it is not called
         """
         os.environ['RUN_WITH_DB'] = 'true'
+        reload_settings()
         wallet_repo = WalletRepository(self.conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor))
         wallet_repo.truncate_all_entries()
         wallet_repo.insert_new_wallet_entry(self.expected_holder_addr_old)
@@ -126,6 +146,7 @@ class TestCheckHolderTransfers(unittest.TestCase):
         os.environ['FRESH_WALLET_HOURS'] = '10000000'
         os.environ['SOLSCAN_SKIP_THRESHOLD'] = '1000'
         os.environ['RUN_WITH_DB'] = 'true'
+        reload_settings()
         fresh_coin_data = Holder(address='2h6UHRdvF46GaUy5BMmWzN6tby6Vnsu3ZW2ep6PKkhGt', status='FRESH')
 
         wallet_repo = WalletRepository(self.conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor))
@@ -161,3 +182,164 @@ class TestCheckHolderTransfers(unittest.TestCase):
 
         result_second_run = wallet_repo.get_wallet_entry(fresh_coin_data['address'])
         self.assertEqual(result['transactions_count'], result_second_run['transactions_count'])
+
+    def test_check_holder_batch_returns_packed_results(self):
+        os.environ['RUN_WITH_DB'] = 'false'
+        reload_settings()
+        futures = []
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            futures.append(executor.submit(check_holder_batch, self.holder_addresses, self.lock_counter))
+
+            while len(futures):
+                self.mp_rate_limiter.cycle()
+
+                for future in [future for future in futures if future.done()]:
+                    futures.remove(future)
+                    results = future.result()
+
+        self.assertEqual(2, len(results))
+        self.assertEqual((self.expected_holder_addr_old2['address'], 'OLD'), results[0][:2])
+        self.assertEqual((self.expected_holder_addr_old['address'], 'OLD'), results[1][:2])
+
+    def test_chunk_holder_addresses_keeps_all_workers_busy(self):
+        os.environ['HOLDER_BATCH_SIZE'] = '10'
+        reload_settings()
+        addresses = [str(i) for i in range(25)]
+        self.assertEqual(13, len(_chunk_holder_addresses(addresses, max_workers=15)))
+        self.assertEqual(3, len(_chunk_holder_addresses(addresses, max_workers=2)))
+        self.assertEqual(addresses, sum(_chunk_holder_addresses(addresses, max_workers=2), []))
+        self.assertEqual(0, len(_chunk_holder_addresses([], max_workers=2)))
+
+
+class TestWalletDatabaseConnections(unittest.TestCase):
+
+    def setUp(self):
+        self.settings = Settings(run_with_db=True)
+        patcher = mock.patch('shitcoins.check_holder_transfers.psycopg2.connect')
+        self.connect = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_batch_closes_its_one_connection(self):
+        with mock.patch('shitcoins.check_holder_transfers.check_holder', side_effect=lambda holder, *args: holder):
+            results = check_holder_batch(['a', 'b'], mock.Mock(), self.settings)
+        self.assertEqual([('a', 'UNKNOWN', 0), ('b', 'UNKNOWN', 0)], results)
+        self.connect.assert_called_once()
+        self.connect.return_value.close.assert_called_once()
+
+    def test_wallet_db_lookup_of_a_coin_closes_its_connection(self):
+        cursor = self.connect.return_value.cursor.return_value
+        cursor.fetchall.return_value = [{'address': 'a', 'status': 'OLD', 'transactions_count': 500}]
+        address_to_holder = {address: Holder(address=address, status='UNKNOWN', transactions_count=0)
+                             for address in ['a', 'b']}
+        self.assertEqual(['b'], _classify_from_wallet_db(address_to_holder, self.settings))
+        self.assertEqual('OLD', address_to_holder['a']['status'])
+        self.connect.return_value.close.assert_called_once()
+
+
+class TestMultiprocessCoinHoldersDeadline(unittest.TestCase):
+
+    def setUp(self):
+        self.server = MockApiServer(MockApiConfig(latency_sec=0.5)).start()
+        self.addCleanup(self.server.stop)
+        # runs before the server stops, so the batches left running by a deadline can finish
+        self.addCleanup(reset_classification_pool)
+        environ = mock.patch.dict(os.environ, {**self.server.env(), 'SOLSCAN_API_KEY': 'test', 'RUN_WITH_DB': 'false',
+                                               'HOLDER_BATCH_SIZE': '5'})
+        environ.start()
+        self.addCleanup(reload_settings)
+        self.addCleanup(environ.stop)
+        reload_settings()
+
+    @staticmethod
+    def _coin_data(name: str, holders_count: int) -> CoinData:
+        holders = [Holder(address=mock_pubkey(f"{name}:holder:{i}"), status='UNKNOWN', transactions_count=0)
+                   for i in range(holders_count)]
+        return CoinData(coin_address=mock_pubkey(name), holders=holders)
+
+    def test_holders_not_classified_by_the_deadline_stay_unknown(self):
+        coin_data = self._coin_data('coin', 40)
+        start = time.monotonic()
+        with mock.patch('builtins.print'), mock.patch.object(get_metrics(), 'set_gauge') as set_gauge:
+            multiprocess_coin_holders(coin_data, deadline=time.monotonic() + 1)
+        elapsed_sec = time.monotonic() - start
+
+        # returns at the deadline without waiting for the batches still running
+        self.assertLess(elapsed_sec, 3)
+        self.assertEqual('PARTIAL', coin_data['classification_status'])
+        self.assertIn('UNKNOWN', {holder['status'] for holder in coin_data['holders']})
+        # throughput counts the classified holders only
+        classified_count = sum(1 for holder in coin_data['holders'] if holder['status'] != 'UNKNOWN')
+        set_gauge.assert_called_once_with('shitcoins_holders_classified_per_second', mock.ANY)
+        self.assertAlmostEqual(classified_count, set_gauge.call_args.args[1] * elapsed_sec, delta=1)
+
+    def test_next_coin_shares_the_pool_and_rate_limiter_after_a_deadline(self):
+        with mock.patch('builtins.print'):
+            multiprocess_coin_holders(self._coin_data('late coin', 40), deadline=time.monotonic() + 1)
+            pool = get_classification_pool()
+            coin_data = multiprocess_coin_holders(self._coin_data('next coin', 3))
+
+        self.assertIs(pool, get_classification_pool())
+        self.assertEqual('COMPLETE', coin_data['classification_status'])
+        self.assertNotIn('UNKNOWN', {holder['status'] for holder in coin_data['holders']})
+
+
+class TestHolderClassificationPool(unittest.TestCase):
+
+    def test_request_slots_are_given_out_without_batches_in_flight(self):
+        pool = HolderClassificationPool(max_workers=1)
+        self.addCleanup(pool.close)
+        start = time.monotonic()
+        for _ in range(3):
+            pool.wait_for_request_slot()
+        self.assertLess(time.monotonic() - start, 5)
+
+
+class TestHedgedClassification(unittest.TestCase):
+
+    def test_workers_hedge_by_the_latencies_of_all_processes(self):
+        server = MockApiServer(MockApiConfig(latency_sec=0)).start()
+        self.addCleanup(server.stop)
+        self.addCleanup(reset_classification_pool)
+        self.addCleanup(reset_holder_provider)
+        settings = Settings(solscan_api_key='test', solscan_api_url=server.env()['SOLSCAN_API_URL'],
+                            solana_api_key=server.env()['SOLANA_API_KEY'], holder_providers=('solscan', 'rpc'),
+                            holder_hedge_delay_sec=5)
+        holders = [Holder(address=mock_pubkey(f"hedged:holder:{i}"), status='UNKNOWN', transactions_count=0)
+                   for i in range(30)]
+        with mock.patch('builtins.print'):
+            coin_data = multiprocess_coin_holders(CoinData(coin_address=mock_pubkey('hedged'), holders=holders),
+                                                  settings)
+
+        self.assertEqual('COMPLETE', coin_data['classification_status'])
+        # the workers' Solscan latencies are all seen here, enough to hedge by their p95 instead of the initial delay
+        self.assertGreaterEqual(len(get_latency_windows()['solscan']['activity_page']), 30)
+        self.assertLess(get_holder_provider(settings).hedge_delay_sec('activity_page'), 1)
+        self.assertEqual(0, server.request_counts['rpc getSignaturesForAddress'])
+
+
+class TestGetFirstTransferTimeProviders(unittest.TestCase):
+
+    def setUp(self):
+        self.server = MockApiServer(MockApiConfig(latency_sec=0, fresh_ratio=1)).start()
+        self.addCleanup(self.server.stop)
+        self.addCleanup(reset_holder_provider)
+        env = self.server.env()
+        self.settings = Settings(solscan_api_key='test', solscan_api_url=env['SOLSCAN_API_URL'],
+                                 solana_api_key=env['SOLANA_API_KEY'])
+
+    def test_fresh_wallet_from_solscan(self):
+        current_time = datetime.now(timezone.utc)
+        first_transfer_time, transactions_count = get_first_transfer_time_or_status(
+            mock_pubkey('wallet'), current_time, self.settings)
+        self.assertEqual(3, transactions_count)
+        self.assertLess(current_time - first_transfer_time, timedelta(hours=4))
+
+    def test_old_wallet_from_rpc_signatures(self):
+        settings = self.settings.with_overrides(holder_providers=('rpc',))
+        current_time = datetime.now(timezone.utc)
+        first_transfer_time, transactions_count = get_first_transfer_time_or_status(
+            mock_pubkey('wallet'), current_time, settings)
+        # the first page is already older than FRESH_WALLET_HOURS, so no further pages are requested
+        self.assertEqual(settings.solscan_max_trns_per_req, transactions_count)
+        self.assertEqual(1, self.server.request_counts['rpc getSignaturesForAddress'])
+        self.assertGreater(current_time - first_transfer_time, timedelta(days=30))
@@ -0,0 +1,100 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from benchmarks.mock_servers import MockApiConfig, MockApiServer, mock_pubkey
+from shitcoins.check_holder_transfers import reset_classification_pool
+from shitcoins.cli import completed_keys, main, read_addresses
+from shitcoins.settings import reload_settings
+from shitcoins.sol.rpc_session import reset_rpc_session
+
+
+class TestReadAddresses(unittest.TestCase):
+
+    def test_skips_blank_comment_duplicate_invalid_and_done_addresses(self):
+        wallet, other_wallet, done_wallet = mock_pubkey('wallet'), mock_pubkey('other'), mock_pubkey('done')
+        lines = [f"{wallet}\n", "\n", "# comment\n", "not an address\n", f" {wallet} \n", f"{done_wallet}\n",
+                 other_wallet]
+        self.assertEqual([wallet, other_wallet], list(read_addresses(lines, skip={done_wallet})))
+
+
+class TestCompletedKeys(unittest.TestCase):
+
+    def test_reads_keys_and_drops_a_partial_last_line(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output_path = os.path.join(temp_dir, 'out.ndjson')
+            with open(output_path, 'w') as output_file:
+                output_file.write('{"address": "a", "status": "OLD"}\n{"address": "b"}\n{"address": "c", "sta')
+            self.assertEqual({'a', 'b'}, completed_keys(output_path, 'address'))
+            with open(output_path) as output_file:
+                self.assertEqual(2, len(output_file.readlines()))
+            self.assertEqual(set(), completed_keys(os.path.join(temp_dir, 'missing.ndjson'), 'address'))
+
+
+class TestCli(unittest.TestCase):
+
+    def setUp(self):
+        self.server = MockApiServer(MockApiConfig(latency_sec=0, holders_per_token=5, signatures_per_mint=30,
+                                                  first_block_signatures=3)).start()
+        self.addCleanup(self.server.stop)
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        environ = mock.patch.dict(os.environ, {**self.server.env(), 'SOLSCAN_API_KEY': 'test', 'RUN_WITH_DB': 'false',
+                                               'MIN_HOLDER_COUNT': '1', 'SOLANA_CACHE_PATH': '',
+                                               'SOLANA_CU_PER_SEC': '100000', 'SOLANA_SKIP_THRESHOLD': '1000'})
+        environ.start()
+        self.addCleanup(reload_settings)
+        self.addCleanup(reset_rpc_session)
+        self.addCleanup(reset_classification_pool)
+        self.addCleanup(environ.stop)
+        reload_settings()
+        reset_rpc_session()
+
+    def _write_input(self, addresses):
+        input_path = os.path.join(self.temp_dir.name, 'input.txt')
+        with open(input_path, 'w') as input_file:
+            input_file.write('\n'.join(addresses) + '\n')
+        return input_path
+
+    def _read_output(self, output_path):
+        with open(output_path) as output_file:
+            return [json.loads(line) for line in output_file]
+
+    def test_classify_wallets_resumes_from_output(self):
+        wallets = [mock_pubkey(f"wallet:{i}") for i in range(4)]
+        output_path = os.path.join(self.temp_dir.name, 'wallets.ndjson')
+        with open(output_path, 'w') as output_file:
+            output_file.write(json.dumps({'address': wallets[0], 'status': 'OLD', 'transactions_count': 1}) + '\n')
+
+        with mock.patch('sys.stderr', io.StringIO()):
+            exit_code = main(['classify-wallets', self._write_input(wallets), '--output', output_path, '--resume'])
+
+        self.assertEqual(0, exit_code)
+        results = self._read_output(output_path)
+        self.assertEqual(wallets, sorted((result['address'] for result in results), key=wallets.index))
+        self.assertTrue(all(result['status'] in ('FRESH', 'OLD') for result in results))
+        # the wallet done by the previous run is not requested again
+        self.assertNotIn(wallets[0], {result['address'] for result in results[1:]})
+
+    def test_scan_coin_writes_a_coin_per_line_to_stdout(self):
+        mints = [mock_pubkey(f"mint:{i}") for i in range(2)]
+        stdout = io.StringIO()
+        with mock.patch('sys.stdout', stdout), mock.patch('sys.stderr', io.StringIO()):
+            exit_code = main(['scan-coin', self._write_input(mints), '--first-buys'])
+
+        self.assertEqual(0, exit_code)
+        coins = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual(mints, [coin['coin_address'] for coin in coins])
+        self.assertEqual(5, len(coins[0]['holders']))
+        self.assertEqual('COMPLETE', coins[0]['first_buy_statistics']['status'])
+        self.assertIsNotNone(coins[0]['market_info'])
+
+    def test_warm_cache_needs_a_cache_to_fill(self):
+        stderr = io.StringIO()
+        with mock.patch('sys.stdout', io.StringIO()), mock.patch('sys.stderr', stderr):
+            exit_code = main(['warm-cache', self._write_input([mock_pubkey('mint')])])
+        self.assertEqual(2, exit_code)
+        self.assertIn('Nothing to warm', stderr.getvalue())
@@ -0,0 +1,130 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+from benchmarks.mock_servers import mock_pubkey
+from shitcoins.funding_tracer import MAX_RATE_LIMITED_RETRIES, FundingTracer
+from shitcoins.model.coin_data import CoinData
+from shitcoins.model.holder import Holder
+from shitcoins.settings import Settings
+from shitcoins.sol.known_address_registry import KnownAddressRegistry
+from shitcoins.store.funder_graph import FunderEdge, FunderGraph
+
+FUNDER = mock_pubkey('funder')
+TOP_FUNDER = mock_pubkey('top funder')
+EXCHANGE = mock_pubkey('exchange')
+FUNDED_BY = {'fresh1': FUNDER, 'fresh2': FUNDER, 'fresh3': EXCHANGE, 'fresh4': EXCHANGE, FUNDER: TOP_FUNDER,
+             TOP_FUNDER: EXCHANGE}
+
+
+class FakeSolscan:
+    """
+    Answers account/solTransfers with an outbound transfer and, oldest, the inbound transfer from FUNDED_BY
+    """
+
+    def __init__(self):
+        self.requested = []
+
+    def get(self, url, headers=None, timeout=None):
+        account = url.split('account=')[1].split('&')[0]
+        self.requested.append(account)
+        transfers = [{'src': account, 'dst': 'elsewhere', 'blockTime': 2}]
+        if account in FUNDED_BY:
+            transfers.append({'src': FUNDED_BY[account], 'dst': account, 'blockTime': 1})
+        return mock.Mock(status_code=200, json=lambda: {'data': transfers})
+
+
+class TestFundingTracer(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.graph_path = os.path.join(self.temp_dir.name, 'funders.sqlite3')
+        self.solscan = FakeSolscan()
+        patcher = mock.patch('shitcoins.providers.solscan.get_http_session', return_value=self.solscan)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.settings = Settings(solscan_api_key='key', funding_max_hops=3)
+        self.wait_for_request_slot = mock.Mock()
+        self.tracer = FundingTracer(FunderGraph(self.graph_path), KnownAddressRegistry({EXCHANGE: 'CEX'}),
+                                    self.settings, wait_for_request_slot=self.wait_for_request_slot)
+        self.addCleanup(self.tracer.close)
+
+    def _coin_data(self):
+        holders = [Holder(address=address, status='FRESH', transactions_count=1)
+                   for address in ['fresh1', 'fresh2', 'fresh3', 'fresh4']]
+        holders.append(Holder(address='old', status='OLD', transactions_count=500))
+        return CoinData(coin_address='coinpump', holders=holders)
+
+    def test_funding_chain_stops_at_known_addresses(self):
+        self.assertEqual([FUNDER, TOP_FUNDER, EXCHANGE], self.tracer.funding_chain('fresh1'))
+        self.assertEqual([FUNDER], self.tracer.funding_chain('fresh1', max_hops=1))
+        self.assertEqual([EXCHANGE], self.tracer.funding_chain('fresh3'))
+
+    def test_holders_are_clustered_by_shared_funder_without_repeating_lookups(self):
+        clusters = self.tracer.cluster_holders(self._coin_data())
+        # the exchange funds everyone and the top funder funds the same holders as the closer funder
+        self.assertEqual([{'funder': FUNDER, 'holders': ['fresh1', 'fresh2'], 'hops': 1}], clusters)
+        self.assertEqual(1, self.solscan.requested.count(FUNDER))
+        # every request waits for the shared Solscan rate limiter
+        self.assertEqual(len(self.solscan.requested), self.wait_for_request_slot.call_count)
+        self.assertNotIn('old', self.solscan.requested)
+
+        # a second coin with the same holders is answered from the persisted graph
+        self.solscan.requested.clear()
+        tracer = FundingTracer(FunderGraph(self.graph_path), KnownAddressRegistry({EXCHANGE: 'CEX'}), self.settings,
+                               wait_for_request_slot=self.wait_for_request_slot)
+        self.assertEqual(clusters, tracer.cluster_holders(self._coin_data()))
+        self.assertEqual([], self.solscan.requested)
+        tracer.close()
+
+    def test_busy_wallets_are_not_followed(self):
+        full_page = [{'src': 'busy', 'dst': 'elsewhere', 'blockTime': 1}] * self.settings.solscan_max_trns_per_req
+        self.solscan.get = mock.Mock(return_value=mock.Mock(status_code=200, json=lambda: {'data': full_page}))
+        self.assertEqual([], self.tracer.funding_chain('busy'))
+        self.assertEqual(FunderEdge(funder=None), self.tracer.funder_graph.get('busy'))
+        self.assertEqual(self.settings.funding_max_pages, self.solscan.get.call_count)
+
+    def test_failed_lookups_are_not_memoized(self):
+        self.solscan.get = mock.Mock(return_value=mock.Mock(status_code=500, text='error'))
+        self.assertEqual([], self.tracer.funding_chain('fresh1'))
+        self.assertIsNone(self.tracer.funder_graph.get('fresh1'))
+
+    def test_no_funder_is_looked_up_after_the_deadline(self):
+        self.assertEqual([], self.tracer.cluster_holders(self._coin_data(), deadline=time.monotonic()))
+        self.assertEqual([], self.solscan.requested)
+
+    def test_unreachable_solscan_and_unreadable_responses_are_failed_lookups(self):
+        unreadable_response = mock.Mock(status_code=200, json=mock.Mock(side_effect=ValueError('not json')))
+        for get in [mock.Mock(side_effect=requests.ConnectionError('connection reset')),
+                    mock.Mock(return_value=unreadable_response)]:
+            self.solscan.get = get
+            with self.assertLogs('shitcoins.funding_tracer', 'ERROR'):
+                self.assertEqual([], self.tracer.cluster_holders(self._coin_data()))
+            self.assertIsNone(self.tracer.funder_graph.get('fresh1'))
+
+    def test_rate_limited_lookups_give_up(self):
+        self.solscan.get = mock.Mock(return_value=mock.Mock(status_code=429, text='too many requests'))
+        settings = Settings(solscan_api_key='key', too_many_requests_backoff_sec=0)
+        tracer = FundingTracer(FunderGraph(self.graph_path), settings=settings,
+                               wait_for_request_slot=self.wait_for_request_slot)
+        self.addCleanup(tracer.close)
+        with self.assertLogs('shitcoins.funding_tracer', 'ERROR'):
+            self.assertIsNone(tracer.funder_of('fresh1'))
+        self.assertEqual(MAX_RATE_LIMITED_RETRIES + 1, self.solscan.get.call_count)
+        self.assertIsNone(tracer.funder_graph.get('fresh1'))
+
+        # the backoff ends at the deadline, after which the lookup gives up without another request
+        settings = Settings(solscan_api_key='key', too_many_requests_backoff_sec=60)
+        tracer = FundingTracer(FunderGraph(self.graph_path), settings=settings,
+                               wait_for_request_slot=self.wait_for_request_slot)
+        self.addCleanup(tracer.close)
+        self.solscan.get.reset_mock()
+        start = time.monotonic()
+        self.assertIsNone(tracer.funder_of('fresh1', deadline=start + 0.2))
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(1, self.solscan.get.call_count)
@@ -11,6 +11,11 @@ class TestGetHolders(unittest.TestCase):
         holder_addresses = _filter_duplicate_keys_from_list_of_dict(holder_addresses)
         self.assertEqual(2, len(holder_addresses))
 
+    def test_filter_duplicate_keys_from_list_of_dict_keeps_supply_order(self):
+        holder_addresses = [Holder(address='c'), Holder(address='a'), Holder(address='c'), Holder(address='b')]
+        holder_addresses = _filter_duplicate_keys_from_list_of_dict(holder_addresses)
+        self.assertEqual(['c', 'a', 'b'], [holder['address'] for holder in holder_addresses])
+
     def test_filter_duplicate_keys_from_list_of_dict_empty_does_not_fail(self):
         holder_addresses = _filter_duplicate_keys_from_list_of_dict([])
         self.assertEqual(0, len(holder_addresses))
@@ -0,0 +1,29 @@
+import asyncio
+import time
+import unittest
+from unittest import mock
+
+from shitcoins.main import process_coin
+from shitcoins.model.coin_data import CoinData
+from shitcoins.settings import Settings
+
+
+class TestProcessCoin(unittest.TestCase):
+
+    def test_coin_past_its_deadline_gets_no_holder_requests(self):
+        coin_data = CoinData(coin_address='coinpump', holders=[])
+
+        async def process():
+            first_buy_task = asyncio.create_task(asyncio.sleep(10))
+            await process_coin(coin_data, first_buy_task, Settings(), deadline=time.monotonic() - 1)
+            first_buy_task.cancel()
+
+        with mock.patch('shitcoins.main.get_holders') as get_holders, \
+                mock.patch('shitcoins.main.multiprocess_coin_holders') as multiprocess_coin_holders, \
+                mock.patch('builtins.print'):
+            asyncio.run(process())
+
+        get_holders.assert_not_called()
+        multiprocess_coin_holders.assert_not_called()
+        self.assertEqual('PARTIAL', coin_data['classification_status'])
+        self.assertEqual('UNKNOWN', coin_data['first_buy_statistics']['status'])
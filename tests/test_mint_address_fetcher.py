@@ -1,9 +1,13 @@
 import os
+import tempfile
 import unittest
 from datetime import timezone, datetime, timedelta
+from types import SimpleNamespace
+from unittest import mock
 
 from shitcoins.mint_address_fetcher import MintAddressFetcher
 from shitcoins.util.time_util import datetime_from_utc_to_local
+from shitcoins.settings import Settings, reload_settings
 
 
 class TestMintAddressFetcher(unittest.IsolatedAsyncioTestCase):
@@ -11,6 +15,7 @@ class TestMintAddressFetcher(unittest.IsolatedAsyncioTestCase):
     def setUp(self):
         os.environ['MIN_MARKET_CAP'] = '20000'
         os.environ['MAX_MARKET_CAP'] = '300000'
+        reload_settings()
         self.test_token_address = '3S8qX1MsMqRbiwKg2cQyx7nis1oHMgaCuc9c4VfvVdPN'
         self.dicki_token_address = '8EHC2gfTLDb2eGQfjm17mVNLWPGRc9YVD75bepZ2nZJa'
         self.mint_address_fetcher = MintAddressFetcher()
@@ -25,6 +30,7 @@ class TestMintAddressFetcher(unittest.IsolatedAsyncioTestCase):
     async def test_fetch_pump_addresses_from_telegram_respects_min_max_market_cap(self):
         os.environ['MIN_MARKET_CAP'] = '1'
         os.environ['MAX_MARKET_CAP'] = '1000'
+        reload_settings()
         coins_data = await self.mint_address_fetcher.fetch_pump_addresses_from_telegram()
         self.assertEqual(0, len(coins_data))
 
@@ -51,3 +57,75 @@ class TestMintAddressFetcher(unittest.IsolatedAsyncioTestCase):
         # local_time = datetime_from_utc_to_local(utc_time)
         # print(utc_time.ctime())
         # print(local_time.ctime())
+
+
+class _FakeTelegramClient:
+
+    def __init__(self, channel_to_message_ids):
+        self.channel_to_messages = {channel: [SimpleNamespace(id=message_id, text=f"`{channel}{message_id}pump`")
+                                              for message_id in message_ids]
+                                    for channel, message_ids in channel_to_message_ids.items()}
+        self.requests = []
+
+    async def start(self, phone):
+        pass
+
+    async def disconnect(self):
+        pass
+
+    async def iter_messages(self, channel, limit, min_id=0, reverse=False):
+        self.requests.append((channel, min_id))
+        messages = [message for message in self.channel_to_messages[channel] if message.id > min_id]
+        messages = messages[:limit] if reverse else messages[::-1][:limit]
+        for message in messages:
+            yield message
+
+
+class TestMintAddressFetcherChannelCursors(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        # explicit settings keep the test independent of the environment, Telegram credentials included
+        settings = Settings(api_id=1, api_hash='x', phone='x', channel_usernames=('one', 'two'), fetch_limit=3,
+                            telegram_backfill_max_pages=2,
+                            seen_addresses_path=os.path.join(self.temp_dir.name, 'seen.sqlite3'),
+                            telegram_cursors_path=os.path.join(self.temp_dir.name, 'cursors.sqlite3'))
+        self.mint_address_fetcher = MintAddressFetcher(seen_file=os.path.join(self.temp_dir.name, 'seen.json'),
+                                                       settings=settings)
+        self.mint_address_fetcher.market_info_resolver = mock.Mock(pending_addresses=[])
+        self.mint_address_fetcher.market_info_resolver.resolve.return_value = {}
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _queued_addresses(self):
+        return self.mint_address_fetcher.market_info_resolver.add.call_args.args[0]
+
+    async def test_only_new_messages_of_every_channel_are_fetched(self):
+        telegram_client = _FakeTelegramClient({'one': [1, 2, 3, 4], 'two': [10, 11]})
+        self.mint_address_fetcher.telegram_client = telegram_client
+
+        await self.mint_address_fetcher.fetch_pump_addresses_from_telegram()
+        # first read takes the latest FETCH_LIMIT messages only
+        self.assertEqual({'one2pump', 'one3pump', 'one4pump', 'two10pump', 'two11pump'},
+                         set(self._queued_addresses()))
+
+        telegram_client.channel_to_messages['two'].append(SimpleNamespace(id=12, text='two12pump'))
+        await self.mint_address_fetcher.fetch_pump_addresses_from_telegram()
+        self.assertEqual(['two12pump'], self._queued_addresses())
+        self.assertIn(('one', 4), telegram_client.requests)
+        self.assertIn(('two', 11), telegram_client.requests)
+
+    async def test_gap_is_backfilled_in_bounded_pages(self):
+        telegram_client = _FakeTelegramClient({'one': [1], 'two': [1]})
+        self.mint_address_fetcher.telegram_client = telegram_client
+        await self.mint_address_fetcher.fetch_pump_addresses_from_telegram()
+
+        telegram_client.channel_to_messages['one'].extend(SimpleNamespace(id=i, text=f"one{i}pump")
+                                                          for i in range(2, 10))
+        await self.mint_address_fetcher.fetch_pump_addresses_from_telegram()
+        # two pages of three messages, oldest first
+        self.assertEqual([f"one{i}pump" for i in range(2, 8)], self._queued_addresses())
+
+        await self.mint_address_fetcher.fetch_pump_addresses_from_telegram()
+        self.assertEqual(['one8pump', 'one9pump'], self._queued_addresses())
@@ -0,0 +1,30 @@
+import unittest
+from datetime import datetime, timedelta
+
+from shitcoins.model.coin_data import CoinData
+from shitcoins.model.market_info import MarketInfo
+from shitcoins.priority import coin_priority
+
+NOW = datetime(2024, 6, 1, 12)
+
+
+def _coin_data(liquidity: float, market_cap: float, age_hours: float | None = None) -> CoinData:
+    created_at_utc = NOW - timedelta(hours=age_hours) if age_hours is not None else None
+    return CoinData(coin_address='coin', holders=[], first_buy_statistics=None,
+                    market_info=MarketInfo(token_name='Coin', market_cap=market_cap, liquidity=liquidity, price=1,
+                                           created_at_utc=created_at_utc))
+
+
+class TestCoinPriority(unittest.TestCase):
+
+    def test_more_liquidity_and_market_cap_go_first(self):
+        self.assertGreater(coin_priority(_coin_data(10_000, 50_000), NOW), coin_priority(_coin_data(1000, 50_000), NOW))
+        self.assertGreater(coin_priority(_coin_data(1000, 500_000), NOW), coin_priority(_coin_data(1000, 50_000), NOW))
+
+    def test_younger_coins_go_first(self):
+        young, old = coin_priority(_coin_data(1000, 50_000, 1), NOW), coin_priority(_coin_data(1000, 50_000, 48), NOW)
+        self.assertGreater(young, old)
+        self.assertEqual(old, coin_priority(_coin_data(1000, 50_000), NOW))
+
+    def test_missing_market_info_has_lowest_priority(self):
+        self.assertEqual(0, coin_priority(CoinData(coin_address='coin', holders=[], market_info=None)))
@@ -0,0 +1,34 @@
+import asyncio
+import time
+import unittest
+
+from shitcoins.metrics.registry import get_metrics
+from shitcoins.scheduler import fixed_cadence
+
+
+class TestFixedCadence(unittest.TestCase):
+
+    def _tick_times(self, work_sec, ticks: int, interval_sec: float = 0.1):
+        async def run():
+            tick_times = []
+            async for tick in fixed_cadence(lambda: interval_sec, 'test'):
+                tick_times.append((tick, time.monotonic()))
+                if len(tick_times) == ticks:
+                    return tick_times
+                await asyncio.sleep(work_sec(tick))
+        return asyncio.run(run())
+
+    def test_ticks_start_on_the_cadence_regardless_of_work_time(self):
+        tick_times = self._tick_times(lambda tick: 0.06 if tick == 1 else 0.01, ticks=4)
+        self.assertEqual([0, 1, 2, 3], [tick for tick, _ in tick_times])
+        start = tick_times[0][1]
+        for tick, tick_time in tick_times:
+            self.assertAlmostEqual(start + tick * 0.1, tick_time, delta=0.04)
+
+    def test_overrun_skips_missed_slots_and_is_recorded(self):
+        get_metrics().snapshot(reset=True)
+        tick_times = self._tick_times(lambda tick: 0.25 if tick == 0 else 0, ticks=2)
+        # tick 0 ran into the slots of ticks 1 and 2, the next tick starts on slot 3
+        self.assertEqual([0, 3], [tick for tick, _ in tick_times])
+        self.assertAlmostEqual(tick_times[0][1] + 0.3, tick_times[1][1], delta=0.04)
+        self.assertIn('shitcoins_schedule_overruns_total', get_metrics().render_prometheus())
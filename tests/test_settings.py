@@ -0,0 +1,84 @@
+import os
+import pickle
+import tempfile
+import unittest
+from dataclasses import FrozenInstanceError
+from unittest import mock
+
+from dotenv import dotenv_values
+
+from shitcoins import settings as settings_module
+from shitcoins.settings import Settings, SettingsError, get_settings, reload_settings
+
+
+class TestSettings(unittest.TestCase):
+
+    def test_values_are_parsed_and_defaulted(self):
+        settings = Settings.from_env({'FETCH_LIMIT': '25', 'RUN_WITH_DB': 'TRUE', 'SOLANA_SKIP_THRESHOLD': '1_000',
+                                      'CHANNEL_USERNAMES': 'one, two,', 'METRICS_PORT': ''})
+        self.assertEqual(25, settings.fetch_limit)
+        self.assertTrue(settings.run_with_db)
+        self.assertEqual(1000, settings.solana_skip_threshold)
+        self.assertEqual(('one', 'two'), settings.channels)
+        self.assertIsNone(settings.metrics_port)
+        self.assertEqual(50, settings.solscan_max_trns_per_req)
+        self.assertEqual(168, settings.seen_address_max_age_hours)
+
+    def test_empty_value_disables_optional_setting(self):
+        settings = Settings.from_env({'SEEN_ADDRESS_MAX_AGE_HOURS': '', 'SOLANA_CACHE_PATH': ''})
+        self.assertIsNone(settings.seen_address_max_age_hours)
+        self.assertIsNone(settings.solana_cache_path)
+
+    def test_single_channel_is_used_without_channel_list(self):
+        self.assertEqual(('channel',), Settings.from_env({'CHANNEL_USERNAME': 'channel'}).channels)
+
+    def test_every_invalid_setting_is_reported(self):
+        with self.assertRaises(SettingsError) as context:
+            Settings.from_env({'FETCH_LIMIT': 'many', 'SOLSCAN_SKIP_THRESHOLD': '0', 'RUN_WITH_DB': 'maybe'})
+        message = str(context.exception)
+        self.assertIn('FETCH_LIMIT=many', message)
+        self.assertIn('SOLSCAN_SKIP_THRESHOLD=0 must be positive', message)
+        self.assertIn('RUN_WITH_DB=maybe', message)
+
+    def test_market_cap_range_is_validated(self):
+        with self.assertRaises(SettingsError):
+            Settings.from_env({'MIN_MARKET_CAP': '1000', 'MAX_MARKET_CAP': '10'})
+
+    def test_settings_are_immutable_and_picklable_for_workers(self):
+        settings = Settings.from_env({'FRESH_WALLET_HOURS': '12'})
+        with self.assertRaises(FrozenInstanceError):
+            settings.fresh_wallet_hours = 24
+        self.assertEqual(settings, pickle.loads(pickle.dumps(settings)))
+        self.assertEqual(6, settings.with_overrides(fresh_wallet_hours=6).fresh_wallet_hours)
+
+
+class TestReloadSettings(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.addCleanup(reload_settings)
+        self.dotenv_path = os.path.join(self.temp_dir.name, '.env')
+
+    def _write_dotenv(self, content: str):
+        with open(self.dotenv_path, 'w') as file:
+            file.write(content)
+
+    def test_reload_applies_dotenv_changes_but_not_over_process_environment(self):
+        self._write_dotenv('LOOP_DELAY=5\nFETCH_LIMIT=7\n')
+        with mock.patch.dict(os.environ), \
+                mock.patch.object(settings_module, 'dotenv_values', lambda: dotenv_values(self.dotenv_path)), \
+                mock.patch.object(settings_module, '_process_environ_keys', frozenset({'FETCH_LIMIT'})):
+            os.environ['FETCH_LIMIT'] = '3'
+            os.environ.pop('LOOP_DELAY', None)
+            settings = reload_settings()
+            self.assertEqual(5, settings.loop_delay)
+            self.assertEqual(3, settings.fetch_limit)
+            self.assertIs(settings, get_settings())
+
+    def test_invalid_reload_keeps_previous_settings(self):
+        previous = reload_settings()
+        with mock.patch.dict(os.environ, {'FETCH_LIMIT': '-1'}):
+            with self.assertRaises(SettingsError):
+                reload_settings()
+            self.assertIs(previous, get_settings())
@@ -0,0 +1,86 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from shitcoins.model.coin_data import CoinData
+from shitcoins.model.first_buy_statistics import FirstBuyStatistics
+from shitcoins.model.funder_cluster import FunderCluster
+from shitcoins.model.holder import Holder
+from shitcoins.model.holder_overlap import HolderOverlap
+from shitcoins.model.market_info import MarketInfo
+from shitcoins.telegram_alert import alert_coins, archive_coins, render_alert, alert
+
+
+def _coin_data(first_buy_statistics=None) -> CoinData:
+    holders = [Holder(address=f"holder{i}", transactions_count=1, status='FRESH' if i < 2 else 'OLD')
+               for i in range(4)]
+    holders.append(Holder(address='pool', transactions_count=0, status='EXCLUDED', label='AMM'))
+    return CoinData(coin_address='coinpump',
+                    market_info=MarketInfo(token_name='Coin', market_cap=12345.678, liquidity=1000, price=0.1,
+                                           created_at_utc=None),
+                    first_buy_statistics=first_buy_statistics, holders=holders)
+
+
+class TestTelegramAlert(unittest.TestCase):
+
+    def test_render_alert_from_coin_data(self):
+        message = render_alert(_coin_data(FirstBuyStatistics(duplicate_count=3, duplicate_wallet_count=2,
+                                                             duplicate_pct=1.5, status='PARTIAL')))
+        self.assertIn('<strong>Coin</strong>', message)
+        self.assertIn('<code>coinpump</code>', message)
+        self.assertIn('🚀Market Cap: <strong>$12,345.68</strong>', message)
+        self.assertIn('🕗Token Age (ACST): <strong>N/A</strong>', message)
+        # the excluded pool is not counted
+        self.assertIn('👀Fresh: <strong>2 (50.00%)</strong>', message)
+        self.assertIn('partial', message)
+        self.assertIn('⛳# Of Wallets: <strong>2</strong>', message)
+
+    def test_render_alert_with_holder_overlap(self):
+        coin_data = _coin_data()
+        self.assertNotIn('Other Coins', render_alert(coin_data))
+        coin_data['holder_overlap'] = HolderOverlap(overlap_pct=25, coin_overlap_pct={'otherpump': 12.5},
+                                                    window_hours=24)
+        message = render_alert(coin_data)
+        self.assertIn('🔗Holders In Other Coins (24h): <strong>25.00%</strong>', message)
+        self.assertIn('<code>otherpump</code> <strong>12.50%</strong>', message)
+
+    def test_render_alert_with_funder_clusters(self):
+        coin_data = _coin_data()
+        coin_data['funder_clusters'] = [FunderCluster(funder='funder', holders=['holder0', 'holder1'], hops=1)]
+        message = render_alert(coin_data)
+        self.assertIn('💸Fresh Holders With A Shared Funder: <strong>2 in 1 groups</strong>', message)
+        self.assertIn('<code>funder</code> funded <strong>2</strong> (1 hops)', message)
+
+    def test_render_alert_with_partial_classification(self):
+        coin_data = _coin_data()
+        coin_data['holders'][3]['status'] = 'UNKNOWN'
+        self.assertNotIn('not classified in time', render_alert(coin_data))
+        coin_data['classification_status'] = 'PARTIAL'
+        self.assertIn('⏱Holders: <strong>partial, 1 not classified in time</strong>', render_alert(coin_data))
+
+    def test_render_alert_with_unknown_first_buys(self):
+        message = render_alert(_coin_data(FirstBuyStatistics(duplicate_count=0, duplicate_wallet_count=0,
+                                                             duplicate_pct=0, status='UNKNOWN')))
+        self.assertIn('⛳Duplicate First Buys: <strong>N/A</strong>', message)
+        self.assertNotIn('# Of Wallets', message)
+
+    def test_alert_coins_only_queues_coins_over_threshold(self):
+        dispatcher = mock.Mock()
+        low_fresh = _coin_data()
+        low_fresh['holders'] = [Holder(address='old', transactions_count=1, status='OLD')]
+        with mock.patch('builtins.print'):
+            alert_coins([_coin_data(), low_fresh], chat_id='chat', dispatcher=dispatcher)
+        self.assertEqual(1, dispatcher.enqueue.call_count)
+
+    def test_archived_coins_render_the_same(self):
+        with tempfile.TemporaryDirectory() as archive_dir:
+            archive_coins([_coin_data()], archive_dir)
+            with open(os.path.join(archive_dir, 'coinpump.json')) as file:
+                self.assertEqual('coinpump', json.load(file)['coin_address'])
+
+            dispatcher = mock.Mock()
+            with mock.patch('builtins.print'):
+                alert(coins_dir=archive_dir, chat_id='chat', dispatcher=dispatcher)
+            self.assertEqual(render_alert(_coin_data()), dispatcher.enqueue.call_args.args[0])
@@ -0,0 +1,45 @@
+import unittest
+
+from shitcoins.util.aging_priority_queue import AgingPriorityQueue
+
+
+class TestAgingPriorityQueue(unittest.TestCase):
+
+    def test_highest_priority_first_and_equal_priorities_in_push_order(self):
+        queue = AgingPriorityQueue()
+        for item, priority in [('low', 1), ('high', 5), ('first', 3), ('second', 3)]:
+            queue.push(item, priority, now=0)
+        self.assertEqual(['high', 'first', 'second', 'low'], [queue.pop() for _ in range(4)])
+        self.assertEqual(0, len(queue))
+        with self.assertRaises(IndexError):
+            queue.pop()
+
+    def test_waiting_items_overtake_newer_higher_priority_items(self):
+        queue = AgingPriorityQueue(aging_per_sec=0.1)
+        queue.push('old low', 1, now=0)
+        # pushed 10s later, 1 priority point higher is equal and the older item goes first
+        queue.push('new equal', 2, now=10)
+        queue.push('new high', 2.5, now=10)
+        self.assertEqual(['new high', 'old low', 'new equal'], [queue.pop() for _ in range(3)])
+
+    def test_items_about_to_miss_their_deadline_go_first(self):
+        queue = AgingPriorityQueue(aging_per_sec=0.05)
+        # a coin's priority spans several points, aging alone would serve the low one long after its deadline
+        queue.push('low', 1, now=0, deadline=120)
+        queue.push('later low', 1.5, now=0, deadline=130)
+        for i in range(3):
+            queue.push(f"high {i}", 8, now=100, deadline=220)
+        queue.push('no deadline', 9, now=100)
+
+        self.assertEqual('no deadline', queue.pop(now=100, urgent_within_sec=10))
+        self.assertEqual('high 0', queue.pop(now=100, urgent_within_sec=10))
+        # 20s left and serving takes 25s: the low priority coin is served before it is too late
+        self.assertEqual('low', queue.pop(now=100, urgent_within_sec=25))
+        self.assertEqual('high 1', queue.pop(now=100, urgent_within_sec=25))
+        # already past its deadline, it is served right away rather than starving any longer
+        self.assertEqual('later low', queue.pop(now=140, urgent_within_sec=0))
+        self.assertEqual(1, len(queue))
+        self.assertEqual('high 2', queue.pop(now=140, urgent_within_sec=0))
+        self.assertEqual(0, len(queue))
+        with self.assertRaises(IndexError):
+            queue.pop(now=140, urgent_within_sec=0)
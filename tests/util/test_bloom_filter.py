@@ -0,0 +1,20 @@
+import unittest
+
+from shitcoins.util.bloom_filter import BloomFilter
+
+
+class TestBloomFilter(unittest.TestCase):
+
+    def test_added_items_are_always_contained(self):
+        bloom_filter = BloomFilter(1000)
+        items = [f"address{i}" for i in range(1000)]
+        for item in items:
+            bloom_filter.add(item)
+        self.assertTrue(all(item in bloom_filter for item in items))
+
+    def test_false_positive_rate_is_near_error_rate(self):
+        bloom_filter = BloomFilter(1000, error_rate=0.01)
+        for i in range(1000):
+            bloom_filter.add(f"address{i}")
+        false_positives = sum(f"other{i}" in bloom_filter for i in range(10_000))
+        self.assertLess(false_positives, 300)